@@ -1,43 +1,94 @@
 __version__ = "0.1.0"
-from mip_start.action_report_builder import report_builder_solve
-from mip_start.action_update_food_cost import update_food_cost_solve
-from mip_start.constants import Portions
-from mip_start.output_data import create_output_tables
-from mip_start.input_data import get_optimization_data
-from mip_start.main import solve
-from mip_start.model import optimize
-from mip_start.schemas import input_schema, output_schema
+
+import importlib
+
+# The public API is imported lazily, on first access (e.g. `mip_start.solve`), so that importing the package (e.g. to
+# read actions_config) doesn't import pandas, ticdat, plotly or pyscipopt
+_LAZY_ATTRIBUTES = {
+    'report_builder_solve': 'mip_start.action_report_builder',
+    'update_food_cost_solve': 'mip_start.action_update_food_cost',
+    'batch_solve': 'mip_start.batch_solve',
+    'Portions': 'mip_start.constants',
+    'create_output_tables': 'mip_start.output_data',
+    'get_optimization_arrays': 'mip_start.input_data',
+    'get_optimization_data': 'mip_start.input_data',
+    'Instrumentation': 'mip_start.instrumentation',
+    'JsonLogSink': 'mip_start.instrumentation',
+    'add_metrics_sink': 'mip_start.instrumentation',
+    'remove_metrics_sink': 'mip_start.instrumentation',
+    'solve': 'mip_start.main',
+    'Incumbent': 'mip_start.model',
+    'optimize': 'mip_start.model',
+    'read_model_artifact': 'mip_start.model_artifact',
+    'replay_model_artifact': 'mip_start.model_artifact',
+    'postsolve': 'mip_start.presolve',
+    'presolve': 'mip_start.presolve',
+    'profiles_solve': 'mip_start.profiles',
+    'input_schema': 'mip_start.schemas',
+    'SolutionCache': 'mip_start.solution_cache',
+    'output_schema': 'mip_start.schemas',
+    'ValidationCache': 'mip_start.validation',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES) + ['actions_config', 'parameters_config', 'input_tables_config',
+                                    'output_tables_config']
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value  # later accesses don't go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()).union(_LAZY_ATTRIBUTES))
+
+
+def _lazy_engine(name: str):
+    """Engine that imports the public attribute name of the package (and its dependencies) only when it's called."""
+    def engine(*args, **kwargs):
+        return __getattr__(name)(*args, **kwargs)
+    engine.__name__ = engine.__qualname__ = name
+    return engine
 
 
 # Configured deployment on Mip Hub, see https://github.com/mipwise/mip-go/tree/main/6_deploy/4_configured_deployment
 actions_config = {
     'Update Food Cost': {
         'schema': 'input',
-        'engine': update_food_cost_solve,
+        'engine': _lazy_engine('update_food_cost_solve'),
         'tooltip': "Update the food cost by the factor inputted in the 'Food Cost Multiplier' parameter"
     },
     'Report Builder': {
         'schema': 'output',
-        'engine': report_builder_solve,
+        'engine': _lazy_engine('report_builder_solve'),
         'tooltip': "Read the output from the main engine and populate a chart of food-nutrient contributions"
     }
 }
 
 parameters_config = {
     'hidden': [],
-    'categories': {'Solver': ['Time Limit', 'Mip Gap']},
+    'categories': {'Solver': ['Time Limit', 'Mip Gap', 'Threads', 'Emphasis', 'Stall Time']},
     'order': [],
     'tooltips': {
         'Food Cost Multiplier': "Factor by which to multiply the 'Per Unit Cost' column in 'foods' input table",
         'Time Limit': "Maximum time (in seconds) to run the optimization",
         'Mip Gap': "Relative MIP gap tolerance for mixed-integer linear programs",
+        'Threads': "Number of threads of SCIP's concurrent solve, where each thread runs different solver settings "
+                   "(1 to solve sequentially)",
+        'Emphasis': "SCIP's emphasis settings, e.g. 'Feasibility' to find good solutions quickly, or 'Optimality' to "
+                    "prove optimality",
+        'Stall Time': "Stop the optimization after this many seconds without a better solution (0 to stop at the "
+                      "first feasible solution), or never if empty",
     }
 }
 
 input_tables_config = {
     'hidden_tables': [],
     'categories': {},
-    'order': ['parameters', 'foods', 'nutrients', 'foods_nutrients'],
+    'order': ['parameters', 'foods', 'nutrients', 'foods_nutrients', 'profiles', 'profiles_nutrients'],
     'tables_display_names': {},
     'columns_display_names': {},
     'hidden_columns': {}
@@ -46,7 +97,7 @@ input_tables_config = {
 output_tables_config = {
     'hidden_tables': [],
     'categories': {},
-    'order': ['buy', 'nutrition'],
+    'order': ['buy', 'nutrition', 'profile_buy', 'profile_nutrition'],
     'tables_display_names': {},
     'columns_display_names': {},
     'hidden_columns': {}
@@ -1,7 +1,15 @@
+import sys
+
 from ticdat import standard_main
 
+from mip_start.batch_solve import batch_main
+from mip_start.columnar_io import columnar_main, is_columnar
+from mip_start.job_server import serve_main
 from mip_start.main import solve
+from mip_start.model_artifact import replay_main
+from mip_start.profiles import profiles_main
 from mip_start.schemas import input_schema, output_schema
+from mip_start.streaming import stream_main
 
 
 # When run from the command line, will read/write json/xls/csv/db/sql/mdb files.
@@ -9,5 +17,42 @@ from mip_start.schemas import input_schema, output_schema
 #   python -m mip_template -i input.xlsx -o solution.xlsx -e errors.xlsx
 # "-e <errors_file_or_dir>" argument is optional; if used ticdat will check for errors (according to the input schema
 # definition) and store in a xlsx/xls file as separate tabs, or into a directory as separate csv files.
+#
+# Parquet and Arrow IPC data (which keep the columns' dtypes and are much faster to read than xlsx) are stored in
+# directories ending in .parquet_dir or .arrow_dir, with one file per table. These require pyarrow. For example:
+#   python -m mip_start -i input.parquet_dir -o solution.arrow_dir
+#
+# The "batch" mode solves one scenario per group of rows of a scenarios table, in parallel. For example:
+#   python -m mip_start batch -i input.xlsx -s scenarios.csv -o solutions_dir -w 4
+#
+# The "serve" mode keeps a pool of worker processes that solve the jobs read from the standard input as JSON lines,
+# and writes their status and solutions to the standard output (see mip_start/job_server.py). For example:
+#   python -m mip_start serve -w 4 -q 16 -t 60 < jobs.jsonl > results.jsonl
+#
+# The "stream" mode reads the foods_nutrients table from its own CSV, Parquet or Arrow file in chunks, for catalogs
+# that don't fit in memory (see mip_start/streaming.py). For example:
+#   python -m mip_start stream -i input_dir -f foods_nutrients.parquet -o solution.xlsx -c 1000000
+#
+# The "profiles" mode solves one diet per row of the profiles table, with the intake bounds of its rows of the
+# profiles_nutrients table (see mip_start/profiles.py), sequentially or in parallel. For example:
+#   python -m mip_start profiles -i input.xlsx -o solution.xlsx -w 4
+#
+# The "replay" mode solves again the model artifacts saved by solve(dat, artifact_dir=...), i.e., the compressed model
+# and its SCIP parameters, without building the model (see mip_start/model_artifact.py), optionally with other SCIP
+# parameters. For example:
+#   python -m mip_start replay artifacts/<fingerprint> -s limits/time=60 -s presolving/maxrounds=0 -q
 if __name__ == "__main__":
-    standard_main(input_schema, output_schema, solve)
+    if sys.argv[1:2] == ['batch']:
+        batch_main(sys.argv[2:])
+    elif sys.argv[1:2] == ['serve']:
+        serve_main(sys.argv[2:])
+    elif sys.argv[1:2] == ['stream']:
+        stream_main(sys.argv[2:])
+    elif sys.argv[1:2] == ['profiles']:
+        profiles_main(sys.argv[2:])
+    elif sys.argv[1:2] == ['replay']:
+        replay_main(sys.argv[2:])
+    elif any(is_columnar(arg) for arg in sys.argv[1:]):
+        columnar_main(sys.argv[1:])
+    else:
+        standard_main(input_schema, output_schema, solve)
@@ -1,12 +1,21 @@
 import os
+from collections.abc import Iterable
 
-import plotly.express as px
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
 from plotly.graph_objs import Figure
 
 from mip_start.constants import APP_OUTPUT_DIR
+from mip_start.output_data import nutrient_contributions
 
 
-def _save_html_plot(fig: Figure, plot_name: str, path: str = APP_OUTPUT_DIR):
+# charts that report_builder_solve can render, each one saved as '<chart>.html'
+REPORT_CHARTS = ('stacked_bar', 'nutrition', 'cost')
+OTHER = 'Other'
+
+
+def _save_html_plot(fig: Figure, plot_name: str, path: str = APP_OUTPUT_DIR, include_plotlyjs: bool | str = True):
     """Save plots, as HTML, to the default directory of Mip Hub.
 
     When executed locally, saves the HTML file to app/output/ (default directory of Mip Hub), or to the specified path.
@@ -19,41 +28,149 @@ def _save_html_plot(fig: Figure, plot_name: str, path: str = APP_OUTPUT_DIR):
         Name of the plot to be saved as an HTML file and to be displayed on Mip Hub.
     path: str
         Path to the output.
+    include_plotlyjs: bool | str
+        How the plotly.js bundle is included, see plotly's write_html.
     """
     # Save the file: get path first, create directory if doesn't exist and save html file
     file_path = os.path.join(f'{path}/{plot_name}.html')
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    fig.write_html(file_path)
+    fig.write_html(file_path, include_plotlyjs=include_plotlyjs)
+
+
+def _top_foods(df: pd.DataFrame, value: str, top_n: int | None, by: list[str]) -> pd.DataFrame:
+    """
+    Keep the rows of the top_n foods with the largest total value, and sum the rows of the other foods by the by
+    columns into a single 'Other' food (last).
+    """
+    if top_n is None or df['Food ID'].nunique() <= top_n:
+        return df
+    totals = df.groupby('Food ID', sort=False)[value].sum()
+    is_top = df['Food ID'].isin(totals.nlargest(top_n).index).to_numpy()
+    if by:
+        other = df[~is_top].groupby(by, sort=False, as_index=False)[value].sum()
+    else:
+        other = pd.DataFrame({value: [df.loc[~is_top, value].sum()]})
+    other['Food ID'] = other['Food Name'] = OTHER
+    return pd.concat([df[is_top], other], ignore_index=True)
+
+
+def _stacked_bar(contributions: pd.DataFrame, categories: pd.Series | None = None,
+                 nutrients: Iterable[str] = ()) -> Figure:
+    """
+    Stacked bar chart of the contribution of each food (bars) to each nutrient (colors), with categories (if given) as
+    the foods of the x axis, in order, including those without contributions. The nutrients without contributions get
+    a trace of zeros (so that they're in the legend).
+    """
+    traces = {nutrient: (group['Food Name'].to_numpy(), group['Contribution'].to_numpy())
+              for nutrient, group in contributions.groupby('Nutrient Name', sort=False)}
+    for nutrient in nutrients:
+        if nutrient not in traces and categories is not None and len(categories):
+            traces[nutrient] = (categories.to_numpy()[:1], np.zeros(1))
+    fig = go.Figure([go.Bar(x=x, y=y, name=nutrient) for nutrient, (x, y) in traces.items()])
+    fig.update_layout(title="Food-Nutrient Contributions", barmode='stack', legend_title_text="Nutrient Name",
+                      xaxis_title="Food Name", yaxis_title="Nutrient Contribution")
+    if categories is not None:
+        fig.update_xaxes(categoryorder='array', categoryarray=categories.to_numpy())
+    return fig
 
 
-def report_builder_solve(dat, sln, path: str = APP_OUTPUT_DIR):
-    buy = sln.buy.copy()
-    foods_nutrients = dat.foods_nutrients.copy()
-    nutrients = dat.nutrients.copy()
+def _nutrition_bar(nutrition: pd.DataFrame) -> Figure:
+    """Bar chart of the quantity of each nutrient in the diet, with its Min and Max Intake as markers."""
+    names = nutrition['Nutrient Name'].to_numpy()
+    fig = go.Figure([
+        go.Bar(x=names, y=nutrition['Quantity'].to_numpy(dtype=np.float64, na_value=np.nan), name="Quantity"),
+        go.Scatter(x=names, y=nutrition['Min Intake'].to_numpy(dtype=np.float64, na_value=np.nan), name="Min Intake",
+                   mode='markers', marker_symbol='triangle-up'),
+        go.Scatter(x=names, y=nutrition['Max Intake'].to_numpy(dtype=np.float64, na_value=np.nan), name="Max Intake",
+                   mode='markers', marker_symbol='triangle-down'),
+    ])
+    fig.update_layout(title="Nutrition", xaxis_title="Nutrient Name", yaxis_title="Quantity")
+    return fig
 
-    # Rename columns for clarity
-    buy.rename(columns={'Quantity': 'Purchase Quantity'}, inplace=True)
-    foods_nutrients.rename(columns={'Quantity': 'Nutrient per unit'}, inplace=True)
 
-    # Merge the 'buy' table with 'foods_nutrients' on Food ID
-    merged = buy.merge(foods_nutrients, on='Food ID', how='left')
+def _cost_bar(costs: pd.DataFrame) -> Figure:
+    """Bar chart of the cost of each purchased food."""
+    fig = go.Figure(go.Bar(x=costs['Food Name'].to_numpy(), y=costs['Cost'].to_numpy()))
+    fig.update_layout(title="Cost per Food", xaxis_title="Food Name", yaxis_title="Cost")
+    return fig
 
-    # Compute contribution: (quantity purchased) * (nutrient per unit)
-    merged['Contribution'] = merged['Purchase Quantity'] * merged['Nutrient per unit']
 
-    # Merge with the nutrients table to get nutrient names
-    merged = merged.merge(nutrients[['Nutrient ID', 'Nutrient Name']], on='Nutrient ID', how='left')
+def report_builder_solve(dat, sln, path: str = APP_OUTPUT_DIR, include_plotlyjs: bool | str = True,
+                         drop_zeros: bool = False, top_n: int | None = None,
+                         charts: Iterable[str] = ('stacked_bar',)):
+    """
+    Report engine: save the charts of the solution as HTML files.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema.
+    sln
+        Output data, according to output schema.
+    path: str
+        Directory of the HTML files.
+    include_plotlyjs: bool | str
+        How each HTML file includes the plotly.js bundle (about 3 MB), see plotly's write_html. True embeds it in each
+        file, 'directory' writes it once to plotly.min.js in path (shared by all the reports saved there), 'cdn'
+        loads it from the internet, and a path ending in '.js' references that file.
+    drop_zeros: bool
+        If True, the foods without contributions (or cost) and the nutrients with a zero quantity are left out of the
+        charts. Otherwise, they're shown without a bar, i.e., the stacked bar chart keeps all the foods on its x axis
+        (or, with top_n, the top_n foods and 'Other') and all the nutrients in its legend.
+    top_n: int | None
+        If given, only the top_n foods with the largest contributions (or costs) are shown, and the rest are summed
+        into an 'Other' food.
+    charts: Iterable[str]
+        Charts to save, among REPORT_CHARTS: 'stacked_bar' (contribution of each food to each nutrient), 'nutrition'
+        (quantity of each nutrient, with its intake bounds) and 'cost' (cost of each food).
+    """
+    charts = list(charts)
+    unknown_charts = set(charts).difference(REPORT_CHARTS)
+    if unknown_charts:
+        raise ValueError(f"Unknown chart(s) {sorted(unknown_charts)}, should be among {REPORT_CHARTS}")
 
-    # Create a stacked bar chart using Plotly Express
-    fig_stacked = px.bar(
-        merged,
-        x="Food Name",
-        y="Contribution",
-        color="Nutrient Name",
-        title="Food-Nutrient Contributions",
-        labels={"Contribution": "Nutrient Contribution"}
-    )
+    figures = {}
+    if 'stacked_bar' in charts:
+        # Contribution of each purchased food to each nutrient: (quantity purchased) * (nutrient per unit). Only the
+        # purchased foods are plotted: without drop_zeros, the other foods are kept on the x axis as (empty)
+        # categories and the nutrients that only they provide as traces of zeros, which shows the same chart as
+        # plotting all of their (zero) contributions, without building them
+        buy = sln.buy
+        purchased = buy[buy['Quantity'].fillna(0).to_numpy() != 0]
+        contributions = nutrient_contributions(dat, purchased)
+        categories, nutrients = None, ()
+        if drop_zeros:
+            contributions = contributions[contributions['Contribution'].fillna(0).to_numpy() != 0]
+        else:
+            foods_nutrients = dat.foods_nutrients
+            listed = buy[buy['Food ID'].isin(foods_nutrients['Food ID'].unique())]
+            if top_n is not None and len(listed) > top_n:
+                # the top_n foods by total contribution, including the foods without contributions (if needed)
+                totals = contributions.groupby('Food ID', sort=False)['Contribution'].sum()
+                totals = totals.reindex(listed['Food ID']).fillna(0)
+                listed = listed[listed['Food ID'].isin(totals.nlargest(top_n).index)]
+                categories = pd.concat([listed['Food Name'], pd.Series([OTHER])], ignore_index=True)
+            else:
+                categories = listed['Food Name']
+            nutrient_ids = foods_nutrients.loc[foods_nutrients['Food ID'].isin(listed['Food ID']).to_numpy(),
+                                               'Nutrient ID'].unique()
+            nutrients = dat.nutrients.loc[dat.nutrients['Nutrient ID'].isin(nutrient_ids), 'Nutrient Name']
+        contributions = _top_foods(contributions, 'Contribution', top_n, by=['Nutrient ID', 'Nutrient Name'])
+        figures['stacked_bar'] = _stacked_bar(contributions, categories, nutrients)
+    if 'nutrition' in charts:
+        nutrition = sln.nutrition
+        if drop_zeros:
+            nutrition = nutrition[nutrition['Quantity'].fillna(0) != 0]
+        figures['nutrition'] = _nutrition_bar(nutrition)
+    if 'cost' in charts:
+        unit_costs = dat.foods.set_index('Food ID')['Per Unit Cost'].reindex(sln.buy['Food ID'])
+        costs = sln.buy.assign(Cost=sln.buy['Quantity'].to_numpy(dtype=np.float64, na_value=np.nan)
+                               * unit_costs.to_numpy(dtype=np.float64))
+        if drop_zeros:
+            costs = costs[costs['Cost'].fillna(0) != 0]
+        figures['cost'] = _cost_bar(_top_foods(costs, 'Cost', top_n, by=[]))
 
-    _save_html_plot(fig_stacked, 'stacked_bar', path)
+    for chart in charts:
+        _save_html_plot(figures[chart], chart, path, include_plotlyjs=include_plotlyjs)
 
     return sln
@@ -1,14 +1,48 @@
+import pandas as pd
+
 from mip_start.schemas import input_schema
 
 
-def update_food_cost_solve(dat):
-    """Scale food cost by 'Food Cost Multiplier' input parameter"""
+def copy_on_write_enabled() -> bool:
+    """Whether pandas' copy-on-write is active: always as of pandas 3, opt-in before (mode.copy_on_write = True)."""
+    # as of pandas 3, reading the option is deprecated
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+
+def shallow_copy_pan_dat(dat, schema=input_schema):
+    """
+    Copy of dat whose tables share their data with the tables of dat, instead of copying it as schema.copy_pan_dat.
+
+    With pandas' copy-on-write (the default as of pandas 3), each table's data is copied only when it's modified, so
+    modifying a table of the copy (even in place) doesn't modify dat. Without it, sharing data would let in-place
+    changes to the copy reach dat, so the tables are copied with schema.copy_pan_dat instead.
+    """
+    if not copy_on_write_enabled():
+        return schema.copy_pan_dat(dat)
+    copied_dat = schema.PanDat()
+    for table in schema.all_tables:
+        setattr(copied_dat, table, getattr(dat, table).copy(deep=False))
+    return copied_dat
+
+
+def update_food_cost_solve(dat, deep_copy: bool = False):
+    """
+    Scale food cost by 'Food Cost Multiplier' input parameter.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema.
+    deep_copy: bool
+        If True, every table of dat is copied. Otherwise, when pandas' copy-on-write is active, the tables other than
+        foods share their data with dat until they're modified (see shallow_copy_pan_dat), which avoids copying the
+        large foods_nutrients table.
+    """
     params = input_schema.create_full_parameters_dict(dat)
-    _dat = input_schema.copy_pan_dat(dat)
-    foods = _dat.foods.copy()
-    
-    foods['Per Unit Cost'] = params['Food Cost Multiplier'] * foods['Per Unit Cost']
-    foods = foods.round({'Per Unit Cost': 2})
-    _dat.foods = foods
-    
+    _dat = input_schema.copy_pan_dat(dat) if deep_copy else shallow_copy_pan_dat(dat)
+
+    # a new foods table, rather than an updated copy of it
+    _dat.foods = dat.foods.assign(**{'Per Unit Cost': params['Food Cost Multiplier'] * dat.foods['Per Unit Cost']})
+    _dat.foods = _dat.foods.round({'Per Unit Cost': 2})
+
     return _dat
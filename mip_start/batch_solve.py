@@ -0,0 +1,185 @@
+"""
+Batch engine to solve many scenarios of the same input data in one call.
+
+A scenario is a set of overrides of the input parameters (e.g. 'Food Cost Multiplier', 'Mip Gap', 'Time Limit') and of
+the nutrients' intake bounds. The shared input data is typed, checked and turned into optimization data only once,
+then the scenarios are solved in parallel by a pool of worker processes, each one reusing its model across scenarios
+(but not its solutions: scenarios aren't warm-started from each other, so they don't depend on the scheduling).
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import pandas as pd
+from mwcommons import ticdat_utils as utils
+from mwcommons.exceptions import InputDataError
+from mwcommons.ticdat_utils import set_parameters_datatypes
+
+from mip_start.columnar_io import read_data
+from mip_start.input_data import get_optimization_data
+from mip_start.model_workers import _init_worker, _optimize_scenario
+from mip_start.output_data import create_output_tables
+from mip_start.schemas import input_schema, output_schema
+from mip_start.validation import ValidationCache, validate_input
+
+
+SCENARIO_COLUMNS = ['Scenario', 'Name', 'Nutrient ID', 'Value']
+INTAKE_BOUNDS = ('Min Intake', 'Max Intake')
+
+
+def _check_value(table: str, field: str, type_dictionary, value, scenario) -> None:
+    if not type_dictionary.valid_data(value):
+        raise InputDataError(f"Scenario {scenario!r}: invalid value {value!r} for {table} {field!r}")
+
+
+def _scenario_overrides(dat, model_data: dict[str, Any], base_params: dict[str, Any], scenario,
+                        rows: pd.DataFrame) -> tuple[Any, dict[str, Any], dict[str, Any]]:
+    """
+    Apply the scenario's rows to the shared data.
+
+    Returns
+    -------
+    tuple
+        The scenario's input data (sharing the untouched tables with dat), the overrides of the optimization data,
+        and the scenario's parameters.
+    """
+    params = dict(base_params)
+    overrides = {}
+    foods, nutrients = dat.foods, dat.nutrients
+
+    param_rows = rows[~rows['Name'].isin(INTAKE_BOUNDS)]
+    for name, value in zip(param_rows['Name'], param_rows['Value']):
+        if name not in input_schema.parameters:
+            raise InputDataError(f"Scenario {scenario!r}: unknown parameter or field {name!r}")
+        _check_value('parameter', name, input_schema.parameters[name].type_dictionary, value, scenario)
+        params[name] = value
+    params = set_parameters_datatypes(params=params, schema=input_schema)
+
+    # the cost multiplier is applied as in the 'Update Food Cost' action, only if the scenario overrides it
+    if 'Food Cost Multiplier' in set(param_rows['Name']):
+        foods = foods.copy()
+        foods['Per Unit Cost'] = (params['Food Cost Multiplier'] * foods['Per Unit Cost']).round(2)
+        overrides['c'] = dict(zip(foods['Food ID'], foods['Per Unit Cost']))
+
+    bound_rows = rows[rows['Name'].isin(INTAKE_BOUNDS)]
+    if not bound_rows.empty:
+        unknown = set(bound_rows['Nutrient ID']).difference(model_data['J'])
+        if unknown:
+            raise InputDataError(f"Scenario {scenario!r}: unknown Nutrient ID(s) {sorted(map(str, unknown))}")
+        nutrients = nutrients.set_index('Nutrient ID')
+        for name, nutrient_id, value in zip(bound_rows['Name'], bound_rows['Nutrient ID'], bound_rows['Value']):
+            _check_value('nutrients', name, input_schema.data_types['nutrients'][name], value, scenario)
+            nutrients.loc[nutrient_id, name] = value
+        nutrients = nutrients.reset_index()
+        nutrients = nutrients.astype({'Min Intake': float, 'Max Intake': float})
+        predicate = input_schema.find_data_row_failures(_scenario_dat(dat, foods, nutrients))
+        if predicate:
+            raise InputDataError(f"Scenario {scenario!r}: intake bounds fail the predicates {list(predicate)}")
+        overrides['nl'] = dict(zip(nutrients['Nutrient ID'], nutrients['Min Intake']))
+        overrides['nu'] = dict(zip(nutrients['Nutrient ID'], nutrients['Max Intake']))
+
+    return _scenario_dat(dat, foods, nutrients), overrides, params
+
+
+def _scenario_dat(dat, foods: pd.DataFrame, nutrients: pd.DataFrame):
+    """Input data of a scenario, referencing (rather than copying) the tables of dat."""
+    scenario_dat = input_schema.PanDat()
+    for table in input_schema.all_tables:
+        setattr(scenario_dat, table, getattr(dat, table))
+    scenario_dat.foods = foods
+    scenario_dat.nutrients = nutrients
+    return scenario_dat
+
+
+def batch_solve(dat, scenarios: pd.DataFrame, max_workers: int | None = None,
+                validation_cache: ValidationCache | None = None, force_validation: bool = False,
+                fast_validation: bool = False) -> tuple[dict[Any, Any], pd.DataFrame]:
+    """
+    Solve one instance of the diet problem per scenario, sharing the input data across scenarios.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema.
+    scenarios: pd.DataFrame
+        Table of overrides with columns 'Scenario', 'Name', 'Nutrient ID' and 'Value'. If 'Name' is an input
+        parameter, 'Value' overrides its value for that scenario ('Nutrient ID' is ignored). If 'Name' is 'Min Intake'
+        or 'Max Intake', 'Value' overrides that bound of nutrient 'Nutrient ID'. Overriding 'Food Cost Multiplier'
+        scales the foods' cost as the 'Update Food Cost' action does. A scenario without overrides (e.g. the base
+        case) is declared by a row with a null 'Name'.
+    max_workers: int | None
+        Maximum number of worker processes, defaults to the number of processors of the machine.
+    validation_cache: ValidationCache | None
+        Optional cache of validated input tables, see main.solve.
+    force_validation: bool
+        If True, all input tables are typed and checked, even if they're in validation_cache.
+    fast_validation: bool
+        If True, the input data is checked with vectorized operations, see main.solve.
+
+    Returns
+    -------
+    tuple[dict[Any, Any], pd.DataFrame]
+        The solution of each scenario (according to output schema) as {scenario: sln}, and the kpis of all the
+        scenarios combined in a table with columns 'Scenario', 'Name' and 'Value'.
+    """
+    missing_columns = set(SCENARIO_COLUMNS).difference(scenarios.columns).difference({'Nutrient ID'})
+    if missing_columns:
+        raise InputDataError(f"Scenarios table is missing the column(s) {sorted(missing_columns)}")
+    if 'Nutrient ID' not in scenarios.columns:
+        scenarios = scenarios.assign(**{'Nutrient ID': None})
+
+    # Validate and prepare the shared data only once
+    dat = validate_input(dat, cache=validation_cache, force=force_validation, fast=fast_validation)
+    base_params = input_schema.create_full_parameters_dict(dat)
+    model_data = get_optimization_data(dat, base_params)
+
+    scenario_inputs = {}
+    for scenario, rows in scenarios.groupby('Scenario', sort=False):
+        rows = rows[rows['Name'].notna()]
+        scenario_inputs[scenario] = _scenario_overrides(dat, model_data, base_params, scenario, rows)
+
+    # Fan the solves out to the worker processes, each one receiving the shared data once
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(model_data,)) as executor:
+        futures = {scenario: executor.submit(_optimize_scenario, overrides, params)
+                   for scenario, (_, overrides, params) in scenario_inputs.items()}
+        model_sols = {scenario: future.result() for scenario, future in futures.items()}
+
+    # Populate output tables
+    slns, kpis = {}, []
+    for scenario, (scenario_dat, overrides, _) in scenario_inputs.items():
+        sln = create_output_tables(scenario_dat, {**model_data, **overrides}, model_sols[scenario])
+        slns[scenario] = sln
+        kpis.append(sln.kpis.assign(Scenario=scenario))
+    kpis_df = pd.concat(kpis, ignore_index=True) if kpis else pd.DataFrame(columns=['Name', 'Value', 'Scenario'])
+
+    return slns, kpis_df[['Scenario', 'Name', 'Value']]
+
+
+def batch_main(args: list[str] | None = None) -> None:
+    """
+    Command line entry point of the batch engine, see `python -m mip_start batch --help`.
+
+    Each scenario's solution is written to a sub-directory of the output directory (as csv files), along with a
+    kpis.csv file that combines the kpis of all scenarios.
+    """
+    parser = argparse.ArgumentParser(prog='python -m mip_start batch', description=batch_main.__doc__)
+    parser.add_argument('-i', '--input', required=True,
+                        help="Input data file or directory (xlsx, json, csv dir, .parquet_dir or .arrow_dir)")
+    parser.add_argument('-s', '--scenarios', required=True, help="Scenarios table, as a csv or xlsx file")
+    parser.add_argument('-o', '--output', required=True, help="Output directory")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Maximum number of worker processes")
+    parsed = parser.parse_args(args)
+
+    dat = read_data(parsed.input, input_schema)
+    if parsed.scenarios.endswith(('.xlsx', '.xls')):
+        scenarios = pd.read_excel(parsed.scenarios)
+    else:
+        scenarios = pd.read_csv(parsed.scenarios)
+
+    slns, kpis = batch_solve(dat, scenarios, max_workers=parsed.workers)
+
+    os.makedirs(parsed.output, exist_ok=True)
+    for scenario, sln in slns.items():
+        utils.write_data(sln, os.path.join(parsed.output, str(scenario)), output_schema)
+    kpis.to_csv(os.path.join(parsed.output, 'kpis.csv'), index=False)
@@ -0,0 +1,110 @@
+"""
+Columnar (Parquet and Arrow IPC) input and output of PanDat objects, and the command line entry point that uses them.
+
+A model is stored in a directory with one file per table, named '<table>.parquet' in a '.parquet_dir' directory, or
+'<table>.arrow' in an '.arrow_dir' one. Both formats keep the columns' dtypes, so data written after set_data_types is
+read back already typed. Arrow IPC files are memory-mapped when read.
+
+These formats require the optional dependency pyarrow (`pip install mip_start[columnar]`). Any other location is read
+and written by mwcommons.ticdat_utils (xlsx, json or csv directory).
+"""
+import argparse
+import os
+
+import pandas as pd
+from mwcommons import ticdat_utils as utils
+
+from mip_start.main import solve
+from mip_start.schemas import input_schema, output_schema
+
+
+COLUMNAR_SUFFIXES = {'.parquet_dir': '.parquet', '.arrow_dir': '.arrow'}
+
+
+def is_columnar(data_loc: str) -> bool:
+    """Whether data_loc is a Parquet or Arrow IPC directory."""
+    return data_loc.rstrip(os.sep).endswith(tuple(COLUMNAR_SUFFIXES))
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Reading/writing Parquet or Arrow data requires pyarrow, install it with "
+                          "`pip install mip_start[columnar]`") from e
+    return pyarrow
+
+
+def _table_path(data_loc: str, table: str) -> str:
+    file_suffix = COLUMNAR_SUFFIXES[os.path.splitext(data_loc.rstrip(os.sep))[1]]
+    return os.path.join(data_loc, f'{table}{file_suffix}')
+
+
+def _read_table(pa, path: str) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        return pa.parquet.read_table(path).to_pandas()
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def _write_table(pa, df: pd.DataFrame, path: str) -> None:
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+    if path.endswith('.parquet'):
+        pa.parquet.write_table(arrow_table, path)
+    else:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+
+
+def read_data(input_data_loc: str, schema):
+    """
+    Same as mwcommons.ticdat_utils.read_data, also accepting Parquet and Arrow IPC directories.
+
+    A table without a file in a columnar directory is read as an empty table.
+    """
+    if not is_columnar(input_data_loc):
+        return utils.read_data(input_data_loc, schema)
+    if not os.path.isdir(input_data_loc):
+        raise NotADirectoryError(f"input_data_loc should be a directory: {input_data_loc}")
+
+    pa = _import_pyarrow()
+    dat = schema.PanDat()
+    for table in schema.all_tables:
+        path = _table_path(input_data_loc, table)
+        fields = list(schema.primary_key_fields.get(table, ())) + list(schema.data_fields.get(table, ()))
+        setattr(dat, table, _read_table(pa, path) if os.path.exists(path) else pd.DataFrame(columns=fields))
+    return dat
+
+
+def write_data(sln, output_data_loc: str, schema) -> None:
+    """Same as mwcommons.ticdat_utils.write_data, also accepting Parquet and Arrow IPC directories."""
+    if not is_columnar(output_data_loc):
+        return utils.write_data(sln, output_data_loc, schema)
+
+    pa = _import_pyarrow()
+    os.makedirs(output_data_loc, exist_ok=True)
+    for table in schema.all_tables:
+        _write_table(pa, getattr(sln, table), _table_path(output_data_loc, table))
+    return None
+
+
+def columnar_main(args: list[str] | None = None) -> None:
+    """
+    Command line entry point of the solve engine for Parquet or Arrow IPC data, see `python -m mip_start --help`.
+
+    It reads the input data, solves it and writes the solution, like ticdat's standard_main, with columnar
+    directories also accepted as input and output locations.
+    """
+    parser = argparse.ArgumentParser(prog='python -m mip_start', description=columnar_main.__doc__)
+    parser.add_argument('-i', '--input', default='input.xlsx',
+                        help="Input data file or directory (xlsx, json, csv dir, .parquet_dir or .arrow_dir)")
+    parser.add_argument('-o', '--output', default='output.xlsx',
+                        help="Output data file or directory (xlsx, json, csv dir, .parquet_dir or .arrow_dir)")
+    parsed = parser.parse_args(args)
+
+    dat = read_data(parsed.input, input_schema)
+    sln = solve(dat)
+    if sln is not None:
+        write_data(sln, parsed.output, output_schema)
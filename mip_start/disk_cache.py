@@ -0,0 +1,102 @@
+"""
+Size-bounded on-disk cache of pickled objects, with least-recently-used eviction.
+"""
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any
+
+
+CACHE_DIR_ENV_VAR = 'MIP_START_CACHE_DIR'
+
+
+def default_cache_dir(name: str) -> str:
+    """Sub-directory 'name' of $MIP_START_CACHE_DIR, which defaults to ~/.cache/mip_start."""
+    root = os.environ.get(CACHE_DIR_ENV_VAR) or os.path.join(Path.home(), '.cache', 'mip_start')
+    return os.path.join(root, name)
+
+
+class DiskCache:
+    """
+    Store of pickled objects in a directory, one file per key.
+
+    Reading an entry marks it as recently used (by updating the file's modification time). Whenever an entry is
+    written, the least recently used entries are evicted until the cache fits in max_bytes and max_entries.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 2 ** 30, max_entries: int | None = None):
+        """
+        Parameters
+        ----------
+        directory: str
+            Directory of the cache, created if it doesn't exist.
+        max_bytes: int
+            Maximum total size of the entries, in bytes.
+        max_entries: int | None
+            Maximum number of entries, unbounded if None.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value stored under key, or default if there's none (or it can't be read)."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return default
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value under key, then evict the least recently used entries if the cache is over its limits."""
+        # write to a temporary file first, so that readers never see a partially written entry
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                os.remove(entry.path)
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # evicted concurrently
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()  # least recently used first
+
+        total_bytes = sum(size for _, size, _ in entries)
+        n_entries = len(entries)
+        for _, size, path in entries:
+            over_entries = self.max_entries is not None and n_entries > self.max_entries
+            if total_bytes <= self.max_bytes and not over_entries:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            n_entries -= 1
@@ -1,11 +1,52 @@
 """
 Module to read input data and create the optimization parameters.
 """
-from typing import Any
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
 
 from mip_start.constants import Portions
 
 
+class CSRMatrix(NamedTuple):
+    """
+    Compressed sparse row matrix of nutrient quantities, with one row per nutrient and one column per food.
+
+    The nonzero entries of row j are data[indptr[j]:indptr[j + 1]], and their columns are the corresponding slice of
+    indices.
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    shape: tuple[int, int]
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def row(self, j: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the column indices and values of the nonzero entries of row j."""
+        start, end = self.indptr[j], self.indptr[j + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    @classmethod
+    def from_coo(cls, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape: tuple[int, int]) -> 'CSRMatrix':
+        """Build the matrix from coordinate arrays; zero values are dropped and rows are sorted by column."""
+        nonzero = values != 0
+        if not nonzero.all():
+            rows, cols, values = rows[nonzero], cols[nonzero], values[nonzero]
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        return cls(indptr, cols[order].astype(np.int32), values[order].astype(np.float64), shape)
+
+
+def is_array_data(data_in: dict[str, Any]) -> bool:
+    """Whether data_in was created by get_optimization_arrays (as opposed to get_optimization_data)."""
+    return isinstance(data_in['nq'], CSRMatrix)
+
+
 def get_optimization_data(dat, params: dict[str, Any]) -> dict[str, Any]:
     """
     Read input data and prepare optimization parameters.
@@ -39,3 +80,72 @@ def get_optimization_data(dat, params: dict[str, Any]) -> dict[str, Any]:
     ))
 
     return model_data
+
+
+def get_optimization_arrays(dat, params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Read input data and prepare optimization parameters as NumPy arrays.
+
+    This is a memory-lean alternative to get_optimization_data for large catalogs. Foods and nutrients are identified
+    by their position (code) in the 'I' and 'J' arrays, respectively, and every other parameter is an array aligned
+    with them. Missing 'Max Intake' values are NaN.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema.
+    params : dict[str, Any]
+        Dictionary with parameters as {param_name: value}.
+
+    Returns
+    -------
+    data_in
+        Dictionary with optimization parameters as {param_name: value}, where 'nq' is a CSRMatrix of shape
+        (len(J), len(I)) holding the nonzero nutrient quantities.
+    """
+    model_data = dict()
+    model_data['I'] = dat.foods['Food ID'].to_numpy()
+    model_data['J'] = dat.nutrients['Nutrient ID'].to_numpy()
+    model_data['nl'] = dat.nutrients['Min Intake'].to_numpy(dtype=np.float64)
+    model_data['nu'] = dat.nutrients['Max Intake'].to_numpy(dtype=np.float64, na_value=np.nan)
+    model_data['c'] = dat.foods['Per Unit Cost'].to_numpy(dtype=np.float64)
+
+    # encode foods_nutrients keys as positions in I and J, ignoring pairs that refer to unknown foods/nutrients
+    food_codes = pd.Index(model_data['I']).get_indexer(dat.foods_nutrients['Food ID'])
+    nutrient_codes = pd.Index(model_data['J']).get_indexer(dat.foods_nutrients['Nutrient ID'])
+    known = (food_codes >= 0) & (nutrient_codes >= 0)
+    model_data['nq'] = CSRMatrix.from_coo(
+        rows=nutrient_codes[known],
+        cols=food_codes[known],
+        values=dat.foods_nutrients['Quantity'].to_numpy(dtype=np.float64)[known],
+        shape=(len(model_data['J']), len(model_data['I']))
+    )
+
+    # specify variables types: I for integer, C for continuous
+    model_data['vtypes'] = np.where(dat.foods['Portion'].to_numpy() == Portions.WHOLE, 'I', 'C')
+
+    return model_data
+
+
+def to_optimization_arrays(data_in: dict[str, Any]) -> dict[str, Any]:
+    """
+    Array form of data_in (see get_optimization_arrays). Data created by get_optimization_data is converted with its
+    foods and nutrients sorted by ID, while data created by get_optimization_arrays is returned as is.
+    """
+    if is_array_data(data_in):
+        return data_in
+    food_ids, nutrient_ids = np.array(sorted(data_in['I']), dtype=object), np.array(sorted(data_in['J']), dtype=object)
+    pairs = [(i, j, quantity) for (i, j), quantity in data_in['nq'].items() if i in data_in['I'] and j in data_in['J']]
+    foods, nutrients, quantities = zip(*pairs) if pairs else ((), (), ())
+    return {
+        'I': food_ids,
+        'J': nutrient_ids,
+        'nl': np.array([data_in['nl'][j] for j in nutrient_ids], dtype=np.float64),
+        'nu': np.array([data_in['nu'][j] for j in nutrient_ids], dtype=np.float64),
+        'c': np.array([data_in['c'][i] for i in food_ids], dtype=np.float64),
+        'nq': CSRMatrix.from_coo(rows=pd.Index(nutrient_ids).get_indexer(nutrients),
+                                 cols=pd.Index(food_ids).get_indexer(foods),
+                                 values=np.asarray(quantities, dtype=np.float64),
+                                 shape=(len(nutrient_ids), len(food_ids))),
+        'vtypes': np.array([data_in['vtypes'][i] for i in food_ids]),
+    }
@@ -0,0 +1,105 @@
+"""
+Opt-in instrumentation of the solve engine: per-phase timings and solver statistics.
+
+Metrics are collected by an Instrumentation object passed to the engine, which may append them to the kpis output
+table and hands them to its metrics sinks. A sink is any callable that receives the metrics as a {name: value} dict,
+e.g. a JsonLogSink. Sinks registered with add_metrics_sink receive the metrics of every solve, even if the caller
+didn't pass an Instrumentation object, so metrics can be shipped elsewhere without changing how the engine is called.
+"""
+import json
+import time
+from collections.abc import Callable, Iterable
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any
+
+
+MetricsSink = Callable[[dict[str, Any]], None]
+
+_global_sinks: list[MetricsSink] = []
+
+
+def add_metrics_sink(sink: MetricsSink) -> None:
+    """Register a sink that receives the metrics of every solve."""
+    _global_sinks.append(sink)
+
+
+def remove_metrics_sink(sink: MetricsSink) -> None:
+    """Unregister a sink added with add_metrics_sink."""
+    _global_sinks.remove(sink)
+
+
+class Instrumentation:
+    """
+    Collector of the metrics of one solve.
+
+    Examples
+    --------
+    >>> instrumentation = Instrumentation(sinks=[JsonLogSink('metrics.jsonl')])
+    >>> sln = solve(dat, instrumentation=instrumentation)
+    >>> instrumentation.metrics['Solve Time']
+    """
+
+    def __init__(self, sinks: Iterable[MetricsSink] = (), add_to_kpis: bool = True):
+        """
+        Parameters
+        ----------
+        sinks: Iterable[MetricsSink]
+            Callables that receive the collected metrics, as a {name: value} dict, at the end of the solve.
+        add_to_kpis: bool
+            Whether to append the collected metrics to the kpis output table.
+        """
+        self.sinks = list(sinks)
+        self.add_to_kpis = add_to_kpis
+        self.metrics: dict[str, Any] = {}
+
+    @classmethod
+    def from_sinks(cls) -> 'Instrumentation | None':
+        """Instrumentation feeding only the registered sinks, or None if no sink is registered."""
+        return cls(add_to_kpis=False) if _global_sinks else None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Context manager that records the elapsed time of its block as the '<name> Time' metric, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics[f'{name} Time'] = round(time.perf_counter() - start, 4)
+
+    def record(self, name: str, value: Any) -> None:
+        self.metrics[name] = value
+
+    def record_solver_statistics(self, mdl) -> None:
+        """Record the statistics of a solved pyscipopt.Model."""
+        self.metrics['Presolve Time'] = round(mdl.getPresolvingTime(), 4)
+        self.metrics['Solve Time'] = round(mdl.getSolvingTime(), 4)
+        self.metrics['Nodes'] = mdl.getNTotalNodes()
+        self.metrics['LP Iterations'] = mdl.getNLPIterations()
+        self.metrics['Primal Bound'] = mdl.getPrimalbound()
+        self.metrics['Dual Bound'] = mdl.getDualbound()
+        self.metrics['Gap'] = mdl.getGap()
+        self.metrics['Variables'] = mdl.getNVars()
+        self.metrics['Constraints'] = mdl.getNConss()
+
+    def emit(self) -> None:
+        """Hand the collected metrics to the sinks."""
+        for sink in self.sinks + _global_sinks:
+            sink(dict(self.metrics))
+
+
+def phase(instrumentation: Instrumentation | None, name: str):
+    """Time a phase of the engine with instrumentation, if any, or do nothing."""
+    return instrumentation.phase(name) if instrumentation is not None else nullcontext()
+
+
+class JsonLogSink:
+    """Metrics sink that appends one JSON object per solve to a file (JSON lines)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, metrics: dict[str, Any]) -> None:
+        record = {'timestamp': datetime.now(timezone.utc).isoformat(), **metrics}
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(record, default=str) + '\n')
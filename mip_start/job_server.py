@@ -0,0 +1,204 @@
+"""
+Local job service that solves input data sent as JSON lines, with a pool of warm worker processes.
+
+Each line read from the input stream is a job, a JSON object such as
+    {"id": "job-1", "input": {"foods": [{"Food ID": "F1", ...}, ...], ...}, "time_limit": 30}
+where "input" holds the records of each table of input schema (a missing table is empty), and "id" and "time_limit"
+(in seconds) are optional. For each job, status messages are written to the output stream as JSON lines:
+    {"id": "job-1", "status": "queued"}
+    {"id": "job-1", "status": "running"}
+    {"id": "job-1", "status": "done", "output": {"buy": [...], "nutrition": [...], "kpis": [...]}}
+or, instead of "done", {"status": "failed", "error": "..."} or {"status": "timeout", "error": "..."}.
+
+The workers import the package once and solve many jobs, so a job costs its solve time rather than the start-up of an
+interpreter. Each worker solves one job at a time, and jobs wait in a bounded queue: once it's full, the server stops
+reading the input stream until a worker is free (backpressure). A job's time limit caps its 'Time Limit' parameter
+(i.e., SCIP's time limit), and if its worker doesn't answer within the time limit plus a grace period, the job is
+reported as timed out and the worker is killed and replaced by a new one. If a worker dies during a job (e.g. killed
+for lack of memory), the job is reported as failed and the worker is replaced too.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, TextIO
+
+import pandas as pd
+from mwcommons import ticdat_utils as utils
+
+from mip_start.main import solve
+from mip_start.schemas import input_schema, output_schema
+
+
+# extra time given to a worker to answer after the job's time limit (the solve stops at the time limit, but reading
+# the input and writing the output take some time too)
+TIME_LIMIT_GRACE = 30.0
+
+
+def dat_from_records(records: dict[str, list[dict[str, Any]]], schema):
+    """Create a schema.PanDat from the records of each of its tables, as {table: [{field: value}, ...]}."""
+    unknown_tables = set(records).difference(schema.all_tables)
+    if unknown_tables:
+        raise ValueError(f"Unknown table(s) {sorted(unknown_tables)}")
+    dat = schema.PanDat()
+    for table in schema.all_tables:
+        fields = list(schema.primary_key_fields.get(table, ())) + list(schema.data_fields.get(table, ()))
+        table_records = records.get(table) or []
+        setattr(dat, table, pd.DataFrame(table_records) if table_records else pd.DataFrame(columns=fields))
+    return dat
+
+
+def dat_to_records(dat, schema) -> dict[str, list[dict[str, Any]]]:
+    """Inverse of dat_from_records, with missing values as None."""
+    return {table: json.loads(getattr(dat, table).to_json(orient='records')) for table in schema.all_tables}
+
+
+def _init_worker() -> None:
+    # the solver writes its log to the standard output, which belongs to the server's responses
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+
+def _solve_job(records: dict[str, list[dict[str, Any]]], time_limit: float | None) -> dict[str, list[dict[str, Any]]]:
+    """Solve a job in a worker process."""
+    dat = dat_from_records(records, input_schema)
+    if time_limit is not None:
+        params = input_schema.create_full_parameters_dict(dat)
+        if params['Time Limit'] is None or float(params['Time Limit']) > time_limit:
+            dat = utils.set_input_parameter(input_schema, dat, 'Time Limit', time_limit)
+    sln = solve(dat)
+    return dat_to_records(sln, output_schema)
+
+
+class _Worker:
+    """
+    A worker process that solves one job at a time, and that's replaced when it dies or, after being killed, when it
+    doesn't answer in time.
+    """
+
+    def __init__(self):
+        self._executor = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+
+    async def solve(self, records: dict[str, list[dict[str, Any]]], time_limit: float | None,
+                    timeout: float | None) -> dict[str, list[dict[str, Any]]]:
+        """
+        Solve a job, raising asyncio.TimeoutError if it takes more than timeout, or BrokenProcessPool if the worker
+        process dies, after replacing the worker.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, _solve_job, records, time_limit),
+                                          timeout=timeout)
+        except (asyncio.TimeoutError, BrokenProcessPool):
+            self.close()
+            self._executor = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+            raise
+
+    def close(self) -> None:
+        """Stop the worker process (and its job, if any)."""
+        # the executor can't stop a running job, so its process is killed
+        for process in list((self._executor._processes or {}).values()):
+            process.kill()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class JobServer:
+    """
+    Server of solve jobs read from an input stream, as JSON lines, whose status messages are written to an output
+    stream. See the module docstring for the format of the jobs and the messages.
+    """
+
+    def __init__(self, max_workers: int | None = None, max_queue: int = 16, time_limit: float | None = None,
+                 grace: float = TIME_LIMIT_GRACE):
+        """
+        Parameters
+        ----------
+        max_workers: int | None
+            Number of worker processes, defaults to the number of processors of the machine.
+        max_queue: int
+            Maximum number of jobs waiting for a worker, before the server stops reading the input stream.
+        time_limit: float | None
+            Default time limit of the jobs, in seconds. None means that jobs without a "time_limit" are only limited
+            by their 'Time Limit' parameter.
+        grace: float
+            Extra time given to a worker to answer after a job's time limit, in seconds, before it's killed.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.time_limit = time_limit
+        self.grace = grace
+
+    def _send(self, output_stream: TextIO, job_id: Any, status: str, **fields) -> None:
+        output_stream.write(json.dumps({'id': job_id, 'status': status, **fields}, default=str) + '\n')
+        output_stream.flush()
+
+    async def _run_jobs(self, queue: asyncio.Queue, worker: _Worker, output_stream: TextIO) -> None:
+        while True:
+            job_id, records, time_limit = await queue.get()
+            self._send(output_stream, job_id, 'running')
+            try:
+                timeout = None if time_limit is None else time_limit + self.grace
+                output = await worker.solve(records, time_limit, timeout)
+            except asyncio.TimeoutError:
+                self._send(output_stream, job_id, 'timeout',
+                           error=f"No answer within the time limit of {time_limit} seconds")
+            except BrokenProcessPool:
+                self._send(output_stream, job_id, 'failed', error="The worker process died during the job")
+            except Exception as e:
+                self._send(output_stream, job_id, 'failed', error=''.join(traceback.format_exception_only(e)).strip())
+            else:
+                self._send(output_stream, job_id, 'done', output=output)
+            finally:
+                queue.task_done()
+
+    async def serve(self, input_stream: TextIO = sys.stdin, output_stream: TextIO = sys.stdout) -> None:
+        """Serve the jobs of input_stream until it ends, then wait for the queued jobs to finish."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        workers = [_Worker() for _ in range(self.max_workers)]
+        try:
+            runners = [asyncio.create_task(self._run_jobs(queue, worker, output_stream)) for worker in workers]
+            while line := await loop.run_in_executor(None, input_stream.readline):
+                if not line.strip():
+                    continue
+                try:
+                    job = json.loads(line)
+                    job_id = job.get('id')
+                    time_limit = job.get('time_limit', self.time_limit)
+                    time_limit = None if time_limit is None else float(time_limit)
+                    records = job['input']
+                except (ValueError, TypeError, KeyError, AttributeError) as e:
+                    self._send(output_stream, None, 'failed', error=f"Invalid job: {e!r}")
+                    continue
+                await queue.put((job_id, records, time_limit))
+                self._send(output_stream, job_id, 'queued')
+            await queue.join()
+            for runner in runners:
+                runner.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+        finally:
+            for worker in workers:
+                worker.close()
+
+
+def serve_main(args: list[str] | None = None) -> None:
+    """
+    Command line entry point of the job server, see `python -m mip_start serve --help`.
+
+    Jobs are read from the standard input and their status messages are written to the standard output, as JSON lines.
+    The logs of the solver are written to the standard error.
+    """
+    parser = argparse.ArgumentParser(prog='python -m mip_start serve', description=serve_main.__doc__)
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('-q', '--queue', type=int, default=16, help="Maximum number of jobs waiting for a worker")
+    parser.add_argument('-t', '--time-limit', type=float, default=None, help="Default time limit of a job, in seconds")
+    parser.add_argument('-g', '--grace', type=float, default=TIME_LIMIT_GRACE,
+                        help="Extra time given to a worker after a job's time limit before it's killed, in seconds")
+    parsed = parser.parse_args(args)
+
+    server = JobServer(max_workers=parsed.workers, max_queue=parsed.queue, time_limit=parsed.time_limit,
+                       grace=parsed.grace)
+    asyncio.run(server.serve())
@@ -1,12 +1,33 @@
-from mwcommons.ticdat_utils import check_data, set_data_types, set_parameters_datatypes
+from collections.abc import Callable
 
+import pandas as pd
+from mwcommons.ticdat_utils import set_parameters_datatypes
+
+from mip_start.instrumentation import Instrumentation, phase
 from mip_start.output_data import create_output_tables
 from mip_start.input_data import get_optimization_data
-from mip_start.model import optimize
+from mip_start.model import Incumbent, optimize
+from mip_start.presolve import postsolve, presolve as presolve_data
+from mip_start.solution_cache import CACHED_STATUSES, SolutionCache, model_fingerprint
 from mip_start.schemas import input_schema
+from mip_start.validation import ValidationCache, validate_input
+
+
+def _with_food_names(on_incumbent: Callable[[Incumbent], None], dat) -> Callable[[Incumbent], None]:
+    """Wrap on_incumbent so that the buy table of each incumbent has the columns of the buy table of output schema."""
+    food_names = dat.foods.set_index('Food ID')['Food Name']
+
+    def callback(incumbent: Incumbent) -> None:
+        incumbent.buy.insert(1, 'Food Name', food_names.reindex(incumbent.buy['Food ID']).to_numpy())
+        on_incumbent(incumbent)
+    return callback
 
 
-def solve(dat):
+def solve(dat, start=None, instrumentation: Instrumentation | None = None,
+          validation_cache: ValidationCache | None = None, force_validation: bool = False,
+          fast_validation: bool = False, presolve: bool = False, solution_cache: SolutionCache | None = None,
+          on_incumbent: Callable[[Incumbent], None] | None = None, artifact_dir: str | None = None,
+          artifact_format: str = 'mps'):
     """
     Main solve engine.
 
@@ -14,30 +35,92 @@ def solve(dat):
     ----------
     dat
         Input data, according to input schema.
+    start
+        Optional warm start for the solver, typically the buy table of a prior solution, see model.optimize.
+    instrumentation: Instrumentation | None
+        Opt-in collector of the timing of each phase and of the solver statistics, see the instrumentation module.
+        If None, metrics are collected only if some metrics sink is registered.
+    validation_cache: ValidationCache | None
+        Optional cache of validated input tables, so that unchanged tables are neither re-typed nor re-checked.
+    force_validation: bool
+        If True, all input tables are typed and checked, even if they're in validation_cache.
+    fast_validation: bool
+        If True, the input data is checked with vectorized operations instead of row by row (same checks and output).
+    presolve: bool
+        If True, trivially satisfied constraints, foods with no contributions and dominated foods are removed before
+        building the model (see the presolve module), and the kpis report how many were removed.
+    solution_cache: SolutionCache | None
+        Optional cache of model solutions. If the optimization data and 'Mip Gap' are the same as in a cached solve,
+        the cached solution is used instead of solving again, see the solution_cache module. The kpis then report
+        whether it was a 'Cache Hit', and, on a hit, only the 'Total Cost' among the kpis of the solver.
+    on_incumbent: Callable[[Incumbent], None] | None
+        Optional callback to stream the improving solutions: it's called with each new incumbent found by the solver,
+        whose buy table (with the 'Food ID', 'Food Name' and 'Quantity' of the purchased foods) is a partial version
+        of the final one. Together with the 'Stall Time' parameter, it lets callers use good enough solutions early.
+        It isn't called on a cache hit, nor by a concurrent solve, see model.ModelSession.optimize.
+    artifact_dir: str | None
+        If given, the model that's solved (unless the solution is cached) is saved with its solver parameters in a
+        sub-directory of artifact_dir, named after the fingerprint of its data, which the kpis report as 'Model
+        Fingerprint'. It can then be solved again without building it, see the model_artifact module.
+    artifact_format: str
+        Format of the model file of the artifact, 'mps' or 'lp' (both gzip-compressed).
 
     Returns
     -------
     sln
         Output data, according to output schema.
     """
+    if instrumentation is None:
+        instrumentation = Instrumentation.from_sinks()
 
-    # Set data types for input data
-    dat = set_data_types(dat=dat, schema=input_schema)
-    
-    # Check input data, according to input schema definition
-    check_data(dat, input_schema)
+    # Set data types for input data and check it, according to input schema definition
+    dat = validate_input(dat, cache=validation_cache, force=force_validation, fast=fast_validation,
+                         instrumentation=instrumentation)
 
     # Set data types for parameters
     params = input_schema.create_full_parameters_dict(dat)
     params = set_parameters_datatypes(params=params, schema=input_schema)
 
     # Get optimization data
-    model_data = get_optimization_data(dat, params)
+    with phase(instrumentation, 'Get Optimization Data'):
+        model_data = get_optimization_data(dat, params)
+
+    # Add the food names to the incumbents streamed to on_incumbent
+    if on_incumbent is not None:
+        on_incumbent = _with_food_names(on_incumbent, dat)
 
-    # Build optimization model
-    model_sol = optimize(model_data, params)
+    # Build optimization model, possibly from the presolved data, unless its solution is cached
+    cache_key = model_sol = None
+    if solution_cache is not None:
+        cache_key = model_fingerprint(model_data, params)
+        model_sol = solution_cache.get_solution(cache_key)
+    cache_hit = model_sol is not None
+    if not cache_hit and presolve:
+        with phase(instrumentation, 'Presolve'):
+            presolved = presolve_data(model_data)
+        model_sol = postsolve(presolved, optimize(presolved.data_in, params, start=start,
+                                                   instrumentation=instrumentation, on_incumbent=on_incumbent,
+                                                   artifact_dir=artifact_dir, artifact_format=artifact_format))
+        removed_counts = presolved.removed['Type'].value_counts()
+        model_sol['kpis']['Foods Removed by Presolve'] = int(removed_counts.get('Food', 0))
+        model_sol['kpis']['Constraints Removed by Presolve'] = int(removed_counts.get('Constraint', 0))
+    elif not cache_hit:
+        model_sol = optimize(model_data, params, start=start, instrumentation=instrumentation,
+                             on_incumbent=on_incumbent, artifact_dir=artifact_dir,
+                             artifact_format=artifact_format)
+    if solution_cache is not None:
+        if not cache_hit and model_sol['status'] in CACHED_STATUSES:
+            solution_cache.put_solution(cache_key, model_sol)
+        model_sol['kpis']['Cache Hit'] = cache_hit
 
     # Populate output tables
-    sln = create_output_tables(dat, model_data, model_sol)
+    with phase(instrumentation, 'Create Output Tables'):
+        sln = create_output_tables(dat, model_data, model_sol)
+
+    if instrumentation is not None:
+        if instrumentation.add_to_kpis:
+            metrics_df = pd.DataFrame(data=list(instrumentation.metrics.items()), columns=['Name', 'Value'])
+            sln.kpis = pd.concat([sln.kpis, metrics_df], ignore_index=True)
+        instrumentation.emit()
     
     return sln
@@ -1,76 +1,645 @@
 """
 Implementation of model. The model could be a MIP model, metaheuristic model, etc.
 """
-from typing import Any
+import functools
+import time
+import warnings
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any, NamedTuple
 
+import numpy as np
 import pandas as pd
 import pyscipopt as scip
-from pyscipopt import quicksum as qs
+from pyscipopt import SCIP_EVENTTYPE, SCIP_PARAMEMPHASIS, SCIP_STAGE, quicksum as qs
 
+from mip_start.input_data import is_array_data
+from mip_start.instrumentation import Instrumentation, phase
+from mip_start.model_artifact import write_model_artifact
+from mip_start.solution_cache import model_fingerprint
 
-def optimize(data_in: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+
+# values of the 'Emphasis' parameter, as SCIP emphasis settings
+EMPHASES = {
+    'Default': SCIP_PARAMEMPHASIS.DEFAULT,
+    'Feasibility': SCIP_PARAMEMPHASIS.FEASIBILITY,
+    'Optimality': SCIP_PARAMEMPHASIS.OPTIMALITY,
+    'Easy CIP': SCIP_PARAMEMPHASIS.EASYCIP,
+    'Hard LP': SCIP_PARAMEMPHASIS.HARDLP,
+}
+
+# values of the solver parameters that params dicts built by hand may lack (as opposed to those created from the input
+# data with input_schema.create_full_parameters_dict)
+PARAMETER_DEFAULTS = {'Threads': 1, 'Emphasis': 'Default', 'Stall Time': None}
+
+
+@functools.cache
+def concurrent_solve_supported() -> bool:
     """
-    Create the optimization model.
-    
+    Whether SCIP can solve concurrently, which is checked once per process.
+
+    That takes concurrent solvers (each one has a 'concurrent/<name>/prefprio' parameter) and a build of SCIP with a
+    task processing interface. Without the latter, pyscipopt warns and solves sequentially, so a trivial model is
+    solved concurrently with warnings turned into errors.
+    """
+    mdl = scip.Model('concurrency_probe')
+    mdl.hideOutput()
+    if not any(name.startswith('concurrent/') and name.endswith('/prefprio') for name in mdl.getParams()):
+        return False
+    var = mdl.addVar(lb=1.0)
+    mdl.setObjective(var)
+    mdl.setParam('parallel/maxnthreads', 2)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        try:
+            mdl.solveConcurrent()
+        except Exception:
+            return False
+    return mdl.getStatus() == 'optimal'
+
+
+class Incumbent(NamedTuple):
+    """A new incumbent found during a solve, as passed to the on_incumbent callback of ModelSession.optimize."""
+    time: float  # solving time (in seconds) at which it was found
+    objective: float
+    gap: float  # relative gap to the dual bound at that time (inf if there's no dual bound yet)
+    buy: pd.DataFrame  # 'Food ID' and 'Quantity' (rounded to 2 decimals) of the foods with a nonzero quantity, sorted
+
+
+def _group_by_nutrient(nq: dict[tuple[Any, Any], float]) -> dict[Any, list[tuple[Any, float]]]:
+    """
+    Group the nonzero nutrient quantities by nutrient, as {nutrient_id: [(food_id, quantity), ...]}.
+
+    Pairs that are missing from nq are simply absent from the result, i.e., they're treated as zero.
+    """
+    nq_by_nutrient = defaultdict(list)
+    for (i, j), quantity in nq.items():
+        if quantity:
+            nq_by_nutrient[j].append((i, quantity))
+    return nq_by_nutrient
+
+
+def _iter_foods(data_in: dict[str, Any]) -> Iterator[tuple[Any, Any, float, str]]:
+    """Yield (key, food_id, cost, vtype) for each food, where key identifies the food's variable."""
+    if is_array_data(data_in):
+        for k, (i, cost, vtype) in enumerate(zip(data_in['I'], data_in['c'].tolist(), data_in['vtypes'])):
+            yield k, i, cost, vtype
+    else:
+        c, vtypes = data_in['c'], data_in['vtypes']
+        for i in data_in['I']:
+            yield i, i, c[i], vtypes[i]
+
+
+def _iter_nutrients(data_in: dict[str, Any]) -> Iterator[tuple[Any, float, float, Iterable[tuple[Any, float]]]]:
+    """Yield (nutrient_id, min_intake, max_intake, [(food_key, quantity), ...]) for each nutrient."""
+    nl, nu, nq = data_in['nl'], data_in['nu'], data_in['nq']
+    if is_array_data(data_in):
+        for j_code, j in enumerate(data_in['J']):
+            indices, data = nq.row(j_code)
+            yield j, nl[j_code], nu[j_code], zip(indices.tolist(), data.tolist())
+    else:
+        nq_by_nutrient = _group_by_nutrient(nq)
+        for j in data_in['J']:
+            yield j, nl[j], nu[j], nq_by_nutrient.get(j, ())
+
+
+def _same_value(value: float | None, current: float | None) -> bool:
+    """Whether value equals current, where all null values (None, nan) are the same."""
+    return value == current or bool(pd.isnull(value) and pd.isnull(current))
+
+
+def build_model(data_in: dict[str, Any]) -> tuple[scip.Model, dict[Any, scip.Variable]]:
+    """
+    Build the diet problem model, touching only the nonzero coefficients of the constraints.
+
     Parameters
     ----------
     data_in: dict[str, Any]
-        Dictionary with optimization input parameters as {param_name: value} according to the formulation.
-    params : dict[str, Any]
-        Dictionary with parameters as {param_name: value} from input data.
-    
+        Dictionary with optimization input parameters as {param_name: value} according to the formulation, as
+        created by either get_optimization_data or get_optimization_arrays.
+
     Returns
     -------
-    data_out
-        The model data after optimizing, including status and variables' values.
+    tuple[scip.Model, dict[Any, scip.Variable]]
+        The SCIP model and the purchase variables as {food_key: variable}, where food_key is the Food ID, or the
+        food's position in data_in['I'] if data_in holds arrays.
     """
-    # Initialize output data
-    opt_sol = {}
-    
     # Instantiate the model
     mdl = scip.Model("diet_problem")
-    
-    # Retrieve model data
-    I, J = data_in['I'], data_in['J']
-    nl, nu, nq = data_in['nl'], data_in['nu'], data_in['nq']
-    c, vtypes = data_in['c'], data_in['vtypes']
-    
+
     # Create variables
-    x = {}
-    for i in I:
+    x, costs = {}, {}
+    for key, i, cost, vtype in _iter_foods(data_in):
         # vtype is either "I" (integer) or "C" (continuous), depending on the input foods.Portion values
-        x[i] = mdl.addVar(vtype=vtypes[i], name=f'x_{i}')
+        x[key] = mdl.addVar(vtype=vtype, name=f'x_{i}')
+        costs[key] = cost
+
+    # Add constraints, visiting each nonzero coefficient once and sharing the expression between C1 and C2
+    for j, min_intake, max_intake, coefficients in _iter_nutrients(data_in):
+        expr = qs(quantity * x[key] for key, quantity in coefficients)
+
+        # C1 (unless it was removed by presolve)
+        if pd.notnull(min_intake):
+            mdl.addCons(expr >= min_intake, name=f'C1_{j}')
 
-    # Add constraints
-    for j in J:
-        # C1
-        mdl.addCons(qs(nq[i, j] * x[i] for i in I) >= nl[j], name=f'C1_{j}')
-        
         # C2
-        if pd.notnull(nu[j]):
-            mdl.addCons(qs(nq[i, j] * x[i] for i in I) <= nu[j], name=f'C2_{j}')
+        if pd.notnull(max_intake):
+            mdl.addCons(expr <= max_intake, name=f'C2_{j}')
 
     # Set objective
-    mdl.setObjective(qs(c[i] * x[i] for i in I), sense='minimize')
-
-    # Set solver parameters
-    if params['Time Limit'] is not None:
-        mdl.setParam('limits/time', params['Time Limit'])
-    mdl.setParam('limits/gap', params['Mip Gap'])
-
-    # Optimize and retrieve the solution
-    mdl.optimize()
-    status = mdl.getStatus()
-    print(f'Model status: {status}')
-    opt_sol['status'] = status
+    mdl.setObjective(qs(costs[key] * var for key, var in x.items()), sense='minimize')
+
+    return mdl, x
+
+
+class ModelSession:
+    """
+    Keeps a built model between solves, so that what-if changes don't rebuild it from scratch.
+
+    Changes to the foods' costs, to the nutrients' Min/Max Intake, and to the solver parameters are applied to the
+    existing SCIP model (after freeing its transformed problem), and each solve is warm-started from the previous
+    incumbent (unless reset_start is called). Changes to anything else (foods, nutrients, quantities, portions) require
+    a new session. Concurrent solves (with a 'Threads' parameter above 1) are the exception: SCIP can't solve a model
+    again after a concurrent solve (nor free it safely once other models were solved concurrently), so each concurrent
+    solve runs on a model built for it and frees it right after. A concurrent solve thus costs one build of the model,
+    as does the first sequential solve after a concurrent one.
+
+    Examples
+    --------
+    >>> session = ModelSession(model_data)
+    >>> opt_sol = session.optimize(params)
+    >>> session.update(c={'F0': 1.99}, nl={'N1': 100.0})
+    >>> opt_sol = session.optimize(params)
+    """
+
+    def __init__(self, data_in: dict[str, Any]):
+        """
+        Parameters
+        ----------
+        data_in: dict[str, Any]
+            Dictionary with optimization input parameters as {param_name: value} according to the formulation, as
+            created by either get_optimization_data or get_optimization_arrays.
+        """
+        self.data_in = data_in
+
+        # current costs and intake bounds, keyed by Food ID and Nutrient ID, to skip updates that change nothing
+        if is_array_data(data_in):
+            self._c = dict(zip(data_in['I'], data_in['c'].tolist()))
+            self._nl = dict(zip(data_in['J'], data_in['nl'].tolist()))
+            self._nu = dict(zip(data_in['J'], data_in['nu'].tolist()))
+        else:
+            self._c, self._nl, self._nu = dict(data_in['c']), dict(data_in['nl']), dict(data_in['nu'])
+        self._incumbent = None  # previous solution as [(variable_name, value), ...]
+        self._build(data_in)
+
+    def _build(self, data_in: dict[str, Any], track_incumbents: bool = True) -> None:
+        self.mdl, self.x = build_model(data_in)
+        food_ids = {key: i for key, i, _, _ in _iter_foods(data_in)}
+        self._vars = {i: self.x[key] for key, i in food_ids.items()}
+        self._vars_by_name = {var.name: var for var in self.x.values()}
+        self._conss = {cons.name: cons for cons in self.mdl.getConss()}
+        self._tracker = None
+        if track_incumbents:
+            self._tracker = _IncumbentTracker(self._vars)
+            self.mdl.includeEventhdlr(self._tracker, 'incumbent_tracker',
+                                      'Records the time of new incumbents and stops stalled solves')
+        self._emphasis = 'Default'
+
+    def _current_data(self) -> dict[str, Any]:
+        """The optimization data of the model, i.e., data_in with the current costs and intake bounds."""
+        data_in = self.data_in
+        if is_array_data(data_in):
+            current = {'c': [self._c[i] for i in data_in['I']], 'nl': [self._nl[j] for j in data_in['J']],
+                       'nu': [self._nu[j] for j in data_in['J']]}
+            current = {key: np.asarray(values, dtype=np.float64) for key, values in current.items()}
+        else:
+            current = {'c': dict(self._c), 'nl': dict(self._nl), 'nu': dict(self._nu)}
+        return {**data_in, **current}
+
+    def _rebuild(self, track_incumbents: bool = True) -> None:
+        """Build the model again from the current costs and intake bounds (the previous incumbent is kept by name)."""
+        self._build(self._current_data(), track_incumbents)
+
+    def _free(self) -> None:
+        """Free the model, which is built again by the next solve."""
+        self.mdl = self.x = self._tracker = None
+        self._vars, self._vars_by_name, self._conss = {}, {}, {}
+
+    def update(self, c: Mapping[Any, float] | None = None, nl: Mapping[Any, float] | None = None,
+               nu: Mapping[Any, float] | None = None) -> None:
+        """
+        Update costs and intake bounds of the model.
+
+        The foods and nutrients must be those of the model data, i.e., on presolved data (see presolve), those that
+        presolve kept (the foods it removed stay out of the model, even if new intake bounds would need them).
+
+        Parameters
+        ----------
+        c: Mapping[Any, float] | None
+            New costs as {food_id: cost}. Foods that aren't in c keep their current cost.
+        nl: Mapping[Any, float] | None
+            New Min Intake values as {nutrient_id: value}, where a null value removes the nutrient's Min Intake.
+        nu: Mapping[Any, float] | None
+            New Max Intake values as {nutrient_id: value}, where a null value removes the nutrient's Max Intake.
+
+        Raises
+        ------
+        ValueError
+            If c has foods, or nl or nu have nutrients, that aren't in the model data (nothing is changed then).
+        """
+        c, nl, nu = dict(c or {}), dict(nl or {}), dict(nu or {})
+        unknown_foods = [i for i in c if i not in self._c]
+        if unknown_foods:
+            raise ValueError(f"Unknown foods (not in the model data): {unknown_foods}")
+        unknown_nutrients = [j for j in {**nl, **nu} if j not in self._nl]
+        if unknown_nutrients:
+            raise ValueError(f"Unknown nutrients (not in the model data): {unknown_nutrients}")
+        c = {i: cost for i, cost in c.items() if not _same_value(cost, self._c[i])}
+        nl = {j: value for j, value in nl.items() if not _same_value(value, self._nl[j])}
+        nu = {j: value for j, value in nu.items() if not _same_value(value, self._nu[j])}
+        if not (c or nl or nu):
+            return
+        if self.mdl is None:
+            # the model is built again from the current costs and intake bounds before the next solve
+            self._c.update(c)
+            self._nl.update(nl)
+            self._nu.update(nu)
+            return
+
+        # the model can only be modified in the problem stage, i.e., before SCIP transforms it
+        self.mdl.freeTransform()
+
+        if c:
+            self._c.update(c)
+            self.mdl.setObjective(qs(self._c[i] * var for i, var in self._vars.items()), sense='minimize')
+
+        for j, value in nl.items():
+            cons = self._conss.get(f'C1_{j}')
+            if cons is None:
+                # the nutrient had no Min Intake so far (e.g. removed by presolve): build C1
+                if pd.notnull(value):
+                    self._conss[f'C1_{j}'] = self.mdl.addCons(self._intake(j) >= value, name=f'C1_{j}')
+            else:
+                self.mdl.chgLhs(cons, -self.mdl.infinity() if pd.isnull(value) else value)
+            self._nl[j] = value
+
+        for j, value in nu.items():
+            cons = self._conss.get(f'C2_{j}')
+            if cons is None:
+                # the nutrient had no Max Intake so far: build C2
+                if pd.notnull(value):
+                    self._conss[f'C2_{j}'] = self.mdl.addCons(self._intake(j) <= value, name=f'C2_{j}')
+            else:
+                self.mdl.chgRhs(cons, self.mdl.infinity() if pd.isnull(value) else value)
+            self._nu[j] = value
+
+    def reset_start(self) -> None:
+        """Forget the previous incumbent, so that the next solve isn't warm-started from it."""
+        self._incumbent = None
+
+    def _intake(self, j: Any) -> scip.Expr:
+        """The intake of nutrient j, from the coefficients of one of its constraints, or else from the model data."""
+        for name in (f'C1_{j}', f'C2_{j}'):
+            cons = self._conss.get(name)
+            if cons is not None:
+                coefficients = self.mdl.getValsLinear(cons)
+                return qs(quantity * self._vars_by_name[var_name] for var_name, quantity in coefficients.items())
+        coefficients = next(coefficients for j_, _, _, coefficients in _iter_nutrients(self.data_in) if j_ == j)
+        return qs(quantity * self.x[key] for key, quantity in coefficients)
+
+    def _set_params(self, params: dict[str, Any]) -> None:
+        if params['Emphasis'] != self._emphasis:
+            self.mdl.setEmphasis(SCIP_PARAMEMPHASIS.DEFAULT)  # resets all the parameters
+            if params['Emphasis'] != 'Default':
+                self.mdl.setEmphasis(EMPHASES[params['Emphasis']])
+            self._emphasis = params['Emphasis']
+        if params['Time Limit'] is not None:
+            self.mdl.setParam('limits/time', params['Time Limit'])
+        else:
+            self.mdl.resetParam('limits/time')
+        self.mdl.setParam('limits/gap', params['Mip Gap'])
+        self.mdl.setParam('parallel/maxnthreads', params['Threads'])
+
+    def _solve(self, params: dict[str, Any]) -> None:
+        """Solve the model, concurrently if params['Threads'] > 1 (see concurrent_solve_supported)."""
+        if params['Threads'] > 1:
+            self.mdl.solveConcurrent()
+        else:
+            self.mdl.optimize()
+
+    def _warm_start(self, start: pd.DataFrame | Mapping[Any, float] | np.ndarray | None
+                    ) -> tuple[list | None, bool | None]:
+        """
+        Warm-start the solve from start, or else from the previous incumbent of this session (if any), and return the
+        values of start and whether they were accepted as is (both None without start).
+        """
+        if start is not None:
+            start_values = self._start_values(start)
+            return start_values, self._add_warm_start(start_values)
+        if self._incumbent is not None:
+            self._add_start((self._vars_by_name[name], value) for name, value in self._incumbent)
+        return None, None
+
+    def _add_start(self, values: Iterable[tuple[scip.Variable, float]]) -> None:
+        """Give SCIP a starting solution, which is dropped by SCIP if it's infeasible."""
+        sol = self.mdl.createSol()
+        for var, value in values:
+            self.mdl.setSolVal(sol, var, value)
+        self.mdl.addSol(sol, free=True)
+
+    def _start_values(self, start: pd.DataFrame | Mapping[Any, float] | np.ndarray
+                      ) -> list[tuple[scip.Variable, float]]:
+        """
+        Map a prior buy table, {food_id: quantity} dict, or x array, to variables, rounding the Whole-portion foods.
+        """
+        if isinstance(start, pd.DataFrame):
+            start = dict(zip(start['Food ID'], start['Quantity']))
+        elif isinstance(start, np.ndarray):
+            if not is_array_data(self.data_in):
+                raise TypeError("An array warm start needs array model data (see get_optimization_arrays), use a dict "
+                                "as {food_id: quantity} instead")
+            if start.shape != (len(self.data_in['I']),):
+                raise ValueError(f"The array warm start should have one quantity per food ({len(self.data_in['I'])}), "
+                                 f"not shape {start.shape}")
+            start = dict(zip(self.data_in['I'], start.tolist()))
+        elif not isinstance(start, Mapping):
+            raise TypeError(f"The warm start should be a buy table, a dict or an array, not {type(start).__name__}")
+        values = []
+        for i, value in start.items():
+            var = self._vars.get(i)
+            if var is None or pd.isnull(value):
+                continue  # foods no longer in the catalog, or without a value, are left to SCIP
+            value = max(float(value), 0.0)
+            values.append((var, float(round(value)) if var.vtype() == 'INTEGER' else value))
+        return values
+
+    def _add_warm_start(self, values: list[tuple[scip.Variable, float]]) -> bool:
+        """
+        Give SCIP a starting solution from a prior one.
+
+        If values cover every food and are feasible, they're added as a complete solution. Otherwise, only the
+        Whole-portion foods are fixed in a partial solution, which SCIP then tries to complete by solving for the
+        Fractional ones (prior quantities are rounded, so they may slightly violate some intake bound).
+
+        Returns
+        -------
+        bool
+            Whether the complete solution was accepted as is.
+        """
+        sol = self.mdl.createSol()
+        for var, value in values:
+            self.mdl.setSolVal(sol, var, value)
+        if len(values) == len(self._vars) and self.mdl.checkSol(sol, original=True):
+            self.mdl.addSol(sol, free=True)
+            return True
+        self.mdl.freeSol(sol)
+
+        partial_sol = self.mdl.createPartialSol()
+        for var, value in values:
+            if var.vtype() == 'INTEGER':
+                self.mdl.setSolVal(partial_sol, var, value)
+        self.mdl.addSol(partial_sol, free=True)
+        return False
+
+    def _extends_start(self, values: list[tuple[scip.Variable, float]]) -> bool:
+        """
+        Whether SCIP found a solution that agrees with the Whole-portion foods of the warm start, which is never the
+        case without any (the partial solution then fixes nothing).
+        """
+        fixed = [(var, value) for var, value in values if var.vtype() == 'INTEGER']
+        if not fixed:
+            return False
+        return any(all(abs(self.mdl.getSolVal(sol, var) - value) <= 1e-6 for var, value in fixed)
+                   for sol in self.mdl.getSols())
+
+    def optimize(self, params: dict[str, Any], start: pd.DataFrame | Mapping[Any, float] | np.ndarray | None = None,
+                 instrumentation: Instrumentation | None = None,
+                 on_incumbent: Callable[[Incumbent], None] | None = None,
+                 artifact_dir: str | None = None, artifact_format: str = 'mps') -> dict[str, Any]:
+        """
+        Solve the model with the given solver parameters.
+
+        Parameters
+        ----------
+        params : dict[str, Any]
+            Dictionary with parameters as {param_name: value} from input data.
+        start: pd.DataFrame | Mapping[Any, float] | np.ndarray | None
+            Optional warm start, either a prior buy table (with 'Food ID' and 'Quantity' columns), a dict as
+            {food_id: quantity}, or, with array model data, the 'x' array of a prior solution (aligned with
+            data_in['I']). Quantities of Whole-portion foods are rounded. If None, the solve is warm-started
+            from the previous incumbent of this session, if any.
+        instrumentation: Instrumentation | None
+            If given, records the solver statistics.
+        on_incumbent: Callable[[Incumbent], None] | None
+            Optional callback, called with each new incumbent found during the solve (not with the warm start, nor
+            by a concurrent solve). If it raises an exception, the solve is interrupted and the exception is raised
+            again here.
+        artifact_dir: str | None
+            If given, the model and its SCIP parameters are saved, before solving, as a model artifact (see the
+            model_artifact module) in the sub-directory of artifact_dir named after the fingerprint of the model's
+            data. The kpis then report its 'Model Fingerprint'.
+        artifact_format: str
+            Format of the model file of the artifact, 'mps' or 'lp'.
+
+        Returns
+        -------
+        data_out
+            The model data after optimizing, in the same format as the output of optimize(). If start is given,
+            the kpis report whether it was accepted and the time (in seconds) to the first incumbent. If
+            params['Stall Time'] is set, they report whether the solve was 'Stopped by Stall Time' (with the
+            'userinterrupt' status), which concurrent solves never are.
+        """
+        # Initialize output data, and the parameters missing from params built by hand
+        opt_sol = {}
+        params = {**PARAMETER_DEFAULTS, **params}
+
+        # Settle the solve mode: without concurrency support, the model is solved sequentially
+        threads_used = params['Threads']
+        if threads_used > 1 and not concurrent_solve_supported():
+            warnings.warn("SCIP can't solve concurrently, solving sequentially")
+            threads_used = 1
+        solve_params = {**params, 'Threads': threads_used}
+
+        # Get a model for the solve: the model was freed after a concurrent solve (if any), and a concurrent solve finds
+        # its new incumbents in the solver's copies of the model, i.e., without the tracker
+        concurrent = threads_used > 1
+        if self.mdl is None or (concurrent and self._tracker is not None):
+            self._rebuild(track_incumbents=not concurrent)
+        mdl, x = self.mdl, self.x
+
+        # Set solver parameters, after freeing the previous solve (if any), save the model (if asked) and warm-start
+        # the solve
+        if mdl.getStage() != SCIP_STAGE.PROBLEM:
+            mdl.freeTransform()
+        self._set_params(solve_params)
+        if artifact_dir is not None:
+            fingerprint = model_fingerprint(self._current_data(), solve_params)
+            food_ids = {var.name: i for i, var in self._vars.items()}
+            write_model_artifact(mdl, f'{artifact_dir}/{fingerprint}', solve_params, fingerprint, food_ids,
+                                 fmt=artifact_format)
+        start_values, start_accepted = self._warm_start(start)
+        if self._tracker is not None:
+            self._tracker.reset(on_incumbent, params['Stall Time'])
+
+        # Optimize and retrieve the solution
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        self._solve(solve_params)
+        wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        if self._tracker is not None and self._tracker.error is not None:
+            raise self._tracker.error  # of the on_incumbent callback
+        status = mdl.getStatus()
+        print(f'Model status: {status}')
+        opt_sol['status'] = status
+        if instrumentation is not None:
+            instrumentation.record_solver_statistics(mdl)
+
+        opt_sol['vars'], opt_sol['kpis'] = {}, {}
+        if mdl.getNSols() >= 1:  # if there's at least one feasible solution...
+            x_sol = {key: mdl.getVal(var) for key, var in x.items()}
+            self._incumbent = [(x[key].name, value) for key, value in x_sol.items()]
+            if is_array_data(self.data_in):
+                x_sol = np.fromiter(x_sol.values(), dtype=np.float64, count=len(x_sol))
+            opt_sol['vars']['x'] = x_sol
+
+            final_obj = mdl.getObjVal()
+            print(f'Final objective: {final_obj}')
+            opt_sol['kpis']['Total Cost'] = round(final_obj, 2)
+
+        if params['Threads'] > 1:
+            # the CPU time of all threads over the wall time is the average number of busy threads, which measures the
+            # use of the threads rather than a speedup over a sequential solve
+            opt_sol['kpis']['Threads Used'] = threads_used
+            opt_sol['kpis']['Solve Wall Time'] = round(wall_time, 3)
+            opt_sol['kpis']['CPU Utilization'] = round(cpu_time / wall_time, 2) if wall_time > 0 else 1.0
+
+        if start is not None:
+            accepted = start_accepted or self._extends_start(start_values)
+            opt_sol['kpis']['Warm Start Accepted'] = accepted
+            if mdl.getNSols() >= 1 and self._tracker is not None:
+                # solutions known before the solve (e.g. an accepted warm start) don't trigger the tracker
+                first_incumbent = 0.0 if start_accepted or not self._tracker.times else self._tracker.times[0]
+                opt_sol['kpis']['Time to First Incumbent'] = round(first_incumbent, 3)
+
+        if params['Stall Time'] is not None:
+            opt_sol['kpis']['Stopped by Stall Time'] = self._tracker is not None and self._tracker.stalled
+
+        if artifact_dir is not None:
+            opt_sol['kpis']['Model Fingerprint'] = fingerprint
+
+        if concurrent:
+            self._free()
+
+        return opt_sol
+
+
+class _IncumbentTracker(scip.Eventhdlr):
+    """
+    Event handler that records the solving time at which each new incumbent is found, passes each one to a callback
+    (if any) and interrupts the solve once stall_time seconds have passed without a new one (if set).
+
+    Exceptions raised in an event handler are ignored by PySCIPOpt (and make SCIP fail with an unspecified error), so
+    an exception of the callback interrupts the solve and is kept in error, to be raised once the solve is over.
+    """
+
+    def __init__(self, food_vars: dict[Any, scip.Variable]):
+        self.food_vars = food_vars  # {food_id: variable}
+        self.times = []
+        self.callback = None
+        self.stall_time = None
+        self.stalled = False
+        self.error = None
+        self._events = []
+
+    def reset(self, callback: Callable[[Incumbent], None] | None = None, stall_time: float | None = None) -> None:
+        """Clear the records of the previous solve and set the callback and stall time of the next one."""
+        self.times.clear()
+        self.callback, self.stall_time, self.stalled, self.error = callback, stall_time, False, None
+
+    def eventinit(self):
+        # the stall time is checked after each node, so that nodes are only caught if there's a stall time
+        self._events = [SCIP_EVENTTYPE.BESTSOLFOUND]
+        if self.stall_time:
+            self._events.append(SCIP_EVENTTYPE.NODESOLVED)
+        for event_type in self._events:
+            self.model.catchEvent(event_type, self)
+
+    def eventexit(self):
+        for event_type in self._events:
+            self.model.dropEvent(event_type, self)
+
+    def _incumbent(self, solving_time: float) -> Incumbent:
+        sol = self.model.getBestSol()
+        food_ids, quantities = [], []
+        for i, var in self.food_vars.items():
+            quantity = round(self.model.getSolVal(sol, var), 2)
+            if quantity != 0:
+                food_ids.append(i)
+                quantities.append(quantity)
+        buy = pd.DataFrame({'Food ID': food_ids, 'Quantity': quantities})
+        buy = buy.astype({'Food ID': str, 'Quantity': 'Float64'}).sort_values(by='Food ID', ignore_index=True)
+        gap = self.model.getGap()
+        gap = float('inf') if self.model.isInfinity(gap) else gap  # e.g. before the dual bound is known
+        return Incumbent(solving_time, self.model.getSolObjVal(sol), gap, buy)
+
+    def _stop(self) -> None:
+        self.stalled = True
+        self.model.interruptSolve()
+
+    def eventexec(self, event):
+        solving_time = self.model.getSolvingTime()
+        if event.getType() == SCIP_EVENTTYPE.BESTSOLFOUND:
+            self.times.append(solving_time)
+            if self.callback is not None and self.error is None:
+                try:
+                    self.callback(self._incumbent(solving_time))
+                except Exception as e:
+                    self.error = e
+                    self.model.interruptSolve()
+                    return
+            if self.stall_time == 0:
+                self._stop()  # first feasible solution
+        elif self.model.getNSols() >= 1:
+            # solutions known before the solve (e.g. a warm start) don't trigger the tracker, so they count from 0
+            last_incumbent = self.times[-1] if self.times else 0.0
+            if solving_time - last_incumbent >= self.stall_time:
+                self._stop()
+
+
+def optimize(data_in: dict[str, Any], params: dict[str, Any],
+             start: pd.DataFrame | Mapping[Any, float] | np.ndarray | None = None,
+             instrumentation: Instrumentation | None = None,
+             on_incumbent: Callable[[Incumbent], None] | None = None,
+             artifact_dir: str | None = None, artifact_format: str = 'mps') -> dict[str, Any]:
+    """
+    Create the optimization model.
     
-    opt_sol['vars'], opt_sol['kpis'] = {}, {}
-    if mdl.getNSols() >= 1:  # if there's at least one feasible solution...
-        x_sol = {key: mdl.getVal(var) for key, var in x.items()}
-        opt_sol['vars']['x'] = x_sol
-        
-        final_obj = mdl.getObjVal()
-        print(f'Final objective: {final_obj}')
-        opt_sol['kpis']['Total Cost'] = round(final_obj, 2)
+    Parameters
+    ----------
+    data_in: dict[str, Any]
+        Dictionary with optimization input parameters as {param_name: value} according to the formulation, as
+        created by either get_optimization_data or get_optimization_arrays.
+    params : dict[str, Any]
+        Dictionary with parameters as {param_name: value} from input data.
+    start: pd.DataFrame | Mapping[Any, float] | np.ndarray | None
+        Optional warm start, either a prior buy table, a dict as {food_id: quantity} or the 'x' array of a prior
+        solution (with array model data), see ModelSession.optimize.
+    instrumentation: Instrumentation | None
+        If given, records the model build time and the solver statistics.
+    on_incumbent: Callable[[Incumbent], None] | None
+        Optional callback, called with each new incumbent found during the solve, see ModelSession.optimize.
+    artifact_dir: str | None
+        If given, the model is saved as a model artifact in a sub-directory of artifact_dir before solving, see
+        ModelSession.optimize.
+    artifact_format: str
+        Format of the model file of the artifact, 'mps' or 'lp'.
     
-    return opt_sol
+    Returns
+    -------
+    data_out
+        The model data after optimizing, including status and variables' values. If data_in holds arrays, the values
+        of 'x' are an array aligned with data_in['I'], otherwise they're a dict as {food_id: value}.
+    """
+    with phase(instrumentation, 'Model Build'):
+        session = ModelSession(data_in)
+    return session.optimize(params, start=start, instrumentation=instrumentation, on_incumbent=on_incumbent,
+                            artifact_dir=artifact_dir, artifact_format=artifact_format)
@@ -0,0 +1,165 @@
+"""
+Model artifacts: a built diet_problem model saved to disk, so that a (slow) solve can be replayed offline.
+
+An artifact is a directory, named after the fingerprint of the optimization data (see solution_cache.model_fingerprint),
+with:
+- model.mps.gz (or model.lp.gz): the model, compressed with gzip (SCIP reads compressed files, but can't write them),
+  with generic names (x0, x1, ... and c0, c1, ...), since the MPS and LP formats can't hold any name (e.g. with spaces).
+- params.set: the SCIP parameters of the solve, i.e., the settings changed by the solver parameters of the input data.
+- artifact.json: the solver parameters of the input data, the fingerprint, the version of mip_start and the Food ID of
+  each variable (by position, i.e., 'foods'[k] is the Food ID of variable xk).
+
+Replaying an artifact reads the model and parameters into SCIP and solves it, without building the model and without
+importing pandas or ticdat, so that SCIP settings can be benchmarked on real instances.
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from typing import Any
+
+import pyscipopt as scip
+
+from mip_start import __version__
+
+
+ARTIFACT_FORMATS = ('mps', 'lp')
+METADATA_FILE = 'artifact.json'
+PARAMS_FILE = 'params.set'
+
+
+def _model_file(directory: str, fmt: str) -> str:
+    return os.path.join(directory, f'model.{fmt}.gz')
+
+
+def write_model_artifact(mdl: scip.Model, directory: str, params: dict[str, Any], fingerprint: str,
+                         food_ids: Mapping[str, Any], fmt: str = 'mps') -> str:
+    """
+    Write the model (before it's solved), its SCIP parameters and its metadata to directory.
+
+    Parameters
+    ----------
+    mdl: scip.Model
+        The model, with the SCIP parameters of the solve already set (its original problem is written).
+    directory: str
+        Directory of the artifact, created if it doesn't exist (files of a previous artifact are overwritten).
+    params: dict[str, Any]
+        Dictionary with parameters as {param_name: value} from input data.
+    fingerprint: str
+        Fingerprint of the optimization data of the model.
+    food_ids: Mapping[str, Any]
+        Food ID of each purchase variable, as {variable_name: food_id}.
+    fmt: str
+        Format of the model file, among ARTIFACT_FORMATS.
+
+    Returns
+    -------
+    str
+        The directory of the artifact.
+    """
+    if fmt not in ARTIFACT_FORMATS:
+        raise ValueError(f"Unknown model format {fmt!r}, should be among {ARTIFACT_FORMATS}")
+    os.makedirs(directory, exist_ok=True)
+
+    # the model is written uncompressed to a temporary file, then compressed into the artifact
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_file = os.path.join(tmp_dir, f'model.{fmt}')
+        mdl.writeProblem(tmp_file, genericnames=True, verbose=False)
+        with open(tmp_file, 'rb') as source, gzip.open(_model_file(directory, fmt), 'wb') as target:
+            shutil.copyfileobj(source, target)
+    mdl.writeParams(os.path.join(directory, PARAMS_FILE), onlychanged=True)
+
+    # generic names are given by the position of the variables in the model
+    foods = [food_ids.get(var.name) for var in mdl.getVars()]
+    metadata = {'fingerprint': fingerprint, 'version': __version__, 'format': fmt, 'params': params,
+                'foods': [None if i is None else str(i) for i in foods]}
+    with open(os.path.join(directory, METADATA_FILE), 'w') as file:
+        json.dump(metadata, file, default=str)
+    return directory
+
+
+def read_model_artifact(directory: str, quiet: bool = False) -> tuple[scip.Model, dict[str, Any]]:
+    """
+    Read the model of an artifact, with its SCIP parameters set, and its metadata (see write_model_artifact). If quiet,
+    the solver's output is hidden.
+    """
+    with open(os.path.join(directory, METADATA_FILE)) as file:
+        metadata = json.load(file)
+    mdl = scip.Model('diet_problem')
+    if quiet:
+        mdl.hideOutput()
+    mdl.readProblem(_model_file(directory, metadata['format']))
+    mdl.readParams(os.path.join(directory, PARAMS_FILE))
+    return mdl, metadata
+
+
+def replay_model_artifact(directory: str, scip_params: Mapping[str, Any] | None = None,
+                          quiet: bool = False) -> dict[str, Any]:
+    """
+    Solve the model of an artifact again, optionally with other SCIP settings.
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the artifact, see write_model_artifact.
+    scip_params: Mapping[str, Any] | None
+        SCIP parameters to set on top of those of the artifact, as {name: value}, e.g. {'limits/time': 60}.
+    quiet: bool
+        If True, the solver's log isn't printed.
+
+    Returns
+    -------
+    dict[str, Any]
+        The 'fingerprint' of the artifact, the 'status' of the solve, its 'solving_time' (in seconds), and, if there's
+        a feasible solution, its 'objective' and purchase quantities as {food_id: quantity} ('x').
+    """
+    mdl, metadata = read_model_artifact(directory, quiet=quiet)
+    if scip_params:
+        mdl.setParams(dict(scip_params))
+    if metadata['params'].get('Threads', 1) > 1:
+        mdl.solveConcurrent()
+    else:
+        mdl.optimize()
+
+    result = {'fingerprint': metadata['fingerprint'], 'status': mdl.getStatus(), 'solving_time': mdl.getSolvingTime()}
+    if mdl.getNSols() >= 1:
+        # variables without coefficients aren't written in LP files, they're zero
+        x = dict.fromkeys((i for i in metadata['foods'] if i is not None), 0.0)
+        for var in mdl.getVars():
+            i = metadata['foods'][int(var.name.removeprefix('x'))]
+            if i is not None:
+                x[i] = mdl.getVal(var)
+        result['objective'] = mdl.getObjVal()
+        result['x'] = x
+    return result
+
+
+def _scip_param(assignment: str) -> tuple[str, Any]:
+    """Parse a 'name=value' SCIP parameter, where value is a JSON number or boolean, or else a string."""
+    name, _, value = assignment.partition('=')
+    try:
+        return name.strip(), json.loads(value)
+    except json.JSONDecodeError:
+        return name.strip(), value
+
+
+def replay_main(args: list[str] | None = None) -> None:
+    """
+    Command line entry point of the replay of model artifacts, see `python -m mip_start replay --help`.
+
+    Each artifact is solved again and a summary of its solve is printed as a JSON line.
+    """
+    parser = argparse.ArgumentParser(prog='python -m mip_start replay', description=replay_main.__doc__)
+    parser.add_argument('artifacts', nargs='+', help="Directories of the model artifacts")
+    parser.add_argument('-s', '--set', dest='scip_params', action='append', type=_scip_param, default=[],
+                        metavar='NAME=VALUE', help="SCIP parameter to set, e.g. limits/time=60 (repeatable)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Don't print the solver's log")
+    parsed = parser.parse_args(args)
+
+    for directory in parsed.artifacts:
+        result = replay_model_artifact(directory, dict(parsed.scip_params), quiet=parsed.quiet)
+        summary = {key: value for key, value in result.items() if key != 'x'}
+        print(json.dumps({'artifact': directory, **summary}))
@@ -0,0 +1,40 @@
+"""
+Worker processes that solve many variations (e.g. scenarios or profiles) of the same optimization data, each one
+reusing its model across the variations it solves, see the batch and profiles engines.
+
+The variations aren't warm-started from each other: which one a worker solved before depends on the scheduling of the
+pool, so, with a 'Mip Gap' or a 'Time Limit', their solutions would depend on the number of workers and change from
+run to run.
+"""
+from typing import Any
+
+from mip_start.input_data import is_array_data
+from mip_start.model import ModelSession
+
+
+# Optimization data shared by all the scenarios, set once per worker process by _init_worker (along with its costs and
+# intake bounds as {id: value}, to which the scenarios that don't override them are reset), and the model built from
+# it by the worker's first scenario, which is reused by the following ones
+_shared_model_data: dict[str, Any] = {}
+_shared_values: dict[str, dict[Any, float]] = {}
+_session: ModelSession | None = None
+
+
+def _init_worker(model_data: dict[str, Any]) -> None:
+    global _shared_model_data, _shared_values
+    _shared_model_data = model_data
+    if is_array_data(model_data):
+        _shared_values = {key: dict(zip(model_data['I' if key == 'c' else 'J'], model_data[key].tolist()))
+                          for key in ('c', 'nl', 'nu')}
+    else:
+        _shared_values = {key: model_data[key] for key in ('c', 'nl', 'nu')}
+
+
+def _optimize_scenario(overrides: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+    """Solve the shared optimization data of this worker updated with the scenario overrides."""
+    global _session
+    if _session is None:
+        _session = ModelSession(_shared_model_data)
+    _session.update(**{key: overrides.get(key, _shared_values[key]) for key in ('c', 'nl', 'nu')})
+    _session.reset_start()
+    return _session.optimize(params)
@@ -3,23 +3,110 @@ Module to read the outputs from the model and create output data.
 """
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from mip_start.input_data import is_array_data
 from mip_start.schemas import output_schema
 
 
-def create_output_tables(dat, data_in: dict[str, Any], data_out: dict[str, Any]):
+def _positions(index: pd.Index, values: pd.Series) -> np.ndarray:
+    """
+    Same as index.get_indexer(values), on the unique values only: much lighter on long columns with few unique values,
+    whose values (e.g. Arrow strings) aren't converted to Python objects.
+    """
+    codes, uniques = pd.factorize(values)
+    positions = np.append(index.get_indexer(uniques), -1)  # the code of null values is -1
+    return positions[codes]
+
+
+def _nutrient_totals(dat, food_ids: np.ndarray, quantities: np.ndarray) -> tuple[pd.Index, np.ndarray]:
+    """
+    Total quantity of each nutrient provided by buying the given quantities of foods.
+
+    The totals are the product of the sparse (nutrient x food) matrix of foods_nutrients, in coordinate form, and the
+    quantities vector. Only the nutrients that appear in foods_nutrients for any of the foods are returned.
+    """
+    foods_nutrients = dat.foods_nutrients
+    food_codes = _positions(pd.Index(food_ids), foods_nutrients['Food ID'])
+    known = food_codes >= 0
+    nutrient_codes, nutrient_ids = pd.factorize(foods_nutrients['Nutrient ID'][known])
+    nutrient_quantities = foods_nutrients['Quantity'].to_numpy(dtype=np.float64)[known]
+    totals = np.bincount(nutrient_codes, weights=nutrient_quantities * quantities[food_codes[known]],
+                         minlength=len(nutrient_ids))
+    return pd.Index(nutrient_ids), totals
+
+
+def _nutrient_totals_from_matrix(data_in: dict[str, Any], quantities: np.ndarray) -> tuple[pd.Index, np.ndarray]:
+    """Same as _nutrient_totals, from the CSRMatrix of array model data (which has no zero quantities)."""
+    nq = data_in['nq']
+    if not len(quantities):  # no solution
+        return pd.Index([]), np.zeros(0)
+    rows = np.repeat(np.arange(nq.shape[0]), np.diff(nq.indptr))
+    totals = np.bincount(rows, weights=nq.data * quantities[nq.indices], minlength=nq.shape[0])
+    provided = np.diff(nq.indptr) > 0
+    return pd.Index(data_in['J'][provided]), totals[provided]
+
+
+def nutrient_contributions(dat, buy: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contribution of each purchased food to each nutrient, i.e. its purchased quantity times its nutrient quantity.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema.
+    buy: pd.DataFrame
+        Purchased foods, as the 'buy' table of output schema.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per pair of foods_nutrients whose food is in buy, sorted as buy, with columns 'Food ID', 'Food Name',
+        'Nutrient ID', 'Nutrient Name', 'Purchase Quantity', 'Nutrient per unit' and 'Contribution'.
+    """
+    # only the rows of foods_nutrients whose food is in buy are taken, rather than whole columns
+    foods_nutrients = dat.foods_nutrients
+    rows = np.flatnonzero(foods_nutrients['Food ID'].isin(buy['Food ID']).to_numpy())
+    food_codes = pd.Index(buy['Food ID']).get_indexer(foods_nutrients['Food ID'].take(rows))
+    order = np.argsort(food_codes, kind='stable')
+    rows, food_codes = rows[order], food_codes[order]
+
+    nutrient_ids = foods_nutrients['Nutrient ID'].take(rows).to_numpy()
+    nutrient_names = dat.nutrients.set_index('Nutrient ID')['Nutrient Name'].reindex(nutrient_ids)
+    purchase_quantity = buy['Quantity'].to_numpy(dtype=np.float64, na_value=np.nan)[food_codes]
+    nutrient_per_unit = foods_nutrients['Quantity'].take(rows).to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'Food ID': buy['Food ID'].to_numpy()[food_codes],
+        'Food Name': buy['Food Name'].to_numpy()[food_codes],
+        'Nutrient ID': nutrient_ids,
+        'Nutrient Name': nutrient_names.to_numpy(),
+        'Purchase Quantity': purchase_quantity,
+        'Nutrient per unit': nutrient_per_unit,
+        'Contribution': purchase_quantity * nutrient_per_unit,
+    })
+
+
+def create_output_tables(dat, data_in: dict[str, Any], data_out: dict[str, Any], drop_zero_purchases: bool = False,
+                         totals_from_model_data: bool = False):
     """
     Receives input and optimization data to create output tables.
-    
+
     Parameters
     ----------
     dat
         Input data, according to input schema.
     data_in
-        Input data to the optimization model data, in the form {param_name: value}.
+        Input data to the optimization model data, in the form {param_name: value}, as created by either
+        get_optimization_data or get_optimization_arrays.
     data_out
         Output data from the optimization model.
+    drop_zero_purchases: bool
+        If True, the foods whose (rounded) purchased quantity is zero are left out of the 'buy' table.
+    totals_from_model_data: bool
+        If True, the nutrient totals of the 'nutrition' table are computed from the quantities of data_in, which must
+        have been created by get_optimization_arrays, instead of dat.foods_nutrients (e.g. when foods_nutrients was
+        streamed into data_in, see the streaming module). Nutrients with only zero quantities are then left out.
     """
     # Instantiate output schema object
     sln = output_schema.PanDat()
@@ -30,27 +117,33 @@ def create_output_tables(dat, data_in: dict[str, Any], data_out: dict[str, Any])
     # Populate the kpis table
     kpis_df = pd.DataFrame(data=list(data_out['kpis'].items()), columns=['Name', 'Value'])
     sln.kpis = kpis_df
-    
+
     # Populate the buy table
-    x_df = pd.DataFrame(data=list(x_sol.items()), columns=['Food ID', 'Quantity'])
-    buy_df = x_df.merge(dat.foods[['Food ID', 'Food Name']], on='Food ID', how='left')
+    if is_array_data(data_in) and len(x_sol):
+        food_ids, quantities = data_in['I'], np.asarray(x_sol, dtype=np.float64)
+    else:
+        food_ids = np.array(list(x_sol), dtype=object)
+        quantities = np.fromiter(x_sol.values(), dtype=np.float64, count=len(x_sol))
+    food_names = dat.foods.set_index('Food ID')['Food Name'].reindex(food_ids)
+    buy_df = pd.DataFrame({'Food ID': food_ids, 'Quantity': quantities, 'Food Name': food_names.to_numpy()})
     buy_df = buy_df.astype({'Food ID': str, 'Food Name': str, 'Quantity': 'Float64'})
     buy_df = buy_df.sort_values(by='Food ID', ascending=True, ignore_index=True)
-    sln.buy = buy_df.round({'Quantity': 2})
-
-    # Populate the nutrition table
-    foods_nutrients_df = dat.foods_nutrients[['Food ID', 'Nutrient ID', 'Quantity']]
-    foods_nutrients_df = foods_nutrients_df.rename(columns={'Quantity': 'Quantity per Food'})
-    # merge buy and foods nutrients to get total nutrients of the diet
-    nutrition_df = buy_df.merge(foods_nutrients_df, on='Food ID', how='left')
-    nutrition_df['Quantity'] = nutrition_df['Quantity'] * nutrition_df['Quantity per Food']
-    nutrition_df = nutrition_df[['Nutrient ID', 'Quantity']].groupby('Nutrient ID').agg('sum').reset_index()
-    # merge nutrition with nutrients to get additional columns
-    nutrients_df = dat.nutrients[['Nutrient ID', 'Nutrient Name', 'Min Intake', 'Max Intake']]
-    nutrition_df = nutrition_df.merge(nutrients_df, on='Nutrient ID', how='left')
+    buy_df = buy_df.round({'Quantity': 2})
+    if drop_zero_purchases:
+        buy_df = buy_df[buy_df['Quantity'] != 0].reset_index(drop=True)
+    sln.buy = buy_df
+
+    # Populate the nutrition table: total nutrients of the diet, with additional columns from the nutrients table
+    if totals_from_model_data:
+        nutrient_ids, totals = _nutrient_totals_from_matrix(data_in, quantities)
+    else:
+        nutrient_ids, totals = _nutrient_totals(dat, food_ids, quantities)
+    nutrients_df = dat.nutrients.set_index('Nutrient ID')[['Nutrient Name', 'Min Intake', 'Max Intake']]
+    nutrition_df = nutrients_df.reindex(nutrient_ids).rename_axis('Nutrient ID').reset_index()
+    nutrition_df.insert(1, 'Quantity', totals)
     nutrition_df = nutrition_df.astype({'Nutrient ID': str, 'Nutrient Name': str, 'Quantity': 'Float64',
                                         'Min Intake': 'Float64', 'Max Intake': 'Float64'})
     nutrition_df = nutrition_df.sort_values(by='Nutrient ID', ascending=True, ignore_index=True)
     sln.nutrition = nutrition_df.round({'Quantity': 2})
-    
-    return sln
\ No newline at end of file
+
+    return sln
@@ -0,0 +1,180 @@
+"""
+Data-level presolve: reductions of the optimization data that shrink the model without changing its optimal cost.
+
+Since costs, nutrient quantities and intake bounds are all non-negative, the following can be removed before building
+the model:
+- Trivially satisfied constraints: C1 of nutrients whose 'Min Intake' is zero, and C2 of nutrients that no remaining
+  food provides. Nutrients left without constraints are removed altogether.
+- Foods with no contributions, i.e., that provide none of the nutrients with a C1 constraint: buying them only costs
+  and adds to the nutrients with a C2 constraint, so they aren't bought.
+- Dominated foods: food k is dominated by food i of the same Portion if i costs no more than k, provides at least as
+  much of every nutrient with a C1 constraint and at most as much of every nutrient with a C2 constraint. Buying i
+  instead of k is then feasible and no costlier, so k isn't needed. Among identical foods, the first one is kept.
+
+The reduced data has the same form as the original (see get_optimization_data and get_optimization_arrays), with
+the removed C1 constraints as a null 'Min Intake'. The solution of the reduced model is mapped back to all the foods
+by postsolve, with zero quantities for the removed ones.
+"""
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from mip_start.input_data import CSRMatrix, is_array_data, to_optimization_arrays
+
+
+REMOVED_COLUMNS = ['Type', 'ID', 'Reason', 'Dominated By']
+
+
+class PresolveResult(NamedTuple):
+    """Reduced optimization data, the record of what was removed, and what's needed to map a solution back."""
+    data_in: dict[str, Any]
+    removed: pd.DataFrame  # one row per removed food or constraint, with columns REMOVED_COLUMNS
+    original: dict[str, Any]
+    food_codes: np.ndarray  # positions of the remaining foods in the original foods
+
+
+def _from_arrays(arrays: dict[str, Any], food_codes: np.ndarray, nutrient_codes: np.ndarray, nl: np.ndarray,
+                 nu: np.ndarray, like: dict[str, Any]) -> dict[str, Any]:
+    """Data of the given foods and nutrients of arrays, with the intake bounds nl and nu, in the same form as like."""
+    nq = arrays['nq']
+    rows = np.repeat(np.arange(nq.shape[0]), np.diff(nq.indptr))
+    new_food_codes = np.full(nq.shape[1], -1)
+    new_food_codes[food_codes] = np.arange(len(food_codes))
+    new_nutrient_codes = np.full(nq.shape[0], -1)
+    new_nutrient_codes[nutrient_codes] = np.arange(len(nutrient_codes))
+    keep = (new_food_codes[nq.indices] >= 0) & (new_nutrient_codes[rows] >= 0)
+    food_ids, nutrient_ids = arrays['I'][food_codes], arrays['J'][nutrient_codes]
+
+    if is_array_data(like):
+        return {**like, 'I': food_ids, 'J': nutrient_ids, 'nl': nl[nutrient_codes], 'nu': nu[nutrient_codes],
+                'c': arrays['c'][food_codes], 'vtypes': arrays['vtypes'][food_codes],
+                'nq': CSRMatrix.from_coo(rows=new_nutrient_codes[rows[keep]],
+                                         cols=new_food_codes[nq.indices[keep]], values=nq.data[keep],
+                                         shape=(len(nutrient_codes), len(food_codes)))}
+    return {**like, 'I': set(food_ids), 'J': set(nutrient_ids),
+            'nl': dict(zip(nutrient_ids, nl[nutrient_codes].tolist())),
+            'nu': dict(zip(nutrient_ids, nu[nutrient_codes].tolist())),
+            'c': {i: like['c'][i] for i in food_ids}, 'vtypes': {i: like['vtypes'][i] for i in food_ids},
+            'nq': dict(zip(zip(arrays['I'][nq.indices[keep]], arrays['J'][rows[keep]]), nq.data[keep].tolist()))}
+
+
+def _dominated_foods(costs: np.ndarray, vtypes: np.ndarray, at_least: np.ndarray,
+                     at_most: np.ndarray) -> dict[int, int]:
+    """
+    Find the dominated foods, as {dominated: dominating}, given the (food x nutrient) dense matrices of quantities
+    at_least (of the nutrients that a dominating food must provide at least as much of) and at_most.
+
+    The candidates to dominate a food are the foods that provide at least as much of its most selective nutrient,
+    i.e. the one with the fewest such foods, which are found by binary search in the foods sorted by quantity.
+    """
+    n_foods, n_nutrients = at_least.shape
+    # for each nutrient, the foods sorted by decreasing quantity, and the number of foods providing at least as much
+    # of it as each food
+    order = np.argsort(-at_least, axis=0, kind='stable')
+    sorted_quantities = -np.take_along_axis(at_least, order, axis=0)
+    n_candidates = np.full((n_foods, n_nutrients), n_foods)
+    for j in range(n_nutrients):
+        n_candidates[:, j] = np.searchsorted(sorted_quantities[:, j], -at_least[:, j], side='right')
+    n_candidates[at_least <= 0] = n_foods
+    selective = n_candidates.argmin(axis=1)
+
+    dominated = {}
+    for k in range(n_foods):
+        j = selective[k]
+        candidates = order[:n_candidates[k, j], j]
+        candidates = candidates[(costs[candidates] <= costs[k]) & (vtypes[candidates] == vtypes[k])
+                                & (candidates != k)]
+        if not len(candidates):
+            continue
+        candidates = candidates[(at_least[candidates] >= at_least[k]).all(axis=1)
+                                & (at_most[candidates] <= at_most[k]).all(axis=1)]
+        # identical foods dominate each other: only the ones before k dominate it
+        identical = ((costs[candidates] == costs[k]) & (at_least[candidates] == at_least[k]).all(axis=1)
+                     & (at_most[candidates] == at_most[k]).all(axis=1))
+        candidates = candidates[~identical | (candidates < k)]
+        if len(candidates):
+            dominated[k] = int(candidates.min())
+    return dominated
+
+
+def presolve(data_in: dict[str, Any], dominance: bool = True) -> PresolveResult:
+    """
+    Remove trivially satisfied constraints, foods with no contributions and dominated foods from data_in.
+
+    Parameters
+    ----------
+    data_in: dict[str, Any]
+        Dictionary with optimization input parameters as {param_name: value} according to the formulation, as
+        created by either get_optimization_data or get_optimization_arrays.
+    dominance: bool
+        Whether to remove dominated foods. Finding them uses dense (food x nutrient) matrices of the nutrients with
+        some constraint.
+
+    Returns
+    -------
+    PresolveResult
+        The reduced data, in the same form as data_in, and the record of the removed foods and constraints.
+    """
+    arrays = to_optimization_arrays(data_in)
+    nl, nu, nq = arrays['nl'].copy(), arrays['nu'].copy(), arrays['nq']
+    food_ids, nutrient_ids = arrays['I'], arrays['J']
+    removed = []
+
+    # C1 of a nutrient with no 'Min Intake' is satisfied by any (non-negative) purchase
+    trivial_c1 = ~(nl > 0)
+    removed += [('Constraint', f'C1_{j}', 'Trivially Satisfied', None)
+                for j in nutrient_ids[trivial_c1 & ~np.isnan(nl)]]
+    nl[trivial_c1] = np.nan
+
+    # foods that provide none of the nutrients with a C1 constraint aren't bought
+    rows = np.repeat(np.arange(nq.shape[0]), np.diff(nq.indptr))
+    contributes = np.zeros(nq.shape[1], dtype=bool)
+    contributes[nq.indices[~trivial_c1[rows] & (nq.data > 0)]] = True
+    removed += [('Food', i, 'No Contributions', None) for i in food_ids[~contributes]]
+    food_codes = np.flatnonzero(contributes)
+
+    if dominance and len(food_codes):
+        constrained = np.flatnonzero(~trivial_c1 | ~np.isnan(nu))
+        dense = np.zeros((nq.shape[1], len(constrained)))
+        column = np.full(nq.shape[0], -1)
+        column[constrained] = np.arange(len(constrained))
+        entries = column[rows] >= 0
+        dense[nq.indices[entries], column[rows[entries]]] = nq.data[entries]
+        dense = dense[food_codes]
+        at_least = np.where(~trivial_c1[constrained], dense, 0.0)
+        at_most = np.where(~np.isnan(nu[constrained]), dense, 0.0)
+        dominated = _dominated_foods(arrays['c'][food_codes], arrays['vtypes'][food_codes], at_least, at_most)
+        removed += [('Food', food_ids[food_codes[k]], 'Dominated', food_ids[food_codes[i]])
+                    for k, i in dominated.items()]
+        food_codes = np.delete(food_codes, list(dominated))
+
+    # C2 of a nutrient that none of the remaining foods provides is satisfied, as 'Max Intake' is non-negative
+    remaining = np.zeros(nq.shape[1], dtype=bool)
+    remaining[food_codes] = True
+    provided = np.zeros(nq.shape[0], dtype=bool)
+    provided[rows[remaining[nq.indices] & (nq.data > 0)]] = True
+    trivial_c2 = ~np.isnan(nu) & ~provided
+    removed += [('Constraint', f'C2_{j}', 'Trivially Satisfied', None) for j in nutrient_ids[trivial_c2]]
+    nu[trivial_c2] = np.nan
+
+    nutrient_codes = np.flatnonzero(~np.isnan(nl) | ~np.isnan(nu))
+    reduced = _from_arrays(arrays, food_codes, nutrient_codes, nl, nu, like=data_in)
+    return PresolveResult(reduced, pd.DataFrame(removed, columns=REMOVED_COLUMNS), data_in, food_codes)
+
+
+def postsolve(result: PresolveResult, data_out: dict[str, Any]) -> dict[str, Any]:
+    """
+    Map the output of the model built from result.data_in back to the original data, i.e. add the removed foods to
+    the solution with a zero quantity.
+    """
+    x_sol = data_out['vars'].get('x')
+    if x_sol is None:
+        return data_out
+    original = result.original
+    if is_array_data(original):
+        x_full = np.zeros(len(original['I']))
+        x_full[result.food_codes] = np.asarray(x_sol, dtype=np.float64)
+    else:
+        x_full = {**dict.fromkeys(original['I'], 0.0), **x_sol}
+    return {**data_out, 'vars': {**data_out['vars'], 'x': x_full}}
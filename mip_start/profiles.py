@@ -0,0 +1,130 @@
+"""
+Profiles engine to solve one diet per population profile against the same foods and foods_nutrients.
+
+A profile (a row of the profiles table) overrides the Min and Max Intake of some nutrients (its rows of the
+profiles_nutrients table), the other nutrients keep the bounds of the nutrients table. The shared input data is typed,
+checked and turned into (array) optimization data only once, then each profile is solved by updating the intake bounds
+of a reused model: sequentially in this process, or in parallel by worker processes (see the model_workers module).
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from mwcommons.exceptions import InputDataError
+from mwcommons.ticdat_utils import set_parameters_datatypes
+
+from mip_start.columnar_io import read_data, write_data
+from mip_start.input_data import get_optimization_arrays
+from mip_start.model import ModelSession
+from mip_start.model_workers import _init_worker, _optimize_scenario
+from mip_start.output_data import create_output_tables
+from mip_start.schemas import input_schema, output_schema
+from mip_start.validation import ValidationCache, validate_input
+
+
+def _profile_bounds(dat, model_data: dict[str, Any]) -> dict[Any, tuple[np.ndarray, np.ndarray]]:
+    """Min and Max Intake of the nutrients (ordered as model_data['J']) of each profile, as {profile: (nl, nu)}."""
+    nutrient_index = pd.Index(model_data['J'])
+    rows_by_profile = dict(tuple(dat.profiles_nutrients.groupby('Profile ID', sort=False)))
+    bounds = {}
+    for profile in dat.profiles['Profile ID']:
+        nl, nu = model_data['nl'].copy(), model_data['nu'].copy()
+        rows = rows_by_profile.get(profile)
+        if rows is not None:
+            codes = nutrient_index.get_indexer(rows['Nutrient ID'])
+            nl[codes] = rows['Min Intake'].to_numpy(dtype=np.float64)
+            nu[codes] = rows['Max Intake'].to_numpy(dtype=np.float64, na_value=np.nan)
+        bounds[profile] = nl, nu
+    return bounds
+
+
+def profiles_solve(dat, max_workers: int | None = 1, validation_cache: ValidationCache | None = None,
+                   fast_validation: bool = False):
+    """
+    Solve one instance of the diet problem per profile of the profiles table, sharing the foods and nutrients data.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema, with at least one profile.
+    max_workers: int | None
+        If 1, the profiles are solved sequentially in this process, by updating the intake bounds of a single model.
+        Otherwise, they're solved in parallel by this number of worker processes (the number of processors of the
+        machine if None), each one reusing its model across profiles.
+    validation_cache: ValidationCache | None
+        Optional cache of validated input tables, see main.solve.
+    fast_validation: bool
+        If True, the input data is checked with vectorized operations, see main.solve.
+
+    Returns
+    -------
+    sln
+        Output data, according to output schema, with the kpis, buy and nutrition tables of each profile in the
+        profile_kpis, profile_buy and profile_nutrition tables (keyed by 'Profile ID'). The nutrition totals are
+        computed from the optimization data, so the nutrients with only zero quantities are left out.
+    """
+    dat = validate_input(dat, cache=validation_cache, fast=fast_validation)
+    if dat.profiles.empty:
+        raise InputDataError("The profiles table is empty, there's no profile to solve")
+
+    params = input_schema.create_full_parameters_dict(dat)
+    params = set_parameters_datatypes(params=params, schema=input_schema)
+
+    # Index the shared data once: the profiles only change the intake bounds
+    model_data = get_optimization_arrays(dat, params)
+    bounds = _profile_bounds(dat, model_data)
+    overrides = {profile: {'nl': dict(zip(model_data['J'], nl.tolist())),
+                           'nu': dict(zip(model_data['J'], nu.tolist()))} for profile, (nl, nu) in bounds.items()}
+
+    if max_workers == 1:
+        session, model_sols = ModelSession(model_data), {}
+        for profile, profile_overrides in overrides.items():
+            session.update(**profile_overrides)
+            session.reset_start()  # as in parallel, see the model_workers module
+            model_sols[profile] = session.optimize(params)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(model_data,)) as executor:
+            futures = {profile: executor.submit(_optimize_scenario, profile_overrides, params)
+                       for profile, profile_overrides in overrides.items()}
+            model_sols = {profile: future.result() for profile, future in futures.items()}
+
+    # Populate output tables, keyed by profile
+    nutrient_codes = pd.Index(model_data['J']).get_indexer(dat.nutrients['Nutrient ID'])
+    tables = {'profile_kpis': [], 'profile_buy': [], 'profile_nutrition': []}
+    for profile, (nl, nu) in bounds.items():
+        nutrients = dat.nutrients.assign(**{'Min Intake': nl[nutrient_codes], 'Max Intake': nu[nutrient_codes]})
+        profile_dat = input_schema.PanDat(foods=dat.foods, nutrients=nutrients)
+        profile_sln = create_output_tables(profile_dat, {**model_data, 'nl': nl, 'nu': nu}, model_sols[profile],
+                                           totals_from_model_data=True)
+        for table in tables:
+            df = getattr(profile_sln, table.removeprefix('profile_'))
+            tables[table].append(df.assign(**{'Profile ID': profile}))
+
+    sln = output_schema.PanDat()
+    for table, dfs in tables.items():
+        fields = list(output_schema.primary_key_fields[table]) + list(output_schema.data_fields[table])
+        setattr(sln, table, pd.concat(dfs, ignore_index=True)[fields])
+    return sln
+
+
+def profiles_main(args: list[str] | None = None) -> None:
+    """
+    Command line entry point of the profiles engine, see `python -m mip_start profiles --help`.
+
+    The solutions of all the profiles are written to the profile_kpis, profile_buy and profile_nutrition tables of
+    the output data.
+    """
+    parser = argparse.ArgumentParser(prog='python -m mip_start profiles', description=profiles_main.__doc__)
+    parser.add_argument('-i', '--input', required=True,
+                        help="Input data file or directory (xlsx, json, csv dir, .parquet_dir or .arrow_dir)")
+    parser.add_argument('-o', '--output', default='output.xlsx',
+                        help="Output data file or directory (xlsx, json, csv dir, .parquet_dir or .arrow_dir)")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="Number of worker processes (1 to solve the profiles sequentially)")
+    parsed = parser.parse_args(args)
+
+    dat = read_data(parsed.input, input_schema)
+    sln = profiles_solve(dat, max_workers=parsed.workers)
+    write_data(sln, parsed.output, output_schema)
@@ -4,7 +4,7 @@ For more details on how to implement and configure data schemas see:
 https://github.com/mipwise/mip-go/tree/main/5_develop/4_data_schema
 """
 import pandas as pd
-from mwcommons.ticdat_types import non_negative_float, text
+from mwcommons.ticdat_types import non_negative_float, positive_integer, text
 from ticdat import PanDatFactory
 
 from mip_start.constants import Portions
@@ -17,6 +17,9 @@ input_schema = PanDatFactory(
     foods=[['Food ID'], ['Food Name', 'Per Unit Cost', 'Portion']],
     nutrients=[['Nutrient ID'], ['Nutrient Name', 'Min Intake', 'Max Intake']],
     foods_nutrients=[['Food ID', 'Nutrient ID'], ['Quantity']],
+    # optional diet profiles, solved by the profiles engine, each one with its own intake bounds for some nutrients
+    profiles=[['Profile ID'], ['Profile Name']],
+    profiles_nutrients=[['Profile ID', 'Nutrient ID'], ['Min Intake', 'Max Intake']],
 )
 # endregion
 
@@ -24,6 +27,10 @@ input_schema = PanDatFactory(
 input_schema.add_parameter('Food Cost Multiplier', default_value=1.5, **non_negative_float())
 input_schema.add_parameter('Time Limit', default_value=None, nullable=True, **non_negative_float())
 input_schema.add_parameter('Mip Gap', default_value=0.001, **non_negative_float(max=1.0, inclusive_max=False))
+input_schema.add_parameter('Threads', default_value=1, **positive_integer())
+input_schema.add_parameter('Emphasis', default_value='Default',
+                           **text(('Default', 'Feasibility', 'Optimality', 'Easy CIP', 'Hard LP')))
+input_schema.add_parameter('Stall Time', default_value=None, nullable=True, **non_negative_float())
 # endregion
 
 # region OUTPUT SCHEMA
@@ -31,6 +38,10 @@ output_schema = PanDatFactory(
     kpis=[['Name'], ['Value']],
     buy=[['Food ID'], ['Food Name', 'Quantity']],
     nutrition=[['Nutrient ID'], ['Nutrient Name', 'Quantity', 'Min Intake', 'Max Intake']],
+    # outputs of the profiles engine, one solution per diet profile
+    profile_kpis=[['Profile ID', 'Name'], ['Value']],
+    profile_buy=[['Profile ID', 'Food ID'], ['Food Name', 'Quantity']],
+    profile_nutrition=[['Profile ID', 'Nutrient ID'], ['Nutrient Name', 'Quantity', 'Min Intake', 'Max Intake']],
 )
 # endregion
 
@@ -50,6 +61,7 @@ input_schema.set_data_type(table=table, field='Nutrient ID', **text())
 input_schema.set_data_type(table=table, field='Nutrient Name', **text())
 input_schema.set_data_type(table=table, field='Min Intake', **non_negative_float())
 input_schema.set_data_type(table=table, field='Max Intake', **non_negative_float(), nullable=True)
+# element-wise operators only, so that the fast validation can evaluate the predicate on the whole table at once
 input_schema.add_data_row_predicate(
     table=table,
     predicate_name='Min Intake <= Max Intake',
@@ -66,6 +78,27 @@ input_schema.add_foreign_key(native_table=table, foreign_table='foods', mappings
 input_schema.add_foreign_key(native_table=table, foreign_table='nutrients', mappings=[('Nutrient ID', 'Nutrient ID')])
 # endregion
 
+# region profiles
+table = 'profiles'
+input_schema.set_data_type(table=table, field='Profile ID', **text())
+input_schema.set_data_type(table=table, field='Profile Name', **text())
+# endregion
+
+# region profiles_nutrients
+table = 'profiles_nutrients'
+for field in ['Profile ID', 'Nutrient ID']:
+    input_schema.set_data_type(table=table, field=field, **text())
+input_schema.set_data_type(table=table, field='Min Intake', **non_negative_float())
+input_schema.set_data_type(table=table, field='Max Intake', **non_negative_float(), nullable=True)
+input_schema.add_data_row_predicate(
+    table=table,
+    predicate_name='Min Intake <= Max Intake',
+    predicate=lambda row: pd.isna(row['Max Intake']) | (row['Min Intake'] <= row['Max Intake'])
+)
+input_schema.add_foreign_key(native_table=table, foreign_table='profiles', mappings=[('Profile ID', 'Profile ID')])
+input_schema.add_foreign_key(native_table=table, foreign_table='nutrients', mappings=[('Nutrient ID', 'Nutrient ID')])
+# endregion
+
 # endregion
 
 # region DATA TYPES AND PREDICATES - OUTPUT SCHEMA
@@ -92,4 +125,25 @@ output_schema.set_data_type(table=table, field='Name', **text())
 # we don't set a datatype for kpis.Value, since it may contain any type of data
 # endregion
 
+# region profile_kpis
+table = 'profile_kpis'
+for field in ['Profile ID', 'Name']:
+    output_schema.set_data_type(table=table, field=field, **text())
+# endregion
+
+# region profile_buy
+table = 'profile_buy'
+for field in ['Profile ID', 'Food ID', 'Food Name']:
+    output_schema.set_data_type(table=table, field=field, **text())
+output_schema.set_data_type(table=table, field='Quantity', **non_negative_float())
+# endregion
+
+# region profile_nutrition
+table = 'profile_nutrition'
+for field in ['Profile ID', 'Nutrient ID', 'Nutrient Name']:
+    output_schema.set_data_type(table=table, field=field, **text())
+for field in ['Quantity', 'Min Intake', 'Max Intake']:
+    output_schema.set_data_type(table=table, field=field, **non_negative_float())
+# endregion
+
 # endregion
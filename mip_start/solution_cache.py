@@ -0,0 +1,107 @@
+"""
+On-disk cache of model solutions, keyed by a canonical fingerprint of the optimization data and the solver parameters
+that the solution depends on.
+
+The fingerprint doesn't depend on the order of the foods and nutrients, on the zero quantities of foods_nutrients, or
+on the parameters that don't change the model, so solving again input data that only differs in those reuses the
+previous solution. What's cached is the solution of the model (its status, objective and variables' values, but not
+the kpis of the solve that found it), from which the output tables are built again with the current input data (e.g.
+with its current food names). Only solutions that are optimal, or within the requested 'Mip Gap', are cached.
+"""
+import hashlib
+from typing import Any
+
+import numpy as np
+
+from mip_start import __version__
+from mip_start.disk_cache import DiskCache, default_cache_dir
+from mip_start.input_data import to_optimization_arrays
+
+
+# parameters of the solver that change what a cached solution is valid for ('Time Limit', 'Threads', 'Emphasis' and
+# 'Stall Time' don't, since only optimal solutions and solutions within the gap are cached)
+SOLVER_PARAMETERS = ['Mip Gap']
+CACHED_STATUSES = ('optimal', 'gaplimit')
+
+
+class SolutionCache(DiskCache):
+    """On-disk cache of model solutions, keyed by model_fingerprint, with least-recently-used eviction."""
+
+    def __init__(self, directory: str | None = None, max_bytes: int = 2 ** 30, max_entries: int | None = None):
+        """
+        Parameters
+        ----------
+        directory: str | None
+            Directory of the cache, defaults to the 'solutions' sub-directory of $MIP_START_CACHE_DIR (or of
+            ~/.cache/mip_start).
+        max_bytes: int
+            Maximum total size of the cache, in bytes.
+        max_entries: int | None
+            Maximum number of entries, unbounded if None.
+        """
+        super().__init__(directory or default_cache_dir('solutions'), max_bytes=max_bytes, max_entries=max_entries)
+
+    def get_solution(self, key: str) -> dict[str, Any] | None:
+        """
+        Cached solution of key as the output of model.optimize, whose only kpi is the 'Total Cost', or None if it's
+        not cached.
+        """
+        cached = self.get(key)
+        if cached is None or 'objective' not in cached:  # entries cached with their kpis are solved again
+            return None
+        kpis = {} if cached['objective'] is None else {'Total Cost': cached['objective']}
+        return {'status': cached['status'], 'vars': dict(cached['vars']), 'kpis': kpis}
+
+    def put_solution(self, key: str, model_sol: dict[str, Any]) -> None:
+        """
+        Cache the solution of model_sol (the output of model.optimize) as key, i.e., its status, 'Total Cost' and
+        variables' values, leaving out the other kpis, which describe the solve that found it (e.g. its presolve,
+        warm start or threads).
+        """
+        self.put(key, {'status': model_sol['status'], 'objective': model_sol['kpis'].get('Total Cost'),
+                       'vars': model_sol['vars']})
+
+
+def _canonical_floats(values: np.ndarray) -> bytes:
+    # a single NaN and zero, whatever their bit patterns
+    values = np.where(np.isnan(values), np.nan, values + 0.0)
+    return values.tobytes()
+
+
+def _canonical_ids(ids: np.ndarray) -> bytes:
+    return '\x1f'.join(map(str, ids)).encode()
+
+
+def model_fingerprint(data_in: dict[str, Any], params: dict[str, Any]) -> str:
+    """
+    Canonical hash of the optimization data and of the solver parameters of SOLVER_PARAMETERS.
+
+    Parameters
+    ----------
+    data_in: dict[str, Any]
+        Dictionary with optimization input parameters as {param_name: value} according to the formulation, as
+        created by either get_optimization_data or get_optimization_arrays (both give the same fingerprint).
+    params : dict[str, Any]
+        Dictionary with parameters as {param_name: value} from input data.
+    """
+    arrays = to_optimization_arrays(data_in)
+    food_order = np.argsort(arrays['I'], kind='stable')
+    nutrient_order = np.argsort(arrays['J'], kind='stable')
+    food_position, nutrient_position = np.argsort(food_order), np.argsort(nutrient_order)
+
+    # nonzero quantities as (nutrient, food, quantity), in the order of the sorted IDs
+    nq = arrays['nq']
+    rows = nutrient_position[np.repeat(np.arange(nq.shape[0]), np.diff(nq.indptr))]
+    cols = food_position[nq.indices]
+    order = np.lexsort((cols, rows))
+
+    digest = hashlib.blake2b(digest_size=16)
+    for part in [__version__.encode(), repr([(name, float(params[name])) for name in SOLVER_PARAMETERS]).encode(),
+                 _canonical_ids(arrays['I'][food_order]), _canonical_floats(arrays['c'][food_order]),
+                 _canonical_ids(arrays['vtypes'][food_order]), _canonical_ids(arrays['J'][nutrient_order]),
+                 _canonical_floats(arrays['nl'][nutrient_order]), _canonical_floats(arrays['nu'][nutrient_order]),
+                 rows[order].astype(np.int64).tobytes(), cols[order].astype(np.int64).tobytes(),
+                 _canonical_floats(nq.data[order])]:
+        digest.update(len(part).to_bytes(8, 'little'))
+        digest.update(part)
+    return digest.hexdigest()
@@ -0,0 +1,226 @@
+"""
+Streaming ingestion of the foods_nutrients table, for catalogs whose foods_nutrients table doesn't fit in memory.
+
+The foods_nutrients table is read from a CSV, Parquet or Arrow IPC file in chunks of rows. Each chunk is typed and
+checked against input schema (data types, foreign keys to the foods and nutrients tables, and duplicates), then its
+nonzero quantities are added to the sparse matrix of the array model data (see get_optimization_arrays) as integer
+codes. The chunk itself is dropped right away, so the memory used besides the model data is proportional to the chunk
+size. The other tables are small, and are read and validated as usual.
+
+Parquet and Arrow IPC files require the optional dependency pyarrow (`pip install mip_start[columnar]`).
+"""
+import argparse
+import os
+from collections.abc import Iterator
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from mwcommons.exceptions import InputDataError
+from mwcommons.ticdat_utils import set_parameters_datatypes
+
+from mip_start.columnar_io import _import_pyarrow, _table_path, is_columnar, read_data, write_data
+from mip_start.input_data import CSRMatrix, get_optimization_arrays
+from mip_start.model import optimize
+from mip_start.output_data import create_output_tables
+from mip_start.schemas import input_schema, output_schema
+from mip_start.validation import (_raise_failures, _set_data_types, _sub_pan_dat, find_data_type_failures,
+                                  find_duplicates, validate_input)
+
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+TABLE = 'foods_nutrients'
+
+
+def _foods_nutrients_path(data_loc: str) -> str:
+    """Path of the foods_nutrients file, given either the file itself or a csv, .parquet_dir or .arrow_dir directory."""
+    if not os.path.isdir(data_loc):
+        return data_loc
+    return _table_path(data_loc, TABLE) if is_columnar(data_loc) else os.path.join(data_loc, f'{TABLE}.csv')
+
+
+def iter_chunks(data_loc: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Read the foods_nutrients table of data_loc in chunks of at most chunk_size rows, indexed by their row number.
+
+    Parameters
+    ----------
+    data_loc: str
+        A CSV (.csv), Parquet (.parquet) or Arrow IPC (.arrow) file, or a csv, .parquet_dir or .arrow_dir directory
+        with a foods_nutrients file.
+    chunk_size: int
+        Maximum number of rows of a chunk.
+    """
+    path = _foods_nutrients_path(data_loc)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No foods_nutrients file at {path}")
+    if path.endswith('.parquet'):
+        pa = _import_pyarrow()
+        batches = (batch.to_pandas() for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    elif path.endswith('.arrow'):
+        batches = _iter_arrow_batches(path, chunk_size)
+    else:
+        batches = pd.read_csv(path, chunksize=chunk_size)
+
+    start = 0
+    for chunk in batches:
+        if not len(chunk):
+            continue
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def _iter_arrow_batches(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    pa = _import_pyarrow()
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size).to_pandas()
+
+
+def _check_chunk(chunk: pd.DataFrame, food_index: pd.Index,
+                 nutrient_index: pd.Index) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Type the chunk of foods_nutrients and check it against input schema, with the foreign keys found as positions in
+    food_index and nutrient_index.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, np.ndarray, np.ndarray]
+        The typed chunk and the positions of its foods and nutrients.
+    """
+    chunk_dat = input_schema.PanDat()
+    setattr(chunk_dat, TABLE, chunk.reset_index(drop=True))
+    typed = getattr(_set_data_types(chunk_dat, [TABLE]), TABLE)
+    typed.index = chunk.index
+    setattr(chunk_dat, TABLE, typed)
+    codes = {'Food ID': food_index.get_indexer(typed['Food ID']),
+             'Nutrient ID': nutrient_index.get_indexer(typed['Nutrient ID'])}
+
+    rows = f"in rows {chunk.index[0]} to {chunk.index[-1]} of {TABLE}"
+    foreign_key_failures = {}
+    for fk in input_schema.foreign_keys:
+        if fk.native_table == TABLE and (codes[fk.mapping.native_field] < 0).any():
+            foreign_key_failures[fk] = typed[codes[fk.mapping.native_field] < 0]
+    _raise_failures(foreign_key_failures, f"Foreign key failures {rows}")
+    _raise_failures(find_data_type_failures(chunk_dat), f"Data type failures {rows}")
+    _raise_failures(find_duplicates(chunk_dat), f"Duplicates {rows}")
+    return typed, codes['Food ID'], codes['Nutrient ID']
+
+
+def _check_duplicates(nq: CSRMatrix) -> None:
+    """Raise if some (nutrient, food) pair appears twice in nq, i.e. if it's repeated in different chunks."""
+    if nq.nnz < 2:
+        return
+    repeated = np.diff(nq.indices) == 0
+    row_starts = nq.indptr[1:-1] - 1
+    repeated[row_starts[(row_starts >= 0) & (row_starts < nq.nnz - 1)]] = False
+    if repeated.any():
+        raise InputDataError(f"Duplicates found in {TABLE}: {int(repeated.sum())} (Food ID, Nutrient ID) pair(s) "
+                             f"appear in more than one chunk")
+
+
+def get_optimization_arrays_streaming(dat, params: dict[str, Any], foods_nutrients_loc: str,
+                                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, Any]:
+    """
+    Same as get_optimization_arrays, with the foods_nutrients table streamed from foods_nutrients_loc.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema, already typed and checked. Its foods_nutrients table is ignored.
+    params : dict[str, Any]
+        Dictionary with parameters as {param_name: value}.
+    foods_nutrients_loc: str
+        Location of the foods_nutrients table, see iter_chunks.
+    chunk_size: int
+        Number of rows of foods_nutrients read, typed and checked at once.
+
+    Returns
+    -------
+    data_in
+        Dictionary with optimization parameters as {param_name: value}, see get_optimization_arrays.
+
+    Raises
+    ------
+    InputDataError
+        If a chunk of foods_nutrients fails any of the checks of input schema. Pairs repeated in different chunks are
+        detected among the nonzero quantities.
+    """
+    model_data = get_optimization_arrays(_sub_pan_dat(dat, ['parameters', 'foods', 'nutrients']), params)
+    food_index, nutrient_index = pd.Index(model_data['I']), pd.Index(model_data['J'])
+
+    rows, cols, values = [], [], []
+    n_rows = n_chunks = 0
+    for chunk in iter_chunks(foods_nutrients_loc, chunk_size):
+        chunk, food_codes, nutrient_codes = _check_chunk(chunk, food_index, nutrient_index)
+        quantities = chunk['Quantity'].to_numpy(dtype=np.float64)
+        nonzero = quantities != 0
+        rows.append(nutrient_codes[nonzero].astype(np.int32))
+        cols.append(food_codes[nonzero].astype(np.int32))
+        values.append(quantities[nonzero])
+        n_rows, n_chunks = n_rows + len(chunk), n_chunks + 1
+
+    nnz = sum(len(chunk_values) for chunk_values in values)
+    print(f"Read {n_rows} rows of {TABLE} in {n_chunks} chunk(s), {nnz} nonzero quantities")
+    # concatenate the chunks' arrays one at a time, dropping each list right away
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int32)
+    values = np.concatenate(values) if values else np.zeros(0)
+    model_data['nq'] = CSRMatrix.from_coo(rows, cols, values, shape=(len(model_data['J']), len(model_data['I'])))
+    _check_duplicates(model_data['nq'])
+    return model_data
+
+
+def solve_streaming(dat, foods_nutrients_loc: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Solve engine with the foods_nutrients table streamed from foods_nutrients_loc, see main.solve.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema, without foods_nutrients (i.e. with an empty foods_nutrients table).
+    foods_nutrients_loc: str
+        Location of the foods_nutrients table, see iter_chunks.
+    chunk_size: int
+        Number of rows of foods_nutrients read, typed and checked at once.
+
+    Returns
+    -------
+    sln
+        Output data, according to output schema. The 'nutrition' table leaves out the nutrients that have only zero
+        quantities in foods_nutrients.
+    """
+    if len(getattr(dat, TABLE)):
+        raise ValueError(f"dat should have an empty {TABLE} table, which is read from foods_nutrients_loc instead")
+    dat = validate_input(dat, fast=True)
+    params = set_parameters_datatypes(params=input_schema.create_full_parameters_dict(dat), schema=input_schema)
+    model_data = get_optimization_arrays_streaming(dat, params, foods_nutrients_loc, chunk_size)
+    model_sol = optimize(model_data, params)
+    return create_output_tables(dat, model_data, model_sol, totals_from_model_data=True)
+
+
+def stream_main(args: list[str] | None = None) -> None:
+    """
+    Command line entry point of the solve engine with the foods_nutrients table streamed in chunks, see
+    `python -m mip_start stream --help`.
+
+    The input data holds every table but foods_nutrients, which is read from its own CSV, Parquet or Arrow IPC file.
+    """
+    parser = argparse.ArgumentParser(prog='python -m mip_start stream', description=stream_main.__doc__)
+    parser.add_argument('-i', '--input', required=True,
+                        help="Input data without foods_nutrients (xlsx, json, csv dir, .parquet_dir or .arrow_dir)")
+    parser.add_argument('-f', '--foods-nutrients', required=True,
+                        help="foods_nutrients file (.csv, .parquet or .arrow)")
+    parser.add_argument('-o', '--output', default='output.xlsx',
+                        help="Output data file or directory (xlsx, json, csv dir, .parquet_dir or .arrow_dir)")
+    parser.add_argument('-c', '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Number of rows of foods_nutrients read at once")
+    parsed = parser.parse_args(args)
+
+    dat = read_data(parsed.input, input_schema)
+    sln = solve_streaming(dat, parsed.foods_nutrients, parsed.chunk_size)
+    write_data(sln, parsed.output, output_schema)
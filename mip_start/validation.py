@@ -0,0 +1,377 @@
+"""
+Validation of the input data (data types setting and integrity checks), with an optional cache and a fast mode.
+
+The cache is keyed by a content hash of each input table, so unchanged tables are neither re-typed nor re-checked:
+only the changed tables go through set_data_types and the per-table checks (data types, row predicates and
+duplicates), and only the foreign keys that involve a changed table are checked again.
+
+The fast mode evaluates the same checks as ticdat (and with the same output) as whole-column pandas/NumPy operations,
+instead of row by row.
+"""
+import hashlib
+from collections import namedtuple
+from numbers import Number
+
+import numpy as np
+import pandas as pd
+from mwcommons.exceptions import InputDataError
+from mwcommons.ticdat_utils import check_data, print_failures, set_data_types
+
+from mip_start import __version__
+from mip_start.disk_cache import DiskCache, default_cache_dir
+from mip_start.instrumentation import Instrumentation, phase
+from mip_start.schemas import input_schema
+
+
+def hash_table(df: pd.DataFrame) -> str:
+    """Fast content hash of a DataFrame, sensitive to its values, columns, and dtypes (but not its index)."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16)
+    digest.update(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode())
+    return digest.hexdigest()
+
+
+def _schema_hash(schema) -> str:
+    """Hash of the schema definitions that validation depends on, so that changing them invalidates the cache."""
+    definitions = (
+        __version__,
+        sorted(schema.schema().items()),
+        sorted((table, sorted(fields.items())) for table, fields in schema.data_types.items()),
+        sorted(map(repr, schema.foreign_keys)),
+        sorted((table, sorted(predicates)) for table, predicates in schema._data_row_predicates.items()),
+    )
+    return hashlib.blake2b(repr(definitions).encode(), digest_size=8).hexdigest()
+
+
+class ValidationCache(DiskCache):
+    """
+    On-disk cache of validated input tables, with least-recently-used eviction.
+
+    It stores the typed version of each table that passed the per-table checks, keyed by the hash of the raw table,
+    and markers for the foreign keys that passed, keyed by the hashes of the tables involved.
+    """
+
+    def __init__(self, directory: str | None = None, max_bytes: int = 2 * 2 ** 30, max_entries: int | None = None):
+        """
+        Parameters
+        ----------
+        directory: str | None
+            Directory of the cache, defaults to the 'validation' sub-directory of $MIP_START_CACHE_DIR (or of
+            ~/.cache/mip_start).
+        max_bytes: int
+            Maximum total size of the cache, in bytes.
+        max_entries: int | None
+            Maximum number of entries, unbounded if None.
+        """
+        super().__init__(directory or default_cache_dir('validation'), max_bytes=max_bytes, max_entries=max_entries)
+
+
+# region FAST CHECKS
+# Keys of the failure dictionaries, equal to the ones returned by ticdat's PanDatFactory.find_* methods
+TableField = namedtuple('TableField', ['table', 'field'])
+TablePredicateName = namedtuple('TablePredicateName', ['table', 'predicate_name'])
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+def _is_string(value) -> bool:
+    return all(hasattr(value, attr) for attr in ('lower', 'upper', 'strip'))
+
+
+def _invalid_data(series: pd.Series, type_dictionary) -> pd.Series:
+    """Vectorized negation of ticdat's TypeDictionary.valid_data, applied to each element of series."""
+    if type_dictionary.datetime:
+        return ~series.apply(lambda value: type_dictionary.valid_data(None if pd.isnull(value) else value))
+
+    is_null = series.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(series.dtype):
+        is_number = is_string = np.zeros(len(series), dtype=bool)
+    elif pd.api.types.is_numeric_dtype(series.dtype):
+        is_number, is_string = ~is_null, np.zeros(len(series), dtype=bool)
+    elif isinstance(series.dtype, pd.StringDtype):
+        is_number, is_string = np.zeros(len(series), dtype=bool), ~is_null
+    else:  # object columns may mix types, classify each value
+        is_number = series.map(_is_number).to_numpy(dtype=bool) & ~is_null
+        is_string = series.map(_is_string).to_numpy(dtype=bool) & ~is_null
+
+    invalid = is_null & (not type_dictionary.nullable)
+    invalid |= ~(is_null | is_number | is_string)
+
+    if is_number.any():
+        if not type_dictionary.number_allowed:
+            invalid |= is_number
+        else:
+            values = pd.to_numeric(series.where(is_number), errors='coerce').to_numpy(dtype=np.float64)
+            with np.errstate(invalid='ignore'):
+                bad_number = (values < type_dictionary.min) | (values > type_dictionary.max)
+                if not type_dictionary.inclusive_min:
+                    bad_number |= values == type_dictionary.min
+                if not type_dictionary.inclusive_max:
+                    bad_number |= values == type_dictionary.max
+                if type_dictionary.must_be_int:
+                    infinite_max = (values == type_dictionary.max == float('inf')) & type_dictionary.inclusive_max
+                    bad_number |= (np.floor(values) != values) & ~infinite_max
+            invalid |= is_number & bad_number
+
+    if is_string.any() and type_dictionary.strings_allowed != '*':
+        invalid |= is_string & ~series.isin(type_dictionary.strings_allowed).to_numpy()
+
+    return pd.Series(invalid, index=series.index)
+
+
+def find_data_type_failures(dat, schema=input_schema) -> dict:
+    """Vectorized equivalent of schema.find_data_type_failures(dat)."""
+    failures = {}
+    for table, type_row in schema._true_data_types().items():
+        df = getattr(dat, table)
+        for field, type_dictionary in type_row.items():
+            invalid = _invalid_data(df[field], type_dictionary)
+            if invalid.any():
+                failures[TableField(table, field)] = df[invalid].copy()
+    return failures
+
+
+def _parameter_failures(df: pd.DataFrame, schema) -> pd.Series:
+    """Rows of the parameters table that fail ticdat's 'Good Name/Value Check' predicate."""
+    name_field, value_field = schema.primary_key_fields['parameters'][0], schema.data_fields['parameters'][0]
+    invalid = pd.Series(~df[name_field].isin(list(schema.parameters)), index=df.index)
+    for name, parameter in schema.parameters.items():
+        is_name = (df[name_field] == name).to_numpy()
+        if parameter.type_dictionary is not None and is_name.any():
+            invalid[is_name] = _invalid_data(df.loc[is_name, value_field], parameter.type_dictionary).to_numpy()
+    return invalid
+
+
+def find_data_row_failures(dat, schema=input_schema) -> dict:
+    """
+    Vectorized equivalent of schema.find_data_row_failures(dat).
+
+    Each row predicate is first evaluated on the whole table, which works for predicates written with element-wise
+    operators (e.g. `|` instead of `or`). Predicates that fail to do so, or that have a predicate_kwargs_maker or an
+    "Error Message" failure response, are evaluated by ticdat, row by row.
+    """
+    failures, ticdat_predicates = {}, {}
+    for table, predicates in schema._data_row_predicates.items():
+        df = getattr(dat, table)
+        for predicate_name, info in predicates.items():
+            result = None
+            if info.predicate_kwargs_maker is None and info.predicate_failure_response == 'Boolean':
+                try:
+                    result = info.predicate(df)
+                except Exception:
+                    pass
+            if isinstance(result, pd.Series) and result.index.equals(df.index) and result.dtype == bool:
+                if not result.all():
+                    failures[TablePredicateName(table, predicate_name)] = df[~result].copy()
+            else:
+                ticdat_predicates.setdefault(table, []).append(predicate_name)
+
+    if ticdat_predicates:
+        slow_failures = schema.find_data_row_failures(_sub_pan_dat(dat, ticdat_predicates, schema))
+        failures.update({key: df for key, df in slow_failures.items()
+                         if key.predicate_name in ticdat_predicates.get(key.table, ())})
+
+    if schema.parameters:
+        parameters_df = getattr(dat, 'parameters')
+        invalid = _parameter_failures(parameters_df, schema)
+        if invalid.any():
+            predicate_name = 'Good Name/Value Check'
+            failures[TablePredicateName('parameters', predicate_name)] = parameters_df[invalid].copy()
+    return failures
+
+
+def _fk_mappings(fk) -> list:
+    """The field mappings of a foreign key, whose mapping is a single one, or a tuple of them for multiple fields."""
+    return [fk.mapping] if hasattr(fk.mapping, 'native_field') else list(fk.mapping)
+
+
+def find_foreign_key_failures(dat, schema=input_schema) -> dict:
+    """Vectorized equivalent of schema.find_foreign_key_failures(dat)."""
+    failures = {}
+    for fk in schema.foreign_keys:
+        native_df, foreign_df = getattr(dat, fk.native_table), getattr(dat, fk.foreign_table)
+        mappings = _fk_mappings(fk)
+        native_fields = [mapping.native_field for mapping in mappings]
+        foreign_fields = [mapping.foreign_field for mapping in mappings]
+        if len(mappings) == 1:
+            found = native_df[native_fields[0]].isin(foreign_df[foreign_fields[0]])
+        else:
+            foreign_keys = pd.MultiIndex.from_frame(foreign_df[foreign_fields])
+            found = pd.Series(pd.MultiIndex.from_frame(native_df[native_fields]).isin(foreign_keys),
+                              index=native_df.index)
+        if not found.all():
+            failures[fk] = native_df[~found.to_numpy()]
+    return failures
+
+
+def find_duplicates(dat, schema=input_schema) -> dict:
+    """Equivalent of schema.find_duplicates(dat)."""
+    failures = {}
+    for table in schema.all_tables:
+        if schema.primary_key_fields.get(table):
+            df = getattr(dat, table)
+            duplicated = df.duplicated(list(schema.primary_key_fields[table]), keep='first')
+            if duplicated.any():
+                failures[table] = df[duplicated.to_numpy()]
+    return failures
+
+
+def check_data_fast(dat, schema=input_schema) -> None:
+    """Same as mwcommons.ticdat_utils.check_data, with the vectorized checks of this module."""
+    print("Running data integrity check...")
+    if not schema.good_pan_dat_object(dat):
+        raise InputDataError("Not a good PanDat object")
+    _raise_failures(find_foreign_key_failures(dat, schema), "Foreign key failures", schema)
+    _raise_failures(find_data_type_failures(dat, schema), "Data type failures", schema)
+    _raise_failures(find_data_row_failures(dat, schema), "Data row failures", schema)
+    _raise_failures(find_duplicates(dat, schema), "Duplicates", schema)
+    print("Data is good!")
+# endregion
+
+
+def _is_typed(series: pd.Series, type_dictionary) -> bool:
+    """Whether set_data_types would leave series unchanged, according to the field's type_dictionary."""
+    if type_dictionary.datetime:
+        return pd.api.types.is_datetime64_any_dtype(series.dtype)
+    if type_dictionary.strings_allowed:
+        if not isinstance(series.dtype, pd.StringDtype) or series.isna().any():
+            return False
+        # set_data_types writes numeric strings as integers, e.g. '10.0' as '10'
+        maybe_number = series[series.str.match(r'\s*[+\-]?(\d|\.\d|inf|nan)', case=False)]
+        numbers = pd.to_numeric(maybe_number, errors='coerce').dropna()
+        return numbers.empty or maybe_number[numbers.index].equals(numbers.astype(int).astype(str))
+    if type_dictionary.number_allowed:
+        return series.dtype == (np.int64 if type_dictionary.must_be_int else np.float64)
+    return True
+
+
+def _set_data_types(dat, tables, schema=input_schema):
+    """
+    PanDat of schema with the given tables of dat typed as by set_data_types, and the remaining tables empty.
+
+    Tables that are already typed (e.g. read from Parquet or Arrow data written after set_data_types) are only copied.
+    """
+    data_types = schema.schema(include_ancillary_info=True)['data_types']
+    typed_dat, untyped = schema.PanDat(), []
+    for table in tables:
+        df = getattr(dat, table)
+        if df.index.equals(pd.RangeIndex(len(df))) and all(
+                _is_typed(df[field], type_dictionary) for field, type_dictionary in data_types.get(table, {}).items()):
+            setattr(typed_dat, table, df.copy())
+        else:
+            untyped.append(table)
+    if untyped:
+        untyped_dat = set_data_types(dat=_sub_pan_dat(dat, untyped, schema), schema=schema)
+        for table in untyped:
+            setattr(typed_dat, table, getattr(untyped_dat, table))
+    return typed_dat
+
+
+def _sub_pan_dat(dat, tables, schema=input_schema):
+    """PanDat of schema with the given tables of dat (not copied), and the remaining tables empty."""
+    sub_dat = schema.PanDat()
+    for table in tables:
+        setattr(sub_dat, table, getattr(dat, table))
+    return sub_dat
+
+
+def _raise_failures(failures: dict, message: str, schema=input_schema) -> None:
+    if failures:
+        print_failures(schema, failures)
+        raise InputDataError(f"{message} found in {len(failures)} table(s)/field(s).")
+
+
+def validate_input(dat, cache: ValidationCache | None = None, force: bool = False, fast: bool = False,
+                   instrumentation: Instrumentation | None = None):
+    """
+    Set the data types of the input data and check it, according to input schema.
+
+    Parameters
+    ----------
+    dat
+        Input data, according to input schema.
+    cache: ValidationCache | None
+        Cache of validated tables. If None, all the tables are typed and checked.
+    force: bool
+        If True, all the tables are typed and checked even if they're cached (the cache is then refreshed).
+    fast: bool
+        If True, use the vectorized checks of this module instead of ticdat's.
+    instrumentation: Instrumentation | None
+        If given, records the time spent setting data types and checking data.
+
+    Returns
+    -------
+    dat
+        A copy of the input data with the data types set.
+
+    Raises
+    ------
+    InputDataError
+        If dat fails any of the checks, as mwcommons.ticdat_utils.check_data.
+    """
+    if not input_schema.good_pan_dat_object(dat):
+        raise InputDataError("dat is not a good PanDat object")
+
+    if cache is None:
+        with phase(instrumentation, 'Set Data Types'):
+            dat = _set_data_types(dat, input_schema.all_tables)
+        with phase(instrumentation, 'Check Data'):
+            if fast:
+                check_data_fast(dat, input_schema)
+            else:
+                check_data(dat, input_schema)
+        return dat
+
+    schema_hash = _schema_hash(input_schema)
+    hashes = {table: hash_table(getattr(dat, table)) for table in input_schema.all_tables}
+    table_keys = {table: f'table-{schema_hash}-{table}-{hashes[table]}' for table in input_schema.all_tables}
+
+    # Set data types of the tables that aren't cached
+    typed_dat, changed = input_schema.PanDat(), []
+    for table, key in table_keys.items():
+        typed_df = None if force else cache.get(key)
+        if typed_df is None:
+            changed.append(table)
+        else:
+            setattr(typed_dat, table, typed_df)
+    with phase(instrumentation, 'Set Data Types'):
+        if changed:
+            changed_dat = _set_data_types(dat, changed)
+            for table in changed:
+                setattr(typed_dat, table, getattr(changed_dat, table))
+
+    # Check the foreign keys that involve a changed table, then the changed tables themselves, in the same order as
+    # check_data does
+    with phase(instrumentation, 'Check Data'):
+        print("Running data integrity check...")
+        fk_keys = {}
+        for fk in input_schema.foreign_keys:
+            native_fields = '-'.join(mapping.native_field for mapping in _fk_mappings(fk))
+            fk_key = (f'fk-{schema_hash}-{fk.native_table}-{fk.foreign_table}-{native_fields}-'
+                      f'{hashes[fk.native_table]}-{hashes[fk.foreign_table]}')
+            if force or fk_key not in cache:
+                fk_keys[fk] = fk_key
+        if fk_keys:
+            failures = (find_foreign_key_failures if fast else input_schema.find_foreign_key_failures)(typed_dat)
+            _raise_failures({fk: df for fk, df in failures.items() if fk in fk_keys}, "Foreign key failures")
+
+        changed_dat = _sub_pan_dat(typed_dat, changed)
+        if fast:
+            _raise_failures(find_data_type_failures(changed_dat), "Data type failures")
+            _raise_failures(find_data_row_failures(changed_dat), "Data row failures")
+            _raise_failures(find_duplicates(changed_dat), "Duplicates")
+        else:
+            _raise_failures(input_schema.find_data_type_failures(changed_dat), "Data type failures")
+            _raise_failures(input_schema.find_data_row_failures(changed_dat), "Data row failures")
+            _raise_failures(input_schema.find_duplicates(changed_dat), "Duplicates")
+        print("Data is good!")
+
+    # Everything passed, cache what was validated now
+    for table in changed:
+        cache.put(table_keys[table], getattr(typed_dat, table))
+    for fk_key in fk_keys.values():
+        cache.put(fk_key, True)
+
+    return typed_dat
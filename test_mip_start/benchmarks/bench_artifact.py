@@ -0,0 +1,51 @@
+"""
+Benchmark of model artifacts: wall time of solving synthetic data with the solve engine (validation, model data, model
+build and solve) vs. replaying its saved model artifact (reading the compressed model and solving it), and the size of
+the artifact. All the foods are Fractional, so that the solve itself is quick. Run it from the root folder of the
+repository with:
+    python test_mip_start/benchmarks/bench_artifact.py
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from mip_start.main import solve
+from mip_start.model_artifact import replay_model_artifact
+from synthetic import generate_dat
+
+
+SIZES = [(1_000, 50), (5_000, 100), (20_000, 200)]
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # the solver's log
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--density', type=float, default=0.1, help="Fraction of nonzero foods_nutrients pairs")
+    parsed = parser.parse_args(args)
+
+    print(f"{'foods':>8} {'nutrients':>10} {'solve (s)':>10} {'replay (s)':>11} {'speedup':>8} {'artifact (MB)':>14}")
+    for n_foods, n_nutrients in SIZES:
+        dat = generate_dat(n_foods, n_nutrients, density=parsed.density, whole_fraction=0.0)
+        dat.parameters = pd.DataFrame({'Name': ['Time Limit'], 'Value': [60.0]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sln, solve_time = _timed(solve, dat, artifact_dir=tmp_dir)
+            artifact = os.path.join(tmp_dir, sln.kpis.set_index('Name').loc['Model Fingerprint', 'Value'])
+            _, replay_time = _timed(replay_model_artifact, artifact, quiet=True)
+            size = sum(entry.stat().st_size for entry in os.scandir(artifact)) / 2 ** 20
+        print(f"{n_foods:>8} {n_nutrients:>10} {solve_time:>10.2f} {replay_time:>11.2f} "
+              f"{solve_time / replay_time:>7.1f}x {size:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
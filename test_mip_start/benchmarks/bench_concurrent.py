@@ -0,0 +1,45 @@
+"""
+Benchmark of SCIP's concurrent solve: wall time of a solve with 1, 2 and 4 threads, on synthetic data with mostly
+Whole-portion foods. Run it from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_concurrent.py
+"""
+import argparse
+import time
+
+from mwcommons.ticdat_utils import set_data_types, set_parameters_datatypes
+
+from mip_start.input_data import get_optimization_arrays
+from mip_start.model import ModelSession
+from mip_start.schemas import input_schema
+from synthetic import generate_dat
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--foods', type=int, default=2_000, help="Number of foods")
+    parser.add_argument('--nutrients', type=int, default=100, help="Number of nutrients")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4], help="Thread counts to run")
+    parser.add_argument('--emphasis', default='Default', help="Value of the 'Emphasis' parameter")
+    parser.add_argument('--time-limit', type=float, default=60.0, help="Time limit of each solve, in seconds")
+    parsed = parser.parse_args(args)
+
+    dat = generate_dat(parsed.foods, parsed.nutrients, whole_fraction=0.9, max_intake_fraction=0.5)
+    dat = set_data_types(dat=dat, schema=input_schema)
+    params = set_parameters_datatypes(params=input_schema.create_full_parameters_dict(dat), schema=input_schema)
+    params.update({'Time Limit': parsed.time_limit, 'Emphasis': parsed.emphasis})
+    data_in = get_optimization_arrays(dat, params)
+
+    print(f"{'threads':>8} {'status':>10} {'cost':>12} {'wall (s)':>10} {'speedup':>10} {'cpu/wall':>10}")
+    baseline = None
+    for threads in parsed.threads:
+        session = ModelSession(data_in)
+        start = time.perf_counter()
+        opt_sol = session.optimize({**params, 'Threads': threads})
+        wall_time = time.perf_counter() - start
+        baseline = baseline or wall_time
+        print(f"{threads:>8} {opt_sol['status']:>10} {opt_sol['kpis'].get('Total Cost', float('nan')):>12.2f} "
+              f"{wall_time:>10.3f} {baseline / wall_time:>10.2f} {opt_sol['kpis'].get('CPU Utilization', 1.0):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
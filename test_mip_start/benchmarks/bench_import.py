@@ -0,0 +1,39 @@
+"""
+Benchmark of the import time of the package, alone and along with the dependencies of its engines. Each case runs in
+a fresh interpreter. Run it from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_import.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+
+REPEATS = 5
+CASES = {
+    'import mip_start': "import mip_start",
+    'Update Food Cost engine': "import mip_start; mip_start.update_food_cost_solve",
+    'solve engine': "import mip_start; mip_start.solve",
+    'Report Builder engine': "import mip_start; mip_start.report_builder_solve",
+}
+
+
+def _import_time(code: str) -> float:
+    """Wall time of the imports of code, in seconds, as measured by the interpreter's -X importtime option."""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([os.getcwd(), os.environ.get('PYTHONPATH', '')])}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            env=env, check=True)
+    # lines are 'import time: <self us> | <cumulative us> | <module>', top-level modules aren't indented
+    top_level = [line.split('|') for line in result.stderr.splitlines()
+                 if line.startswith('import time:') and not line.split('|')[2].startswith('  ')]
+    return sum(int(cumulative) for _, cumulative, _ in top_level[1:]) / 1e6  # skip the header line
+
+
+def main():
+    print(f"{'case':>25} {'import time (s)':>16}")
+    for name, code in CASES.items():
+        print(f"{name:>25} {statistics.median(_import_time(code) for _ in range(REPEATS)):>16.3f}")
+
+
+if __name__ == '__main__':
+    main()
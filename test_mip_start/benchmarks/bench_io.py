@@ -0,0 +1,50 @@
+"""
+Benchmark of the read/write throughput of the input data formats: xlsx, csv, Parquet and Arrow IPC. Run it from the
+root folder of the repository with:
+    python test_mip_start/benchmarks/bench_io.py
+"""
+import os
+import tempfile
+import time
+
+from mwcommons.ticdat_utils import set_data_types
+
+from mip_start.columnar_io import read_data, write_data
+from mip_start.schemas import input_schema
+from mip_start.validation import _set_data_types
+from synthetic import generate_dat
+
+
+ROWS = [10_000, 100_000]  # rows of the foods_nutrients table
+N_NUTRIENTS = 100
+DENSITY = 0.1
+FORMATS = {'xlsx': 'input.xlsx', 'csv': 'input_csv', 'parquet': 'input.parquet_dir', 'arrow': 'input.arrow_dir'}
+
+
+def _time(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'rows':>10} {'format':>8} {'write (s)':>10} {'read (s)':>9} {'typing (s)':>11} {'read (rows/s)':>14}")
+    for rows in ROWS:
+        dat = generate_dat(int(rows / (N_NUTRIENTS * DENSITY)), N_NUTRIENTS, density=DENSITY)
+        dat = set_data_types(dat=dat, schema=input_schema)
+        n_rows = sum(len(getattr(dat, table)) for table in input_schema.all_tables)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for data_format, name in FORMATS.items():
+                data_loc = os.path.join(tmp_dir, name)
+                write_time = _time(write_data, dat, data_loc, input_schema)
+                start = time.perf_counter()
+                read_dat = read_data(data_loc, input_schema)
+                read_time = time.perf_counter() - start
+                # as validate_input does, which skips the tables whose dtypes are already set
+                typing_time = _time(_set_data_types, read_dat, input_schema.all_tables)
+                print(f"{len(dat.foods_nutrients):>10} {data_format:>8} {write_time:>10.2f} {read_time:>9.2f} "
+                      f"{typing_time:>11.2f} {n_rows / read_time:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
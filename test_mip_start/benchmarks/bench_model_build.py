@@ -0,0 +1,58 @@
+"""
+Benchmark of the model build time as a function of the catalog size.
+
+Compares the sparse build of mip_start.model.build_model against the former dense build, which visited every
+(food, nutrient) pair for each of C1 and C2. Run it from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_model_build.py
+"""
+import time
+
+import pandas as pd
+import pyscipopt as scip
+from pyscipopt import quicksum as qs
+
+from mip_start.input_data import get_optimization_data
+from mip_start.model import build_model
+from synthetic import generate_dat
+
+
+SIZES = [(1_000, 50), (5_000, 100), (20_000, 200)]
+DENSITY = 0.1
+
+
+def dense_build_model(data_in):
+    """Former model build, kept here as the baseline of the benchmark (missing pairs are read as zero)."""
+    mdl = scip.Model("diet_problem")
+    I, J = data_in['I'], data_in['J']
+    nl, nu, nq = data_in['nl'], data_in['nu'], data_in['nq']
+    c, vtypes = data_in['c'], data_in['vtypes']
+    x = {i: mdl.addVar(vtype=vtypes[i], name=f'x_{i}') for i in I}
+    for j in J:
+        mdl.addCons(qs(nq.get((i, j), 0.0) * x[i] for i in I) >= nl[j], name=f'C1_{j}')
+        if pd.notnull(nu[j]):
+            mdl.addCons(qs(nq.get((i, j), 0.0) * x[i] for i in I) <= nu[j], name=f'C2_{j}')
+    mdl.setObjective(qs(c[i] * x[i] for i in I), sense='minimize')
+    return mdl, x
+
+
+def _time(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'foods':>8} {'nutrients':>10} {'nonzeros':>10} {'dense (s)':>10} {'sparse (s)':>11} {'speedup':>8}")
+    for n_foods, n_nutrients in SIZES:
+        dat = generate_dat(n_foods, n_nutrients, density=DENSITY)
+        # give half of the nutrients a Max Intake so that C2 rows are built as well
+        dat.nutrients.loc[::2, 'Max Intake'] = 1e6
+        data_in = get_optimization_data(dat, params={})
+        dense = _time(dense_build_model, data_in)
+        sparse = _time(build_model, data_in)
+        print(f"{n_foods:>8} {n_nutrients:>10} {len(data_in['nq']):>10} {dense:>10.2f} {sparse:>11.2f} "
+              f"{dense / sparse:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark of the memory and time needed to create the model data, as dicts (get_optimization_data) or as arrays
+(get_optimization_arrays). Run it from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_model_data.py
+"""
+import time
+import tracemalloc
+
+from mip_start.input_data import get_optimization_arrays, get_optimization_data
+from synthetic import generate_dat
+
+
+SIZES = [(10_000, 100), (50_000, 200), (100_000, 200)]
+DENSITY = 0.1
+
+
+def _profile(func, *args) -> tuple[float, float]:
+    """Return the elapsed time (s) and the memory (MB) retained by the output of func(*args)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    output = func(*args)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del output
+    return elapsed, retained / 2 ** 20
+
+
+def main():
+    print(f"{'rows':>10} {'dicts (s)':>10} {'dicts (MB)':>11} {'arrays (s)':>11} {'arrays (MB)':>12}")
+    for n_foods, n_nutrients in SIZES:
+        dat = generate_dat(n_foods, n_nutrients, density=DENSITY)
+        dict_time, dict_mem = _profile(get_optimization_data, dat, {})
+        array_time, array_mem = _profile(get_optimization_arrays, dat, {})
+        print(f"{len(dat.foods_nutrients):>10} {dict_time:>10.2f} {dict_mem:>11.1f} {array_time:>11.2f} "
+              f"{array_mem:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark of the whole solve pipeline on synthetic data, stage by stage: I/O, set_data_types, check_data,
+get_optimization_data, model build, optimize (with the solver statistics), create_output_tables and
+report_builder_solve.
+
+The results are written as JSON (along with the package version and the environment), so that runs can be compared
+across versions. Run it from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_pipeline.py -o results.json
+    python test_mip_start/benchmarks/bench_pipeline.py -o new_results.json --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+from datetime import datetime, timezone
+from importlib.metadata import version
+from importlib.util import find_spec
+
+from mwcommons.ticdat_utils import check_data, set_data_types, set_parameters_datatypes
+
+import mip_start
+from mip_start.action_report_builder import report_builder_solve
+from mip_start.columnar_io import read_data, write_data
+from mip_start.input_data import get_optimization_data
+from mip_start.instrumentation import Instrumentation
+from mip_start.model import ModelSession
+from mip_start.output_data import create_output_tables
+from mip_start.schemas import input_schema
+from synthetic import generate_dat
+
+
+SIZES = [(1_000, 50), (5_000, 100), (20_000, 200)]
+STAGES = ['Write', 'Read', 'Set Data Types', 'Check Data', 'Model Data', 'Model Build', 'Optimize', 'Output Tables',
+          'Report Builder']
+
+
+def run_pipeline(dat, time_limit: float, data_format: str) -> dict:
+    """Run every stage of the pipeline on dat and return the collected metrics."""
+    instrumentation = Instrumentation()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_loc = os.path.join(tmp_dir, 'input.parquet_dir' if data_format == 'parquet' else 'input_csv')
+        with instrumentation.phase('Write'):
+            write_data(dat, data_loc, input_schema)
+        with instrumentation.phase('Read'):
+            dat = read_data(data_loc, input_schema)
+
+        with instrumentation.phase('Set Data Types'):
+            dat = set_data_types(dat=dat, schema=input_schema)
+        with instrumentation.phase('Check Data'):
+            check_data(dat, input_schema)
+        params = set_parameters_datatypes(params=input_schema.create_full_parameters_dict(dat), schema=input_schema)
+        params['Time Limit'] = time_limit
+
+        with instrumentation.phase('Model Data'):
+            data_in = get_optimization_data(dat, params)
+        with instrumentation.phase('Model Build'):
+            session = ModelSession(data_in)
+        with instrumentation.phase('Optimize'):
+            data_out = session.optimize(params, instrumentation=instrumentation)
+        with instrumentation.phase('Output Tables'):
+            sln = create_output_tables(dat, data_in, data_out)
+        with instrumentation.phase('Report Builder'):
+            report_builder_solve(dat, sln, path=tmp_dir)
+
+    instrumentation.record('Status', data_out['status'])
+    return instrumentation.metrics
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Print the ratio of the stage times of results to the ones of baseline, for the sizes run by both."""
+    baseline_runs = {(run['n_foods'], run['n_nutrients']): run['metrics'] for run in baseline['runs']}
+    print(f"\nTime ratio vs. baseline (version {baseline['version']}, {baseline['timestamp']}); < 1 is faster")
+    print(f"{'foods':>8} {'nutrients':>10} " + ' '.join(f'{stage:>14}' for stage in STAGES))
+    for run in results['runs']:
+        base_metrics = baseline_runs.get((run['n_foods'], run['n_nutrients']))
+        if base_metrics is None:
+            continue
+        ratios = [run['metrics'][f'{stage} Time'] / max(base_metrics.get(f'{stage} Time', float('nan')), 1e-4)
+                  for stage in STAGES]
+        print(f"{run['n_foods']:>8} {run['n_nutrients']:>10} " + ' '.join(f'{ratio:>14.2f}' for ratio in ratios))
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help="JSON file to write the results to")
+    parser.add_argument('--sizes', nargs='+', default=[f'{n}x{m}' for n, m in SIZES],
+                        help="Sizes to run, as <foods>x<nutrients>")
+    parser.add_argument('--density', type=float, default=0.1, help="Density of the foods_nutrients table")
+    parser.add_argument('--whole-fraction', type=float, default=0.5, help="Fraction of Whole foods")
+    parser.add_argument('--max-intake-fraction', type=float, default=0.5, help="Fraction of nutrients with Max Intake")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument('--time-limit', type=float, default=60.0, help="Time limit of each solve, in seconds")
+    parser.add_argument('--compare', help="JSON file of a previous run to compare the results to")
+    parsed = parser.parse_args(args)
+
+    data_format = 'parquet' if find_spec('pyarrow') else 'csv'
+    results = {
+        'version': mip_start.__version__,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            **{package: version(package) for package in ['pandas', 'numpy', 'pyscipopt', 'ticdat']},
+        },
+        'config': {key: value for key, value in vars(parsed).items() if key not in ('output', 'compare')},
+        'data_format': data_format,
+        'runs': [],
+    }
+    print(f"{'foods':>8} {'nutrients':>10} {'nonzeros':>10} " + ' '.join(f'{stage:>14}' for stage in STAGES))
+    for size in parsed.sizes:
+        n_foods, n_nutrients = map(int, size.split('x'))
+        dat = generate_dat(n_foods, n_nutrients, density=parsed.density, seed=parsed.seed,
+                           whole_fraction=parsed.whole_fraction, max_intake_fraction=parsed.max_intake_fraction)
+        metrics = run_pipeline(dat, parsed.time_limit, data_format)
+        results['runs'].append({'n_foods': n_foods, 'n_nutrients': n_nutrients,
+                                'nonzeros': len(dat.foods_nutrients), 'metrics': metrics})
+        print(f"{n_foods:>8} {n_nutrients:>10} {len(dat.foods_nutrients):>10} "
+              + ' '.join(f"{metrics[f'{stage} Time']:>14.3f}" for stage in STAGES))
+
+    with open(parsed.output, 'w') as file:
+        json.dump(results, file, indent=2, default=str)
+    print(f"Results written to {parsed.output}")
+
+    if parsed.compare:
+        with open(parsed.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
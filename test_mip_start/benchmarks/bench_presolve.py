@@ -0,0 +1,61 @@
+"""
+Benchmark of the data-level presolve: size of the model and time to build and solve it, with and without presolve,
+on synthetic data. Run it from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_presolve.py
+"""
+import argparse
+import time
+
+from mwcommons.ticdat_utils import set_data_types, set_parameters_datatypes
+
+from mip_start.input_data import get_optimization_arrays
+from mip_start.model import optimize
+from mip_start.presolve import postsolve, presolve
+from mip_start.schemas import input_schema
+from synthetic import generate_dat
+
+
+SIZES = [(1_000, 50), (5_000, 100), (20_000, 200)]
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=[f'{n}x{m}' for n, m in SIZES],
+                        help="Sizes to run, as <foods>x<nutrients>")
+    parser.add_argument('--density', type=float, default=0.1, help="Density of the foods_nutrients table")
+    parser.add_argument('--max-intake-fraction', type=float, default=0.3, help="Fraction of nutrients with Max Intake")
+    parser.add_argument('--time-limit', type=float, default=60.0, help="Time limit of each solve, in seconds")
+    parsed = parser.parse_args(args)
+
+    print(f"{'foods':>8} {'nutrients':>10} {'kept foods':>11} {'kept conss':>11} {'presolve (s)':>13} "
+          f"{'solve (s)':>10} {'presolved solve (s)':>20} {'cost':>10} {'presolved cost':>15}")
+    for size in parsed.sizes:
+        n_foods, n_nutrients = map(int, size.split('x'))
+        dat = generate_dat(n_foods, n_nutrients, density=parsed.density,
+                           max_intake_fraction=parsed.max_intake_fraction)
+        dat = set_data_types(dat=dat, schema=input_schema)
+        params = set_parameters_datatypes(params=input_schema.create_full_parameters_dict(dat), schema=input_schema)
+        params['Time Limit'] = parsed.time_limit
+        data_in = get_optimization_arrays(dat, params)
+
+        start = time.perf_counter()
+        data_out = optimize(data_in, params)
+        solve_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = presolve(data_in)
+        presolve_time = time.perf_counter() - start
+        start = time.perf_counter()
+        presolved_out = postsolve(result, optimize(result.data_in, params))
+        presolved_solve_time = time.perf_counter() - start
+
+        n_conss = len(data_in['J']) + int((data_in['nu'] == data_in['nu']).sum())
+        n_removed_conss = int((result.removed['Type'] == 'Constraint').sum())
+        print(f"{n_foods:>8} {n_nutrients:>10} {len(result.data_in['I']):>11} {n_conss - n_removed_conss:>11} "
+              f"{presolve_time:>13.3f} {solve_time:>10.3f} {presolved_solve_time:>20.3f} "
+              f"{data_out['kpis'].get('Total Cost', float('nan')):>10.2f} "
+              f"{presolved_out['kpis'].get('Total Cost', float('nan')):>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
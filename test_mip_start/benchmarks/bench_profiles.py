@@ -0,0 +1,84 @@
+"""
+Benchmark of the profiles engine: wall time to solve many diet profiles against the same synthetic foods data, with
+one full solve per profile vs. profiles_solve, sequentially (reusing one model) and with worker processes. Each profile
+scales the Min Intake of a random subset of the nutrients, and all the foods are Fractional. Run it from the root
+folder of the repository with:
+    python test_mip_start/benchmarks/bench_profiles.py
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from mip_start.main import solve
+from mip_start.profiles import profiles_solve
+from mip_start.schemas import input_schema
+from synthetic import generate_dat
+
+
+def add_profiles(dat, n_profiles: int, changed_fraction: float, seed: int = 0):
+    """Add n_profiles profiles to dat, each one scaling the Min Intake of a changed_fraction of the nutrients."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for p in range(n_profiles):
+        changed = dat.nutrients[rng.random(len(dat.nutrients)) < changed_fraction]
+        rows.append(pd.DataFrame({'Profile ID': f'P{p}', 'Nutrient ID': changed['Nutrient ID'],
+                                  'Min Intake': (changed['Min Intake'] * rng.uniform(0.5, 1.0, len(changed))).round(),
+                                  'Max Intake': changed['Max Intake']}))
+    dat.profiles = pd.DataFrame({'Profile ID': [f'P{p}' for p in range(n_profiles)],
+                                 'Profile Name': [f'Profile {p}' for p in range(n_profiles)]})
+    dat.profiles_nutrients = pd.concat(rows, ignore_index=True)
+    return dat
+
+
+def solve_each_profile(dat) -> dict:
+    """Baseline: one full solve (validation, model data, model build) per profile."""
+    bounds = dat.profiles_nutrients.set_index(['Profile ID', 'Nutrient ID'])[['Min Intake', 'Max Intake']]
+    slns = {}
+    for profile in dat.profiles['Profile ID']:
+        profile_dat = input_schema.copy_pan_dat(dat)
+        nutrients = profile_dat.nutrients.set_index('Nutrient ID')
+        if profile in bounds.index.get_level_values(0):
+            nutrients.update(bounds.loc[profile])
+        profile_dat.nutrients = nutrients.reset_index()
+        slns[profile] = solve(profile_dat)
+    return slns
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--foods', type=int, default=1_000, help="Number of foods")
+    parser.add_argument('--nutrients', type=int, default=50, help="Number of nutrients")
+    parser.add_argument('--profiles', type=int, default=20, help="Number of profiles")
+    parser.add_argument('--changed-fraction', type=float, default=0.2,
+                        help="Fraction of the nutrients whose bounds each profile changes")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4], help="Numbers of worker processes to run")
+    parser.add_argument('--time-limit', type=float, default=10.0, help="Time limit of each solve, in seconds")
+    parsed = parser.parse_args(args)
+
+    dat = generate_dat(parsed.foods, parsed.nutrients, whole_fraction=0.0, max_intake_fraction=0.3)
+    dat.parameters = pd.DataFrame({'Name': ['Time Limit'], 'Value': [parsed.time_limit]})
+    dat = add_profiles(dat, parsed.profiles, parsed.changed_fraction)
+
+    runs = {'solve per profile': lambda: solve_each_profile(dat),
+            'sequential': lambda: profiles_solve(dat, max_workers=1)}
+    for workers in parsed.workers:
+        runs[f'{workers} workers'] = lambda workers=workers: profiles_solve(dat, max_workers=workers)
+
+    print(f"{parsed.profiles} profiles, {parsed.foods} foods, {parsed.nutrients} nutrients")
+    print(f"{'mode':>20} {'wall (s)':>10} {'speedup':>10}")
+    baseline = None
+    for mode, run in runs.items():
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # the solver's log
+            run()
+        wall_time = time.perf_counter() - start
+        baseline = baseline or wall_time
+        print(f"{mode:>20} {wall_time:>10.2f} {baseline / wall_time:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of report_builder_solve: generation time and size of the HTML files (without the shared plotly.min.js, of
+about 4.6 MB), with the plotly.js bundle embedded in each file or written once to the output directory, with and
+without zero rows and a cap on the number of foods, on synthetic data and a synthetic solution that buys a fraction of
+the foods. Run it from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_report.py
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from mwcommons.ticdat_utils import set_data_types
+
+from mip_start.action_report_builder import REPORT_CHARTS, report_builder_solve
+from mip_start.schemas import input_schema, output_schema
+from synthetic import generate_dat
+
+
+SIZES = [(100, 20), (1_000, 50), (5_000, 100)]
+OPTIONS = {
+    'default': {},
+    'shared plotly.js': {'include_plotlyjs': 'directory'},
+    'drop zeros': {'include_plotlyjs': 'directory', 'drop_zeros': True},
+    'drop zeros, top 20': {'include_plotlyjs': 'directory', 'drop_zeros': True, 'top_n': 20},
+}
+
+
+def generate_sln(dat, bought_fraction: float, seed: int = 0):
+    """A solution that buys a random quantity of a random bought_fraction of the foods."""
+    rng = np.random.default_rng(seed)
+    n_foods = len(dat.foods)
+    quantities = np.where(rng.random(n_foods) < bought_fraction, rng.random(n_foods) * 10, 0.0)
+    buy = pd.DataFrame({'Food ID': dat.foods['Food ID'], 'Food Name': dat.foods['Food Name'], 'Quantity': quantities})
+    nutrition = dat.nutrients[['Nutrient ID', 'Nutrient Name', 'Min Intake', 'Max Intake']].copy()
+    nutrition.insert(2, 'Quantity', rng.random(len(nutrition)) * 100)
+    return output_schema.PanDat(buy=buy, nutrition=nutrition)
+
+
+def _html_size(path: str) -> int:
+    # the shared plotly.min.js is written once per directory, and left out
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith('.html'))
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=[f'{n}x{m}' for n, m in SIZES],
+                        help="Sizes to run, as <foods>x<nutrients>")
+    parser.add_argument('--density', type=float, default=0.1, help="Density of the foods_nutrients table")
+    parser.add_argument('--bought-fraction', type=float, default=0.05, help="Fraction of the foods bought")
+    parsed = parser.parse_args(args)
+
+    print(f"{'foods':>8} {'nutrients':>10} {'options':>20} {'stacked_bar (s)':>16} {'stacked_bar (KB)':>17} "
+          f"{'all charts (s)':>15} {'all charts (KB)':>16}")
+    for size in parsed.sizes:
+        n_foods, n_nutrients = map(int, size.split('x'))
+        dat = set_data_types(dat=generate_dat(n_foods, n_nutrients, density=parsed.density), schema=input_schema)
+        sln = generate_sln(dat, parsed.bought_fraction)
+        for name, options in OPTIONS.items():
+            results = []
+            for charts in [('stacked_bar',), REPORT_CHARTS]:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    start = time.perf_counter()
+                    report_builder_solve(dat, sln, path=tmp_dir, charts=charts, **options)
+                    results.append((time.perf_counter() - start, _html_size(tmp_dir) / 1024))
+            (one_time, one_size), (all_time, all_size) = results
+            print(f"{n_foods:>8} {n_nutrients:>10} {name:>20} {one_time:>16.3f} {one_size:>17.0f} "
+                  f"{all_time:>15.3f} {all_size:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark of the streaming ingestion of foods_nutrients: peak memory and time to create the array model data, by
+reading the whole table (read_data, set_data_types, check_data_fast and get_optimization_arrays) or by streaming it
+in chunks of several sizes. Each run is a fresh process, whose peak resident memory is reported. Run it from the root
+folder of the repository with:
+    python test_mip_start/benchmarks/bench_streaming.py
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+
+
+def _peak_memory_mb() -> float:
+    # ru_maxrss of a child process includes the memory of its parent at fork time, unlike VmHWM (Linux only)
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(data_loc: str, foods_nutrients_path: str, chunk_size: int | None) -> dict:
+    """Create the model data in this process, streaming foods_nutrients if chunk_size is given."""
+    from mwcommons.ticdat_utils import set_parameters_datatypes
+
+    from mip_start.columnar_io import read_data
+    from mip_start.input_data import get_optimization_arrays
+    from mip_start.schemas import input_schema
+    from mip_start.streaming import get_optimization_arrays_streaming
+    from mip_start.validation import validate_input
+
+    start = time.perf_counter()
+    dat = read_data(data_loc, input_schema)
+    if chunk_size is not None:
+        dat = validate_input(dat, fast=True)
+        params = set_parameters_datatypes(params=input_schema.create_full_parameters_dict(dat), schema=input_schema)
+        data_in = get_optimization_arrays_streaming(dat, params, foods_nutrients_path, chunk_size)
+    else:
+        dat.foods_nutrients = read_data(os.path.dirname(foods_nutrients_path), input_schema).foods_nutrients
+        dat = validate_input(dat, fast=True)
+        params = set_parameters_datatypes(params=input_schema.create_full_parameters_dict(dat), schema=input_schema)
+        data_in = get_optimization_arrays(dat, params)
+    return {'time': time.perf_counter() - start, 'nnz': data_in['nq'].nnz,
+            'peak_mb': _peak_memory_mb()}
+
+
+def main(args: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--foods', type=int, default=20_000, help="Number of foods")
+    parser.add_argument('--nutrients', type=int, default=500, help="Number of nutrients")
+    parser.add_argument('--density', type=float, default=0.2, help="Density of the foods_nutrients table")
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[100_000, 1_000_000],
+                        help="Chunk sizes to stream with")
+    parser.add_argument('--run', nargs=3, metavar=('DATA_LOC', 'FOODS_NUTRIENTS', 'CHUNK_SIZE'),
+                        help=argparse.SUPPRESS)  # used internally to run one measurement in a fresh process
+    parsed = parser.parse_args(args)
+
+    if parsed.run:
+        data_loc, foods_nutrients_path, chunk_size = parsed.run
+        print(json.dumps(run(data_loc, foods_nutrients_path, int(chunk_size) if chunk_size != 'all' else None)))
+        return
+
+    from mip_start.columnar_io import write_data
+    from mip_start.schemas import input_schema
+    from synthetic import generate_dat
+
+    suffix = 'parquet' if find_spec('pyarrow') else 'csv'
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dat = generate_dat(parsed.foods, parsed.nutrients, density=parsed.density)
+        n_rows = len(dat.foods_nutrients)
+        foods_nutrients_dir = os.path.join(tmp_dir, f'foods_nutrients.{suffix}_dir' if suffix == 'parquet' else 'fn')
+        foods_nutrients_dat = input_schema.PanDat(foods_nutrients=dat.foods_nutrients)
+        write_data(foods_nutrients_dat, foods_nutrients_dir, input_schema)
+        dat.foods_nutrients = dat.foods_nutrients.iloc[:0]
+        data_loc = os.path.join(tmp_dir, 'input.parquet_dir' if suffix == 'parquet' else 'input')
+        write_data(dat, data_loc, input_schema)
+        del dat, foods_nutrients_dat
+        foods_nutrients_path = os.path.join(foods_nutrients_dir, f'foods_nutrients.{suffix}')
+
+        print(f"{n_rows} rows of foods_nutrients ({suffix})")
+        print(f"{'mode':>20} {'time (s)':>10} {'peak (MB)':>10}")
+        for chunk_size in ['all'] + [str(size) for size in parsed.chunk_sizes]:
+            output = subprocess.run([sys.executable, __file__, '--run', data_loc, foods_nutrients_path, chunk_size],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            mode = 'whole table' if chunk_size == 'all' else f'chunks of {chunk_size}'
+            print(f"{mode:>20} {result['time']:>10.2f} {result['peak_mb']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark of the input data integrity check, row by row (ticdat's check_data) or vectorized (check_data_fast). Run it
+from the root folder of the repository with:
+    python test_mip_start/benchmarks/bench_validation.py
+"""
+import contextlib
+import io
+import time
+
+from mwcommons.ticdat_utils import check_data, set_data_types
+
+from mip_start.schemas import input_schema
+from mip_start.validation import check_data_fast
+from synthetic import generate_dat
+
+
+ROWS = [10_000, 100_000, 1_000_000]  # rows of the foods_nutrients table
+N_NUTRIENTS = 100
+DENSITY = 0.1
+
+
+def _time(func, *args) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'rows':>10} {'check_data (s)':>15} {'check_data_fast (s)':>20} {'speedup':>8}")
+    for rows in ROWS:
+        dat = generate_dat(int(rows / (N_NUTRIENTS * DENSITY)), N_NUTRIENTS, density=DENSITY)
+        dat = set_data_types(dat=dat, schema=input_schema)
+        slow_time = _time(check_data, dat, input_schema)
+        fast_time = _time(check_data_fast, dat, input_schema)
+        print(f"{len(dat.foods_nutrients):>10} {slow_time:>15.2f} {fast_time:>20.2f} {slow_time / fast_time:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Seeded generator of synthetic input data for benchmarking.
+"""
+import numpy as np
+import pandas as pd
+
+from mip_start.constants import Portions
+from mip_start.schemas import input_schema
+
+
+def generate_dat(n_foods: int, n_nutrients: int, density: float = 0.1, seed: int = 0, whole_fraction: float = 0.5,
+                 max_intake_fraction: float = 0.0):
+    """
+    Generate a random input_schema.PanDat with n_foods foods and n_nutrients nutrients.
+
+    The intake bounds are feasible by construction: they bracket the nutrients provided by a random reference diet,
+    'Min Intake' at half of it and 'Max Intake' (when set) at twice of it plus one unit of the richest food.
+
+    Parameters
+    ----------
+    n_foods: int
+        Number of rows of the 'foods' table.
+    n_nutrients: int
+        Number of rows of the 'nutrients' table.
+    density: float
+        Fraction of (food, nutrient) pairs present in the 'foods_nutrients' table.
+    seed: int
+        Seed of the random number generator.
+    whole_fraction: float
+        Expected fraction of the foods whose 'Portion' is Whole (the others are Fractional).
+    max_intake_fraction: float
+        Expected fraction of the nutrients with a 'Max Intake' (the others have none).
+    """
+    rng = np.random.default_rng(seed)
+    food_ids = [f'F{i}' for i in range(n_foods)]
+    nutrient_ids = [f'N{j}' for j in range(n_nutrients)]
+
+    foods = pd.DataFrame({
+        'Food ID': food_ids,
+        'Food Name': [f'Food {i}' for i in range(n_foods)],
+        'Per Unit Cost': rng.uniform(0.5, 5.0, n_foods).round(2),
+        'Portion': np.where(rng.random(n_foods) < whole_fraction, Portions.WHOLE.value, Portions.FRACTIONAL.value),
+    })
+
+    # sample the (food, nutrient) pairs present in foods_nutrients
+    n_pairs = max(1, int(density * n_foods * n_nutrients))
+    flat = rng.choice(n_foods * n_nutrients, size=n_pairs, replace=False)
+    food_idx, nutrient_idx = np.divmod(flat, n_nutrients)
+    quantities = rng.uniform(0.0, 100.0, n_pairs).round(1)
+    foods_nutrients = pd.DataFrame({
+        'Food ID': np.asarray(food_ids)[food_idx],
+        'Nutrient ID': np.asarray(nutrient_ids)[nutrient_idx],
+        'Quantity': quantities,
+    })
+
+    # bracket the nutrients of a reference diet of a few whole units of some foods
+    reference_diet = rng.integers(0, 3, n_foods) * (rng.random(n_foods) < min(1.0, 20 / n_foods))
+    provided = np.bincount(nutrient_idx, weights=quantities * reference_diet[food_idx], minlength=n_nutrients)
+    richest = np.zeros(n_nutrients)
+    np.maximum.at(richest, nutrient_idx, quantities)
+    max_intake = np.where(rng.random(n_nutrients) < max_intake_fraction, (2 * provided + richest).round(), np.nan)
+    nutrients = pd.DataFrame({
+        'Nutrient ID': nutrient_ids,
+        'Nutrient Name': [f'Nutrient {j}' for j in range(n_nutrients)],
+        'Min Intake': np.floor(provided / 2),
+        'Max Intake': max_intake,
+    })
+
+    parameters = pd.DataFrame({'Name': ['Time Limit'], 'Value': [60.0]})
+
+    return input_schema.PanDat(parameters=parameters, foods=foods, nutrients=nutrients,
+                               foods_nutrients=foods_nutrients)
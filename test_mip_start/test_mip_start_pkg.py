@@ -1,13 +1,48 @@
+import asyncio
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from importlib.util import find_spec
 from math import isclose
 from pathlib import Path
+from unittest import mock
 
+import numpy as np
+import pandas as pd
 from mwcommons import ticdat_utils as utils
+from mwcommons.exceptions import InputDataError
 
 import mip_start
+from mip_start import action_update_food_cost, job_server, model, validation
+from mip_start.columnar_io import read_data, write_data
+from mip_start.disk_cache import DiskCache
+from mip_start.input_data import get_optimization_arrays
+from mip_start.job_server import JobServer, dat_to_records
+from mip_start.model import ModelSession, optimize
+from mip_start.model_artifact import write_model_artifact
+from mip_start.output_data import create_output_tables, nutrient_contributions
+from mip_start.presolve import postsolve, presolve
+from mip_start.solution_cache import model_fingerprint
+from mip_start.streaming import solve_streaming
+from mip_start.validation import validate_input
 
 
 cwd = Path(__file__).parent.resolve()
+_solve_job = job_server._solve_job
+
+
+def _solve_or_crash_job(records, time_limit):
+    """Solve a job in a worker process, unless its input has a 'crash' table: the process then dies (as in a crash)."""
+    if records.pop('crash', False):
+        os._exit(1)
+    return _solve_job(records, time_limit)
+
 
 class TestMipMe(unittest.TestCase):
 
@@ -56,6 +91,662 @@ class TestMipMe(unittest.TestCase):
         sln = mip_start.solve(self.dat)
         sln = mip_start.report_builder_solve(self.dat, sln, f'{cwd}/app/output')
 
+    def test_5_missing_foods_nutrients_pairs(self):
+        # a missing (Food ID, Nutrient ID) pair must be treated as a zero quantity
+        dat = mip_start.input_schema.copy_pan_dat(self.dat)
+        is_zeroed = (dat.foods_nutrients['Food ID'] == 'F7') & (dat.foods_nutrients['Nutrient ID'] == 'N3')
+        dat.foods_nutrients.loc[is_zeroed, 'Quantity'] = 0.0
+        zeroed_cost = mip_start.solve(dat).kpis.set_index('Name').loc['Total Cost', 'Value']
+
+        dat.foods_nutrients = dat.foods_nutrients[~is_zeroed].reset_index(drop=True)
+        missing_cost = mip_start.solve(dat).kpis.set_index('Name').loc['Total Cost', 'Value']
+        self.assertTrue(isclose(zeroed_cost, missing_cost, abs_tol=1e-2), "Missing pairs should count as zero")
+
+    def test_6_array_model_data(self):
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        params = utils.set_parameters_datatypes(self.params, mip_start.input_schema)
+        model_data = get_optimization_arrays(dat, params)
+        sln = create_output_tables(dat, model_data, optimize(model_data, params))
+        expected = mip_start.solve(self.dat)
+        self.assertTrue(sln.kpis.equals(expected.kpis), "Array and dict model data should have the same kpis")
+        self.assertTrue(sln.nutrition.equals(expected.nutrition), "Array and dict model data should match")
+
+    def test_7_batch_solve(self):
+        scenarios = pd.DataFrame({
+            'Scenario': ['base', 'cheaper', 'cheaper'],
+            'Name': [None, 'Food Cost Multiplier', 'Mip Gap'],
+            'Value': [None, 0.5, 0.01],
+        })
+        slns, kpis_df = mip_start.batch_solve(self.dat, scenarios, max_workers=2)
+        self.assertEqual(set(slns), {'base', 'cheaper'}, "There should be one solution per scenario")
+        total_cost = kpis_df.set_index(['Scenario', 'Name'])['Value']
+        self.assertTrue(isclose(total_cost['base', 'Total Cost'], 11.92, abs_tol=1e-2), "Base cost should be 11.92")
+
+        dat = utils.set_input_parameter(mip_start.input_schema, self.dat, 'Food Cost Multiplier', 0.5)
+        expected = mip_start.solve(mip_start.update_food_cost_solve(dat))
+        expected_cost = expected.kpis.set_index('Name').loc['Total Cost', 'Value']
+        self.assertTrue(isclose(total_cost['cheaper', 'Total Cost'], expected_cost, abs_tol=1e-2),
+                        "Scenario cost should match the 'Update Food Cost' action followed by solve")
+
+        # the shared data goes through the validation cache, as in solve
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = mip_start.ValidationCache(tmp_dir)
+            _, cached_kpis_df = mip_start.batch_solve(self.dat, scenarios, max_workers=1, validation_cache=cache,
+                                                      fast_validation=True)
+            self.assertEqual(len(os.listdir(tmp_dir)), 10, "Cache should hold 6 tables and 4 foreign keys")
+        pd.testing.assert_frame_equal(cached_kpis_df, kpis_df)
+
+    def test_8_model_session(self):
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        params = utils.set_parameters_datatypes(self.params, mip_start.input_schema)
+        model_data = mip_start.get_optimization_data(dat, params)
+        session = ModelSession(model_data)
+        self.assertTrue(isclose(session.optimize(params)['kpis']['Total Cost'], 11.92, abs_tol=1e-2))
+
+        # re-solve after changing costs and intake bounds, and compare against a model built from scratch
+        changes = {
+            'c': {food_id: 0.5 * cost for food_id, cost in model_data['c'].items()},
+            'nl': {'N1': 100.0},
+            'nu': {'N0': None, 'N1': 150.0},
+        }
+        session.update(**changes)
+        updated_data = {**model_data, **{key: {**model_data[key], **values} for key, values in changes.items()}}
+        for new_params in [params, {**params, 'Mip Gap': 0.0}]:
+            expected = mip_start.optimize(updated_data, new_params)
+            opt_sol = session.optimize(new_params)
+            self.assertEqual(opt_sol['status'], expected['status'], "Session status should match a fresh model")
+            self.assertTrue(isclose(opt_sol['kpis']['Total Cost'], expected['kpis']['Total Cost'], abs_tol=1e-2),
+                            "Session cost should match a fresh model")
+
+        # presolve removes C1_N2 and C1_N3: their Min Intake is added back, and null bounds remove constraints
+        reduced = presolve(model_data).data_in
+        for changes in [{'nl': {'N2': 30.0}, 'nu': {'N1': 120.0}},
+                        {'nl': {'N3': 1000.0, 'N1': None}, 'nu': {'N3': None, 'N2': None}}]:
+            session = ModelSession(reduced)
+            session.optimize(params)
+            session.update(**changes)
+            updated_data = {**reduced, **{key: {**reduced[key], **values} for key, values in changes.items()}}
+            expected = mip_start.optimize(updated_data, params)
+            self.assertTrue(isclose(session.optimize(params)['kpis']['Total Cost'], expected['kpis']['Total Cost'],
+                                    abs_tol=1e-2), "Session cost should match a fresh model")
+
+        # unknown foods or nutrients are rejected before changing anything
+        for changes in [{'nl': {'N2': 30.0}, 'c': {'NOPE': 1.0}}, {'nl': {'N2': 30.0}, 'nu': {'NOPE': 1.0}}]:
+            with self.assertRaisesRegex(ValueError, 'NOPE'):
+                session.update(**changes)
+        self.assertEqual(session.optimize(params)['kpis']['Total Cost'], expected['kpis']['Total Cost'])
+
+    def test_9_warm_start(self):
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        params = utils.set_parameters_datatypes(self.params, mip_start.input_schema)
+        model_data = mip_start.get_optimization_data(dat, params)
+        opt_sol = mip_start.optimize(model_data, params)
+
+        # an exact prior solution is accepted as is
+        warm_sol = mip_start.optimize(model_data, params, start=opt_sol['vars']['x'])
+        self.assertTrue(warm_sol['kpis']['Warm Start Accepted'], "An optimal start should be accepted")
+        self.assertEqual(warm_sol['kpis']['Time to First Incumbent'], 0.0)
+
+        # a prior buy table has rounded quantities, SCIP completes it from the Whole-portion foods
+        sln = mip_start.solve(self.dat, start=mip_start.solve(self.dat).buy)
+        kpis = sln.kpis.set_index('Name')['Value']
+        self.assertTrue(kpis['Warm Start Accepted'], "A rounded prior buy table should be completed")
+        self.assertTrue(isclose(kpis['Total Cost'], 11.92, abs_tol=1e-2), "'Total Cost' should be 11.92")
+
+        # the x array of array model data is a start too, but only for array model data
+        array_data = get_optimization_arrays(dat, params)
+        array_sol = mip_start.optimize(array_data, params)
+        warm_sol = mip_start.optimize(array_data, params, start=array_sol['vars']['x'])
+        self.assertTrue(warm_sol['kpis']['Warm Start Accepted'], "An optimal array start should be accepted")
+        with self.assertRaises(TypeError):
+            mip_start.optimize(model_data, params, start=array_sol['vars']['x'])
+        with self.assertRaises(ValueError):
+            mip_start.optimize(array_data, params, start=array_sol['vars']['x'][1:])
+
+        # without Whole-portion foods, a start that isn't feasible as is fixes nothing, so it isn't accepted
+        fractional_data = {**array_data, 'vtypes': np.full(len(array_data['I']), 'C')}
+        warm_sol = mip_start.optimize(fractional_data, params, start=dict.fromkeys(array_data['I'], 0.0))
+        self.assertFalse(warm_sol['kpis']['Warm Start Accepted'], "An infeasible fractional start isn't accepted")
+
+    def test_10_instrumentation(self):
+        collected = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = f'{tmp_dir}/metrics.jsonl'
+            instrumentation = mip_start.Instrumentation(sinks=[mip_start.JsonLogSink(log_path)])
+            sln = mip_start.solve(self.dat, instrumentation=instrumentation)
+            with open(log_path) as file:
+                logged = json.loads(file.readline())
+
+        kpis = sln.kpis.set_index('Name')['Value']
+        for name in ['Check Data Time', 'Model Build Time', 'Solve Time', 'Nodes', 'Gap', 'Create Output Tables Time']:
+            self.assertIn(name, kpis.index, f"'{name}' should be a kpi")
+            self.assertIn(name, logged, f"'{name}' should be logged")
+
+        # registered sinks receive the metrics of every solve, without adding them to the kpis
+        mip_start.add_metrics_sink(collected.append)
+        try:
+            sln = mip_start.solve(self.dat)
+        finally:
+            mip_start.remove_metrics_sink(collected.append)
+        self.assertEqual(len(collected), 1, "The registered sink should receive one set of metrics")
+        self.assertEqual(list(sln.kpis['Name']), ['Total Cost'], "Metrics should not be added to the kpis")
+
+    def test_11_validation_cache(self):
+        expected = utils.set_data_types(self.dat, mip_start.input_schema)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = mip_start.ValidationCache(tmp_dir)
+            for force in [False, False, True]:
+                dat = validate_input(self.dat, cache=cache, force=force)
+                for table in mip_start.input_schema.all_tables:
+                    self.assertTrue(getattr(dat, table).equals(getattr(expected, table)), f"{table} should be typed")
+            self.assertEqual(len(os.listdir(tmp_dir)), 10, "Cache should hold 6 tables and 4 foreign keys")
+
+            # a changed table is checked again, even if the other tables are cached
+            bad_dat = mip_start.input_schema.copy_pan_dat(self.dat)
+            bad_dat.foods_nutrients.loc[0, 'Food ID'] = 'Unknown Food'
+            with self.assertRaises(InputDataError):
+                validate_input(bad_dat, cache=cache)
+
+            sln = mip_start.solve(self.dat, validation_cache=cache)
+            total_cost = sln.kpis.set_index('Name').loc['Total Cost', 'Value']
+            self.assertTrue(isclose(total_cost, 11.92, abs_tol=1e-2), "'Total Cost' should be 11.92")
+
+    def test_12_disk_cache_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = DiskCache(tmp_dir, max_entries=2)
+            for key in ['a', 'b']:
+                cache.put(key, key)
+                time.sleep(0.01)
+            self.assertEqual(cache.get('a'), 'a')  # 'b' becomes the least recently used entry
+            time.sleep(0.01)
+            cache.put('c', 'c')
+            self.assertIsNone(cache.get('b'), "Least recently used entry should be evicted")
+            self.assertEqual((cache.get('a'), cache.get('c')), ('a', 'c'))
+
+    def test_13_fast_validation(self):
+        schema = mip_start.input_schema
+        dat = utils.set_data_types(self.dat, schema)
+        dat.foods.loc[0, 'Per Unit Cost'] = -1.0
+        dat.foods.loc[1, 'Portion'] = 'Bogus'
+        dat.nutrients.loc[0, 'Min Intake'] = 1e9
+        dat.foods_nutrients.loc[0, 'Food ID'] = 'Unknown Food'
+        dat.foods_nutrients = pd.concat([dat.foods_nutrients, dat.foods_nutrients.iloc[[3]]], ignore_index=True)
+        dat.parameters = pd.concat([dat.parameters, pd.DataFrame({'Name': ['Mip Gap', 'Unknown'], 'Value': [2.0, 1]})],
+                                   ignore_index=True)
+        checks = {
+            'find_foreign_key_failures': validation.find_foreign_key_failures,
+            'find_data_type_failures': validation.find_data_type_failures,
+            'find_data_row_failures': validation.find_data_row_failures,
+            'find_duplicates': validation.find_duplicates,
+        }
+        for name, fast_check in checks.items():
+            expected, failures = getattr(schema, name)(dat), fast_check(dat)
+            self.assertEqual(set(map(str, failures)), set(map(str, expected)), f"{name} should find the same keys")
+            self.assertTrue(expected, f"{name} should find failures")
+            for key, df in expected.items():
+                pd.testing.assert_frame_equal(failures[key].reset_index(drop=True), df.reset_index(drop=True),
+                                              check_dtype=False)
+        with self.assertRaises(InputDataError):
+            validation.check_data_fast(dat)
+
+        sln = mip_start.solve(self.dat, fast_validation=True)
+        total_cost = sln.kpis.set_index('Name').loc['Total Cost', 'Value']
+        self.assertTrue(isclose(total_cost, 11.92, abs_tol=1e-2), "'Total Cost' should be 11.92")
+
+    @unittest.skipUnless(find_spec('pyarrow'), "pyarrow is not installed")
+    def test_14_columnar_io(self):
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for suffix in ['.parquet_dir', '.arrow_dir']:
+                data_loc = os.path.join(tmp_dir, f'input{suffix}')
+                write_data(dat, data_loc, mip_start.input_schema)
+                read_dat = read_data(data_loc, mip_start.input_schema)
+                for table in mip_start.input_schema.all_tables:
+                    pd.testing.assert_frame_equal(getattr(read_dat, table), getattr(dat, table))
+
+                sln = mip_start.solve(read_dat)
+                sln_loc = os.path.join(tmp_dir, f'output{suffix}')
+                write_data(sln, sln_loc, mip_start.output_schema)
+                read_sln = read_data(sln_loc, mip_start.output_schema)
+                total_cost = read_sln.kpis.set_index('Name').loc['Total Cost', 'Value']
+                self.assertTrue(isclose(total_cost, 11.92, abs_tol=1e-2), "'Total Cost' should be 11.92")
+
+    def test_15_output_tables(self):
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        params = utils.set_parameters_datatypes(self.params, mip_start.input_schema)
+        model_data = mip_start.get_optimization_data(dat, params)
+        data_out = optimize(model_data, params)
+        sln = create_output_tables(dat, model_data, data_out)
+        nonzero_sln = create_output_tables(dat, model_data, data_out, drop_zero_purchases=True)
+        self.assertTrue((nonzero_sln.buy['Quantity'] > 0).all(), "Zero purchases should be dropped")
+        self.assertTrue(nonzero_sln.buy.equals(sln.buy[sln.buy['Quantity'] != 0].reset_index(drop=True)))
+        self.assertTrue(nonzero_sln.nutrition.equals(sln.nutrition), "Nutrition shouldn't depend on dropped foods")
+
+        # contributions match the merge of buy with foods_nutrients
+        contributions = nutrient_contributions(dat, sln.buy)
+        merged = sln.buy.merge(dat.foods_nutrients, on='Food ID', suffixes=(' Purchased', ' per unit'))
+        expected = merged['Quantity Purchased'] * merged['Quantity per unit']
+        self.assertEqual(len(contributions), len(dat.foods_nutrients), "One contribution per foods_nutrients row")
+        self.assertTrue(np.allclose(contributions['Contribution'], expected.to_numpy(dtype=float)))
+
+    def test_16_job_server(self):
+        records = dat_to_records(self.dat, mip_start.input_schema)
+        bad_records = {**records, 'foods': []}
+        jobs = [{'id': 'good', 'input': records, 'time_limit': 30}, {'id': 'bad', 'input': bad_records}]
+        input_stream = io.StringIO('\n'.join([json.dumps(job) for job in jobs] + ['not json']) + '\n')
+        output_stream = io.StringIO()
+        asyncio.run(JobServer(max_workers=1, max_queue=1).serve(input_stream, output_stream))
+
+        messages = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+        statuses = {}
+        for message in messages:
+            statuses.setdefault(message['id'], []).append(message['status'])
+        self.assertEqual(statuses, {'good': ['queued', 'running', 'done'], 'bad': ['queued', 'running', 'failed'],
+                                    None: ['failed']})
+        output = next(message['output'] for message in messages if message['status'] == 'done')
+        total_cost = pd.DataFrame(output['kpis']).set_index('Name').loc['Total Cost', 'Value']
+        self.assertTrue(isclose(total_cost, 11.92, abs_tol=1e-2), "'Total Cost' should be 11.92")
+
+        # a job that doesn't answer in time gets its worker replaced, which solves the next job
+        jobs = [{'id': 'slow', 'input': records, 'time_limit': 0}, {'id': 'good', 'input': records}]
+        input_stream = io.StringIO('\n'.join(json.dumps(job) for job in jobs) + '\n')
+        output_stream = io.StringIO()
+        asyncio.run(JobServer(max_workers=1, max_queue=1, grace=0.0).serve(input_stream, output_stream))
+        messages = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+        self.assertEqual([message['status'] for message in messages if message['status'] in ('timeout', 'done')],
+                         ['timeout', 'done'])
+
+        # a job whose worker dies (without time limit) fails, and the worker is replaced
+        jobs = [{'id': 'crash', 'input': {**records, 'crash': True}}, {'id': 'good', 'input': records}]
+        input_stream = io.StringIO('\n'.join(json.dumps(job) for job in jobs) + '\n')
+        output_stream = io.StringIO()
+        with mock.patch.object(job_server, '_solve_job', _solve_or_crash_job):
+            asyncio.run(JobServer(max_workers=1, max_queue=1).serve(input_stream, output_stream))
+        messages = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+        self.assertEqual([message['status'] for message in messages if message['status'] in ('failed', 'done')],
+                         ['failed', 'done'])
+        self.assertIn('died', next(message['error'] for message in messages if message['status'] == 'failed'))
+
+    def test_17_lazy_imports(self):
+        # run in a fresh interpreter, since the heavy modules are already imported by the other tests
+        code = (
+            "import sys\n"
+            "import mip_start\n"
+            "heavy = ('pandas', 'ticdat', 'plotly', 'pyscipopt')\n"
+            "assert not [m for m in heavy if m in sys.modules], [m for m in heavy if m in sys.modules]\n"
+            "from mwcommons import ticdat_utils as utils\n"
+            f"dat = utils.read_data({str(cwd / 'data' / 'testing_data.xlsx')!r}, mip_start.input_schema)\n"
+            "mip_start.actions_config['Update Food Cost']['engine'](dat)\n"
+            "assert 'plotly' not in sys.modules and 'pyscipopt' not in sys.modules\n"
+        )
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join([str(cwd.parent), os.environ.get('PYTHONPATH', '')])}
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(callable(mip_start.actions_config['Report Builder']['engine']))
+        self.assertIs(mip_start.solve, mip_start.main.solve)
+
+    def test_18_concurrent_solve(self):
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        params = utils.set_parameters_datatypes(self.params, mip_start.input_schema)
+        session = ModelSession(mip_start.get_optimization_data(dat, params))
+        concurrent_params = {**params, 'Threads': 2, 'Emphasis': 'Feasibility', 'Mip Gap': 0.0}
+        # the session can solve again afterwards, building the model once per solve after a concurrent one, or before
+        # a concurrent one
+        with mock.patch.object(model, 'build_model', wraps=model.build_model) as build_model:
+            for new_params, builds in [(concurrent_params, 1), (params, 2), (params, 2), (concurrent_params, 3),
+                                       (concurrent_params, 4)]:
+                opt_sol = session.optimize(new_params)
+                self.assertEqual(opt_sol['status'], 'optimal')
+                self.assertTrue(isclose(opt_sol['kpis']['Total Cost'], 11.92, abs_tol=1e-2),
+                                "'Total Cost' should be 11.92")
+                self.assertEqual('Threads Used' in opt_sol['kpis'], new_params['Threads'] > 1)
+                self.assertEqual(build_model.call_count, builds)
+
+        sln = mip_start.solve(utils.set_input_parameter(mip_start.input_schema, self.dat, 'Threads', 2))
+        kpis = sln.kpis.set_index('Name')['Value']
+        self.assertIn(kpis['Threads Used'], [1, 2], "Concurrent solve should fall back to 1 thread if unsupported")
+        self.assertTrue(isclose(kpis['Total Cost'], 11.92, abs_tol=1e-2), "'Total Cost' should be 11.92")
+        self.assertIn('CPU Utilization', kpis.index)
+
+        # without concurrency support, the sequential solve keeps the explicit warm start, and its artifact has the
+        # parameters of the sequential solve
+        session = ModelSession(mip_start.get_optimization_data(dat, params))
+        with (mock.patch.object(model, 'concurrent_solve_supported', return_value=False),
+              self.assertWarns(UserWarning), tempfile.TemporaryDirectory() as tmp_dir):
+            opt_sol = session.optimize(concurrent_params, start=sln.buy, artifact_dir=tmp_dir)
+            with open(os.path.join(tmp_dir, opt_sol['kpis']['Model Fingerprint'], 'artifact.json')) as file:
+                self.assertEqual(json.load(file)['params']['Threads'], 1)
+        self.assertEqual(opt_sol['kpis']['Threads Used'], 1)
+        self.assertTrue(opt_sol['kpis']['Warm Start Accepted'])
+        self.assertIsInstance(model.concurrent_solve_supported(), bool)
+
+        # params built by hand may lack the parameters added after 'Time Limit' and 'Mip Gap'
+        opt_sol = session.optimize({'Time Limit': None, 'Mip Gap': 0.001})
+        self.assertEqual(opt_sol['status'], 'optimal')
+
+    def test_19_presolve(self):
+        # F2 is dominated by F1 (costlier, less of N1 and same N2), F3 only provides N3, whose C1 is trivial, and F4 is
+        # as F1 but Fractional
+        data_in = {
+            'I': {'F1', 'F2', 'F3', 'F4'}, 'J': {'N1', 'N2', 'N3'},
+            'c': {'F1': 1.0, 'F2': 2.0, 'F3': 0.5, 'F4': 1.0},
+            'vtypes': {'F1': 'I', 'F2': 'I', 'F3': 'C', 'F4': 'C'},
+            'nl': {'N1': 10.0, 'N2': 0.0, 'N3': 0.0}, 'nu': {'N1': np.nan, 'N2': 8.0, 'N3': np.nan},
+            'nq': {('F1', 'N1'): 3.0, ('F1', 'N2'): 1.0, ('F2', 'N1'): 2.0, ('F2', 'N2'): 1.0, ('F3', 'N3'): 5.0,
+                   ('F4', 'N1'): 3.0, ('F4', 'N2'): 1.0},
+        }
+        result = presolve(data_in)
+        removed = result.removed.set_index('ID')
+        self.assertEqual(set(removed.index), {'F2', 'F3', 'C1_N2', 'C1_N3'})
+        self.assertEqual(removed.loc['F2', 'Dominated By'], 'F1')
+        self.assertEqual(result.data_in['I'], {'F1', 'F4'}, "Foods of a different Portion don't dominate each other")
+        self.assertEqual(result.data_in['J'], {'N1', 'N2'}, "N3 is left without constraints")
+        data_out = postsolve(result, optimize(result.data_in, {**self.params, 'Mip Gap': 0.0}))
+        self.assertEqual(set(data_out['vars']['x']), data_in['I'])
+        self.assertEqual(data_out['vars']['x']['F2'], 0.0)
+
+        # the presolved model has the same optimal cost, for both forms of the optimization data
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        params = {**utils.set_parameters_datatypes(self.params, mip_start.input_schema), 'Mip Gap': 0.0}
+        for get_data in [mip_start.get_optimization_data, get_optimization_arrays]:
+            data_in = get_data(dat, params)
+            result = presolve(data_in)
+            data_out = postsolve(result, optimize(result.data_in, params))
+            self.assertEqual(len(data_out['vars']['x']), len(dat.foods))
+            sln = create_output_tables(dat, data_in, data_out)
+            self.assertEqual(list(sln.buy['Food ID']), sorted(dat.foods['Food ID']))
+            self.assertTrue(isclose(data_out['kpis']['Total Cost'], optimize(data_in, params)['kpis']['Total Cost']))
+
+        sln = mip_start.solve(self.dat, presolve=True)
+        kpis = sln.kpis.set_index('Name')['Value']
+        self.assertEqual(kpis['Constraints Removed by Presolve'], 2, "C1 of the nutrients without Min Intake")
+        self.assertEqual(len(sln.buy), len(self.dat.foods))
+
+    def test_20_streaming_ingestion(self):
+        expected = mip_start.solve(self.dat)
+        dat = mip_start.input_schema.copy_pan_dat(self.dat)
+        foods_nutrients, dat.foods_nutrients = dat.foods_nutrients, dat.foods_nutrients.iloc[:0]
+        suffixes = ['.csv', '.parquet'] if find_spec('pyarrow') else ['.csv']
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for suffix in suffixes:
+                path = os.path.join(tmp_dir, f'foods_nutrients{suffix}')
+                if suffix == '.csv':
+                    foods_nutrients.to_csv(path, index=False)
+                else:
+                    foods_nutrients.to_parquet(path, index=False)
+                sln = solve_streaming(dat, path, chunk_size=7)
+                pd.testing.assert_frame_equal(sln.buy, expected.buy)
+                self.assertEqual(sln.kpis.to_dict(), expected.kpis.to_dict())
+                nonzero = expected.nutrition['Nutrient ID'].isin(foods_nutrients.loc[foods_nutrients['Quantity'] != 0,
+                                                                                     'Nutrient ID'])
+                pd.testing.assert_frame_equal(sln.nutrition, expected.nutrition[nonzero].reset_index(drop=True))
+
+            # a failure in any chunk, or a pair repeated in different chunks, is reported
+            path = os.path.join(tmp_dir, 'foods_nutrients.csv')
+            for bad_rows in [pd.DataFrame({'Food ID': ['Unknown'], 'Nutrient ID': ['N0'], 'Quantity': [1.0]}),
+                             foods_nutrients[foods_nutrients['Quantity'] != 0].head(1)]:
+                pd.concat([foods_nutrients, bad_rows]).to_csv(path, index=False)
+                with self.assertRaises(InputDataError):
+                    solve_streaming(dat, path, chunk_size=7)
+
+    def test_21_solution_cache(self):
+        dat = utils.set_data_types(self.dat, mip_start.input_schema)
+        params = utils.set_parameters_datatypes(self.params, mip_start.input_schema)
+        self.assertEqual(model_fingerprint(mip_start.get_optimization_data(dat, params), params),
+                         model_fingerprint(get_optimization_arrays(dat, params), params))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = mip_start.SolutionCache(tmp_dir)
+            sln = mip_start.solve(self.dat, solution_cache=cache, presolve=True, start={'F1': 1.0})
+            kpis = sln.kpis.set_index('Name')['Value']
+            self.assertFalse(kpis['Cache Hit'])
+            self.assertTrue({'Warm Start Accepted', 'Foods Removed by Presolve'}.issubset(kpis.index))
+
+            # shuffled rows, new names and parameters that don't change the model hit the cache
+            dat = mip_start.input_schema.copy_pan_dat(self.dat)
+            dat.foods = dat.foods.iloc[::-1].reset_index(drop=True)
+            dat.foods['Food Name'] = dat.foods['Food Name'] + ' (new)'
+            dat = utils.set_input_parameter(mip_start.input_schema, dat, 'Time Limit', 60)
+            cached_sln = mip_start.solve(dat, solution_cache=cache)
+            kpis = cached_sln.kpis.set_index('Name')['Value']
+            self.assertTrue(kpis['Cache Hit'])
+            self.assertEqual(set(kpis.index), {'Total Cost', 'Cache Hit'}, "kpis of the cached solve aren't reported")
+            self.assertTrue(isclose(kpis['Total Cost'], 11.92, abs_tol=1e-2), "'Total Cost' should be 11.92")
+            pd.testing.assert_frame_equal(cached_sln.buy.drop(columns='Food Name'), sln.buy.drop(columns='Food Name'))
+            self.assertTrue(cached_sln.buy['Food Name'].str.endswith(' (new)').all())
+
+            # a different 'Mip Gap' or optimization data doesn't, nor does a solve that isn't optimal
+            dat = utils.set_input_parameter(mip_start.input_schema, self.dat, 'Mip Gap', 0.01)
+            self.assertFalse(mip_start.solve(dat, solution_cache=cache).kpis.set_index('Name')['Value']['Cache Hit'])
+            dat = utils.set_input_parameter(mip_start.input_schema, self.dat, 'Mip Gap', 0.02)
+            dat = utils.set_input_parameter(mip_start.input_schema, dat, 'Time Limit', 0)
+            for _ in range(2):
+                sln = mip_start.solve(dat, solution_cache=cache)
+                self.assertFalse(sln.kpis.set_index('Name')['Value']['Cache Hit'])
+
+    def test_22_report_options(self):
+        sln = mip_start.solve(self.dat)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mip_start.report_builder_solve(self.dat, sln, tmp_dir, include_plotlyjs='directory', drop_zeros=True,
+                                           top_n=2, charts=['stacked_bar', 'nutrition', 'cost'])
+            self.assertEqual(sorted(os.listdir(tmp_dir)),
+                             ['cost.html', 'nutrition.html', 'plotly.min.js', 'stacked_bar.html'])
+            # the plotly.js bundle is referenced, not embedded
+            self.assertLess(os.path.getsize(os.path.join(tmp_dir, 'stacked_bar.html')),
+                            os.path.getsize(os.path.join(tmp_dir, 'plotly.min.js')) / 10)
+            with open(os.path.join(tmp_dir, 'stacked_bar.html')) as file:
+                html = file.read()
+            self.assertIn('"Other"', html)
+
+        # only Chicken is purchased and no Sodium comes from it: without drop_zeros, Sodium keeps its trace and the
+        # foods without contributions stay on the x axis (up to top_n)
+        dat = mip_start.input_schema.copy_pan_dat(self.dat)
+        fn = dat.foods_nutrients
+        dat.foods_nutrients = fn[~((fn['Food ID'] == 'F1') & (fn['Nutrient ID'] == 'N3'))]
+        sln = mip_start.output_schema.copy_pan_dat(sln)
+        sln.buy['Quantity'] = np.where(sln.buy['Food ID'] == 'F1', 1.0, 0.0)
+        for drop_zeros, top_n, expected_names, expected_foods in [
+                (True, None, ['Calories', 'Protein', 'Fat'], None),
+                (False, None, ['Calories', 'Protein', 'Fat', 'Sodium'], sln.buy['Food Name'].tolist()),
+                (False, 3, ['Calories', 'Protein', 'Fat', 'Sodium'], ['Hamburger', 'Chicken', 'Hot Dog', 'Other'])]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                mip_start.report_builder_solve(dat, sln, tmp_dir, drop_zeros=drop_zeros, top_n=top_n,
+                                               charts=['stacked_bar'])
+                with open(os.path.join(tmp_dir, 'stacked_bar.html')) as file:
+                    html = file.read()
+            self.assertEqual(re.findall(r'"name":"([^"]*)"', html), expected_names)
+            categories = re.findall(r'"categoryarray":(\[[^\]]*\])', html)
+            self.assertEqual([json.loads(array) for array in categories], [expected_foods] if expected_foods else [])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(ValueError):
+                mip_start.report_builder_solve(self.dat, sln, tmp_dir, charts=['pie'])
+
+    def test_23_profiles_solve(self):
+        dat = mip_start.input_schema.copy_pan_dat(self.dat)
+        with self.assertRaises(InputDataError):
+            mip_start.profiles_solve(dat)
+
+        dat.profiles = pd.DataFrame({'Profile ID': ['base', 'protein'], 'Profile Name': ['Base', 'More Protein']})
+        dat.profiles_nutrients = pd.DataFrame({'Profile ID': ['protein', 'protein'], 'Nutrient ID': ['N1', 'N2'],
+                                               'Min Intake': [100.0, 0.0], 'Max Intake': [None, 60.0]})
+        expected = {'base': mip_start.solve(self.dat)}
+        protein_dat = mip_start.input_schema.copy_pan_dat(self.dat)
+        nutrients = protein_dat.nutrients.set_index('Nutrient ID')
+        nutrients.loc['N1', ['Min Intake', 'Max Intake']] = [100.0, None]
+        nutrients.loc['N2', ['Min Intake', 'Max Intake']] = [0.0, 60.0]
+        protein_dat.nutrients = nutrients.reset_index()
+        expected['protein'] = mip_start.solve(protein_dat)
+
+        # sequentially with a reused model, and in parallel, the profiles match a solve per profile
+        for max_workers in [1, 2]:
+            sln = mip_start.profiles_solve(dat, max_workers=max_workers)
+            self.assertTrue(mip_start.output_schema.good_pan_dat_object(sln))
+            for profile, profile_expected in expected.items():
+                kpis = sln.profile_kpis[sln.profile_kpis['Profile ID'] == profile].set_index('Name')['Value']
+                expected_cost = profile_expected.kpis.set_index('Name').loc['Total Cost', 'Value']
+                self.assertTrue(isclose(kpis['Total Cost'], expected_cost, abs_tol=1e-2))
+                buy = sln.profile_buy[sln.profile_buy['Profile ID'] == profile].drop(columns='Profile ID')
+                pd.testing.assert_frame_equal(buy.reset_index(drop=True), profile_expected.buy[buy.columns])
+                nutrition = sln.profile_nutrition[sln.profile_nutrition['Profile ID'] == profile]
+                nutrition = nutrition.drop(columns='Profile ID').reset_index(drop=True)
+                pd.testing.assert_frame_equal(nutrition, profile_expected.nutrition[nutrition.columns])
+
+        dat.profiles_nutrients.loc[0, 'Profile ID'] = 'unknown'
+        with self.assertRaises(InputDataError):
+            mip_start.profiles_solve(dat)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/clear_refs'), "Peak memory is measured on Linux only")
+    def test_24_actions_peak_memory(self):
+        def resident_memory(field):
+            with open('/proc/self/status') as file:
+                return next(int(line.split()[1]) * 1024 for line in file if line.startswith(f'{field}:'))
+
+        def peak_increase(engine, *args):
+            before = resident_memory('VmRSS')
+            with open('/proc/self/clear_refs', 'w') as file:
+                file.write('5')  # resets the peak resident memory (VmHWM) to the current one
+            engine(*args)
+            return resident_memory('VmHWM') - before
+
+        # 2M rows of foods_nutrients, and a solution that buys a few of the foods
+        n_foods, n_nutrients = 40_000, 50
+        rng = np.random.default_rng(0)
+        food_ids = pd.Series([f'F{i}' for i in range(n_foods)], dtype='str')
+        nutrient_ids = pd.Series([f'N{j}' for j in range(n_nutrients)], dtype='str')
+        dat = mip_start.input_schema.PanDat(
+            foods=pd.DataFrame({'Food ID': food_ids, 'Food Name': 'Food ' + food_ids,
+                                'Per Unit Cost': rng.uniform(0.5, 5.0, n_foods), 'Portion': 'Fractional'}),
+            nutrients=pd.DataFrame({'Nutrient ID': nutrient_ids, 'Nutrient Name': 'Nutrient ' + nutrient_ids,
+                                    'Min Intake': 0.0, 'Max Intake': np.nan}),
+            foods_nutrients=pd.DataFrame({'Food ID': food_ids.repeat(n_nutrients).to_numpy(),
+                                          'Nutrient ID': np.tile(nutrient_ids.to_numpy(), n_foods),
+                                          'Quantity': rng.uniform(0.0, 100.0, n_foods * n_nutrients)}))
+        buy = dat.foods[['Food ID', 'Food Name']].assign(Quantity=np.where(rng.random(n_foods) < 0.001, 1.0, 0.0))
+        sln = mip_start.output_schema.PanDat(buy=buy)
+        input_size = sum(getattr(dat, table).memory_usage(deep=True).sum() for table in ['foods', 'foods_nutrients'])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name, action in mip_start.actions_config.items():
+                if action['schema'] == 'input' and not action_update_food_cost.copy_on_write_enabled():
+                    continue  # input actions copy the input data without copy-on-write
+                args = (dat,) if action['schema'] == 'input' else (dat, sln, tmp_dir)
+                action['engine'](*args)  # imports the engine's dependencies and warms up the memory pools
+                # a fixed allowance covers what doesn't depend on the input size, e.g. the plotly.js bundle of reports
+                self.assertLess(peak_increase(action['engine'], *args), input_size / 2 + 64 * 2 ** 20,
+                                f"{name} should use less memory than half the size of its input")
+
+        # with copy-on-write, the tables that aren't changed are shared, not copied, and in any case, modifying them
+        # in place leaves dat unchanged
+        new_dat = mip_start.update_food_cost_solve(dat)
+        shares_memory = np.shares_memory(new_dat.foods_nutrients['Quantity'].to_numpy(),
+                                         dat.foods_nutrients['Quantity'].to_numpy())
+        self.assertEqual(shares_memory, action_update_food_cost.copy_on_write_enabled())
+        new_dat.foods_nutrients.loc[0, 'Quantity'] = -1.0
+        self.assertNotEqual(dat.foods_nutrients.loc[0, 'Quantity'], -1.0, "dat should be left unchanged")
+        with mock.patch.object(action_update_food_cost, 'copy_on_write_enabled', return_value=False):
+            new_dat = mip_start.update_food_cost_solve(dat)
+        self.assertFalse(np.shares_memory(new_dat.foods_nutrients['Quantity'].to_numpy(),
+                                          dat.foods_nutrients['Quantity'].to_numpy()))
+
+    def test_25_incumbent_callback(self):
+        incumbents = []
+        sln = mip_start.solve(self.dat, on_incumbent=incumbents.append)
+        self.assertGreaterEqual(len(incumbents), 1, "The callback should be called with each new incumbent")
+        objectives = [incumbent.objective for incumbent in incumbents]
+        self.assertEqual(objectives, sorted(objectives, reverse=True), "Incumbents should improve")
+        self.assertTrue(all(incumbent.gap >= 0 for incumbent in incumbents))
+        total_cost = sln.kpis.set_index('Name').loc['Total Cost', 'Value']
+        self.assertTrue(isclose(objectives[-1], total_cost, abs_tol=1e-2), "The last incumbent should be the solution")
+        self.assertFalse('Stopped by Stall Time' in sln.kpis['Name'].values)
+        purchased = sln.buy[sln.buy['Quantity'] != 0].reset_index(drop=True)
+        pd.testing.assert_frame_equal(incumbents[-1].buy, purchased[incumbents[-1].buy.columns])
+        self.assertEqual(list(incumbents[-1].buy.columns), ['Food ID', 'Food Name', 'Quantity'])
+
+        # with a zero stall time, the solve stops at the first feasible solution, and the next solve of the session
+        # isn't stopped
+        params = {**self.params, 'Stall Time': 0.0}
+        session = ModelSession(get_optimization_arrays(self.dat, params))
+        incumbents = []
+        opt_sol = session.optimize(params, on_incumbent=incumbents.append)
+        self.assertEqual(opt_sol['status'], 'userinterrupt')
+        self.assertTrue(opt_sol['kpis']['Stopped by Stall Time'])
+        self.assertEqual(len(incumbents), 1)
+        self.assertEqual(list(incumbents[0].buy.columns), ['Food ID', 'Quantity'])
+        opt_sol = session.optimize({**params, 'Stall Time': 60.0})
+        self.assertEqual(opt_sol['status'], 'optimal')
+        self.assertFalse(opt_sol['kpis']['Stopped by Stall Time'])
+
+        # an exception of the callback interrupts the solve and reaches the caller, and the session can solve again
+        def fail(incumbent):
+            raise KeyError(f"incumbent at {incumbent.time}")
+
+        with self.assertRaises(KeyError):
+            mip_start.solve(self.dat, on_incumbent=fail)
+        session = ModelSession(get_optimization_arrays(self.dat, params))
+        with self.assertRaises(KeyError):
+            session.optimize({**params, 'Stall Time': None}, on_incumbent=fail)
+        self.assertEqual(session.optimize({**params, 'Stall Time': None})['status'], 'optimal')
+
+    def test_26_model_artifacts(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sln = mip_start.solve(self.dat, artifact_dir=tmp_dir)
+            kpis = sln.kpis.set_index('Name')['Value']
+            dat = utils.set_data_types(self.dat, mip_start.input_schema)
+            params = utils.set_parameters_datatypes(self.params, mip_start.input_schema)
+            fingerprint = model_fingerprint(mip_start.get_optimization_data(dat, params), params)
+            self.assertEqual(kpis['Model Fingerprint'], fingerprint)
+            artifact = os.path.join(tmp_dir, fingerprint)
+            self.assertEqual(sorted(os.listdir(artifact)), ['artifact.json', 'model.mps.gz', 'params.set'])
+
+            # the artifact is replayed in a fresh interpreter, without pandas or ticdat
+            code = (
+                "import json, sys\n"
+                "from mip_start.model_artifact import replay_model_artifact\n"
+                f"result = replay_model_artifact({artifact!r}, {{'limits/time': 60.0}}, quiet=True)\n"
+                "assert not [m for m in ('pandas', 'ticdat') if m in sys.modules]\n"
+                "print(json.dumps(result))\n"
+            )
+            env = {**os.environ, 'PYTHONPATH': os.pathsep.join([str(cwd.parent), os.environ.get('PYTHONPATH', '')])}
+            result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            replayed = json.loads(result.stdout)
+            self.assertEqual(replayed['fingerprint'], fingerprint)
+            self.assertEqual(replayed['status'], 'optimal')
+            self.assertTrue(isclose(replayed['objective'], kpis['Total Cost'], abs_tol=1e-2))
+            quantities = pd.Series(replayed['x']).round(2).reindex(sln.buy['Food ID']).to_numpy()
+            np.testing.assert_allclose(quantities, sln.buy['Quantity'].to_numpy(dtype=np.float64), atol=1e-2)
+
+            # the SCIP parameters of the solve are replayed, and an LP model is written as well
+            session = ModelSession(mip_start.get_optimization_data(dat, params))
+            opt_sol = session.optimize({**params, 'Mip Gap': 0.05, 'Emphasis': 'Feasibility'}, artifact_dir=tmp_dir)
+            mdl, metadata = mip_start.read_model_artifact(os.path.join(tmp_dir, opt_sol['kpis']['Model Fingerprint']),
+                                                          quiet=True)
+            self.assertEqual(mdl.getParam('limits/gap'), 0.05)
+            self.assertEqual(metadata['params']['Emphasis'], 'Feasibility')
+            with self.assertRaises(ValueError):
+                write_model_artifact(session.mdl, tmp_dir, params, fingerprint, {}, fmt='cip')
+
+        # Food and Nutrient IDs with spaces, which MPS and LP names can't hold, are replayed in both formats
+        spaced_dat = mip_start.input_schema.copy_pan_dat(self.dat)
+        for table in ['foods', 'foods_nutrients']:
+            df = getattr(spaced_dat, table)
+            df['Food ID'] = 'Food ' + df['Food ID'].astype(str)
+        for table in ['nutrients', 'foods_nutrients']:
+            df = getattr(spaced_dat, table)
+            df['Nutrient ID'] = 'Nutrient ' + df['Nutrient ID'].astype(str)
+        for artifact_format in ['mps', 'lp']:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                sln = mip_start.solve(spaced_dat, artifact_dir=tmp_dir, artifact_format=artifact_format)
+                kpis = sln.kpis.set_index('Name')['Value']
+                artifact = os.path.join(tmp_dir, kpis['Model Fingerprint'])
+                self.assertTrue(os.path.exists(os.path.join(artifact, f'model.{artifact_format}.gz')))
+                replayed = mip_start.replay_model_artifact(artifact, quiet=True)
+                self.assertEqual(replayed['status'], 'optimal')
+                self.assertTrue(isclose(replayed['objective'], kpis['Total Cost'], abs_tol=1e-2))
+                quantities = pd.Series(replayed['x']).round(2).reindex(sln.buy['Food ID']).to_numpy()
+                np.testing.assert_allclose(quantities, sln.buy['Quantity'].to_numpy(dtype=np.float64), atol=1e-2)
+
 
 if __name__ == '__main__':
     unittest.main()